@@ -0,0 +1,132 @@
+# activity_rules.py
+"""
+Sliding-window detection of suspicious activity, evaluated as logs are written.
+
+DatabaseManager.log_activity passes every new entry through
+ActivityRules.evaluate before inserting it. Rules are indexed by log
+description, so an entry no rule watches costs one dict lookup. For a watched
+entry the rule's window for that subject (the acting user, or the whole
+system) is read from detection_state, updated and written back in the log
+write's own transaction. A window holds at most `threshold` timestamps, so
+each event is O(1) work no matter how large the log is, and the state
+survives restarts and is shared by every process using the database.
+
+When a window fills up the entry is flagged suspicious with the rule's
+reason appended to its additional info, and the window starts over.
+"""
+
+import time
+
+
+class Rule:
+    """threshold matching events within window seconds, per user or system-wide"""
+
+    def __init__(self, name, reason, threshold, window, descriptions=(), prefixes=(),
+                 per_user=True):
+        self.name = name
+        self.reason = reason
+        self.threshold = threshold
+        self.window = window
+        self.descriptions = tuple(descriptions)
+        self.prefixes = tuple(prefixes)
+        self.per_user = per_user
+
+
+FAILED_LOGINS = ('Unsuccessful login', 'Multiple unsuccessful login attempts',
+                 'Login attempt while locked out', 'Account locked due to multiple failed attempts')
+
+DEFAULT_RULES = (
+    Rule('failed_logins', '5 failed logins for this user within 1 minute', 5, 60,
+         descriptions=FAILED_LOGINS),
+    Rule('failed_logins_global', '20 failed logins within 1 minute (credential stuffing)', 20, 60,
+         descriptions=FAILED_LOGINS, per_user=False),
+    Rule('unauthorized_attempts', '3 unauthorized attempts within 5 minutes', 3, 300,
+         prefixes=('Unauthorized',)),
+    Rule('delete_burst', '10 deletions within 1 minute', 10, 60,
+         descriptions=('Traveller deleted', 'Scooter deleted', 'User deleted')),
+    Rule('restore_burst', '3 restores within 1 hour', 3, 3600,
+         descriptions=('System restored from backup',)),
+    Rule('password_reset_burst', '5 password resets within 10 minutes', 5, 600,
+         descriptions=('Password reset',)),
+    Rule('export_burst', '3 traveller exports within 1 hour', 3, 3600,
+         descriptions=('Travellers exported',)),
+)
+
+# Stale windows are deleted every this many evaluated events
+PRUNE_EVERY = 500
+
+
+class ActivityRules:
+    """Rules indexed by description, with their windows kept in detection_state"""
+
+    def __init__(self, rules=DEFAULT_RULES):
+        self.by_description = {}
+        self.prefixed = []
+        for rule in rules:
+            for description in rule.descriptions:
+                self.by_description.setdefault(description, []).append(rule)
+            for prefix in rule.prefixes:
+                self.prefixed.append((prefix, rule))
+        self.max_window = max((rule.window for rule in rules), default=0)
+        self._evaluated = 0
+
+    def setup(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS detection_state (
+                rule TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                events TEXT NOT NULL,
+                last_event INTEGER NOT NULL,
+                PRIMARY KEY (rule, subject)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_detection_state_last_event
+            ON detection_state (last_event)
+        ''')
+
+    def rules_for(self, description):
+        rules = self.by_description.get(description, [])
+        if self.prefixed:
+            rules = rules + [rule for prefix, rule in self.prefixed if description.startswith(prefix)]
+        return rules
+
+    def _advance(self, cursor, rule, subject, now):
+        """Add one event to the window; True when it reaches the threshold"""
+        row = cursor.execute('SELECT events FROM detection_state WHERE rule = ? AND subject = ?',
+                             (rule.name, subject)).fetchone()
+        events = [int(t) for t in row[0].split(',')] if row and row[0] else []
+        # Compact form: only the newest threshold - 1 timestamps inside the window matter
+        events = [t for t in events if t > now - rule.window][-(rule.threshold - 1):]
+        events.append(now)
+        fired = len(events) >= rule.threshold
+        if fired:
+            events = []  # start a new window so one burst raises one alert
+        cursor.execute('''
+            INSERT INTO detection_state (rule, subject, events, last_event) VALUES (?, ?, ?, ?)
+            ON CONFLICT (rule, subject) DO UPDATE SET events = excluded.events,
+                                                      last_event = excluded.last_event
+        ''', (rule.name, subject, ','.join(map(str, events)), now))
+        return fired
+
+    def evaluate(self, cursor, username, description, now=None):
+        """Reasons of the rules this new entry triggers (empty for most entries).
+
+        Must run inside the log write's transaction so the windows are
+        updated atomically with the entry.
+        """
+        rules = self.rules_for(description)
+        if not rules:
+            return []
+        now = int(now if now is not None else time.time())
+        reasons = []
+        for rule in rules:
+            subject = (username or 'SYSTEM').lower() if rule.per_user else '*'
+            if self._advance(cursor, rule, subject, now):
+                reasons.append(rule.reason)
+
+        self._evaluated += 1
+        if self._evaluated % PRUNE_EVERY == 0:
+            cursor.execute('DELETE FROM detection_state WHERE last_event < ?',
+                           (now - self.max_window,))
+        return reasons
@@ -1,4 +1,6 @@
 # admin_menus.py
+from backup_codecs import BACKUP_CODECS, DEFAULT_CODEC, available_codecs
+from metrics import REGISTRY, METRICS_FILE
 
 class AdminMenus:
     def __init__(self, console_interface):
@@ -7,6 +9,7 @@ class AdminMenus:
         self.user_mgr = console_interface.user_mgr
         self.log_mgr = console_interface.log_mgr
         self.backup_mgr = console_interface.backup_mgr
+        self.retention_mgr = console_interface.retention_mgr
     
     # ========== SYSTEM LOGS ==========
     
@@ -19,6 +22,11 @@ class AdminMenus:
             print("2. View Suspicious Activities")
             print("3. Search Logs")
             print("4. Suspicious Activity Summary")
+            if self.session.authz.check_permission('manage_retention'):
+                print("5. Retention & Archiving")
+            if self.session.authz.check_permission('view_metrics'):
+                print("6. Performance Metrics")
+            print("7. Verify Log Integrity")
             print("\n0. Back to Main Menu")
             print("-" * 40)
             
@@ -34,6 +42,12 @@ class AdminMenus:
                 self.search_logs_submenu()
             elif choice == '4':
                 self.suspicious_summary_submenu()
+            elif choice == '5' and self.session.authz.check_permission('manage_retention'):
+                self.retention_submenu()
+            elif choice == '6' and self.session.authz.check_permission('view_metrics'):
+                self.metrics_submenu()
+            elif choice == '7':
+                self.verify_log_integrity_submenu()
             else:
                 print("Invalid choice.")
                 input("Press Enter to continue...")
@@ -97,13 +111,20 @@ class AdminMenus:
             input("Press Enter to continue...")
             return
         
-        result = self.log_mgr.search_logs(search_term)
+        date_from = input("From date (DD-MM-YYYY, optional): ").strip() or None
+        date_to = input("To date (DD-MM-YYYY, optional): ").strip() or None
+        include_archived = input("Include archived logs? (y/N): ").strip().lower() == 'y'
+        
+        result = self.log_mgr.search_logs(search_term, date_from, date_to,
+                                          include_archived=include_archived)
         if result['success']:
             if result['data']:
                 print(f"\n{'Date':<12} {'Time':<10} {'User':<15} {'Description':<30} {'Suspicious'}")
                 print("-" * 85)
                 for log in result['data']:
                     suspicious_flag = "⚠️ YES" if log['suspicious'] else "No"
+                    if log.get('archived'):
+                        suspicious_flag += " (archived)"
                     description = log['description'][:28] + ".." if len(log['description']) > 30 else log['description']
                     print(f"{log['date']:<12} {log['time']:<10} {log['username']:<15} {description:<30} {suspicious_flag}")
             else:
@@ -135,6 +156,94 @@ class AdminMenus:
         
         input("\nPress Enter to continue...")
     
+    def retention_submenu(self):
+        """Show retention status and run a bounded retention pass"""
+        self.console.clear_screen()
+        print("=== RETENTION & ARCHIVING ===\n")
+        
+        status = self.retention_mgr.get_retention_status()
+        if not status['success']:
+            print(f"Error: {status['message']}")
+            input("\nPress Enter to continue...")
+            return
+        
+        data = status['data']
+        policy = data['policy']
+        print(f"Backup policy: {policy['keep_daily']} daily, {policy['keep_weekly']} weekly, {policy['keep_monthly']} monthly")
+        print(f"Log policy: archive after {policy['log_max_age_days']} days or above {policy['log_max_rows']} rows")
+        print(f"Live log entries: {data['live_log_rows']}")
+        for partition in data['partitions']:
+            print(f"  {partition['month'][:4]}-{partition['month'][4:]}: {partition['rows']} entries")
+        print(f"Archived log entries: {data['archived_rows']} in {data['segments']} segments")
+        print(f"Backups in catalog: {data['backups']}")
+        print(f"Last run: {data['last_run'] or 'Never'}")
+        
+        confirm = input("\nRun retention now? (y/N): ").strip().lower()
+        if confirm == 'y':
+            delete_backups = []
+            plan = self.retention_mgr.plan_backup_pruning()
+            if plan['success'] and plan['data']:
+                print(f"\nBackups outside the retention policy ({len(plan['data'])}):")
+                for filename in plan['data']:
+                    print(f"  {filename}")
+                if input("Permanently delete these backups? (y/N): ").strip().lower() == 'y':
+                    delete_backups = plan['data']
+            result = self.retention_mgr.run_retention(delete_backups=delete_backups)
+            print(f"\n{result['message']}")
+            if result['success'] and not result['data']['complete']:
+                print("More log entries are eligible; run again to continue archiving.")
+        
+        input("\nPress Enter to continue...")
+    
+    def metrics_submenu(self):
+        """Show per-operation latency and counters since startup"""
+        self.console.clear_screen()
+        print("=== PERFORMANCE METRICS ===\n")
+        
+        rows = REGISTRY.snapshot()
+        if not rows:
+            print("No operations recorded yet.")
+        else:
+            print(f"{'Operation':<42} {'Calls':>6} {'Errors':>6} {'p50 ms':>8} {'p99 ms':>8} {'Max ms':>8} {'DB/call':>8} {'Crypto/call':>11}")
+            print("-" * 104)
+            for row in rows:
+                print(f"{row['operation']:<42} {row['calls']:>6} {row['errors']:>6} "
+                      f"{row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>8.2f} "
+                      f"{row['db_roundtrips'] / row['calls']:>8.1f} {row['crypto_ops'] / row['calls']:>11.1f}")
+        
+        choice = input(f"\nE = export to {METRICS_FILE}, R = reset, Enter = back: ").strip().lower()
+        if choice == 'e':
+            try:
+                print(f"Metrics written to {REGISTRY.write_prometheus()}.")
+            except OSError as e:
+                print(f"Error writing metrics file: {str(e)}")
+            input("\nPress Enter to continue...")
+        elif choice == 'r':
+            REGISTRY.reset()
+            print("Metrics reset.")
+            input("\nPress Enter to continue...")
+    
+    def verify_log_integrity_submenu(self):
+        """Check the activity log hash chain for tampering"""
+        self.console.clear_screen()
+        print("=== VERIFY LOG INTEGRITY ===\n")
+        
+        print("A quick check re-reads new entries and the changes the log triggers recorded;")
+        print("edits made directly in the database file can bypass those. Run a full check regularly.\n")
+        full = input("Full verification of every entry? (y/N): ").strip().lower() == 'y'
+        result = self.log_mgr.verify_log_integrity(full=full)
+        if result['success']:
+            print(result['message'])
+            for problem in result['data']['problems']:
+                where = f"Log id {problem['log_id']}" if problem['log_id'] else "Schema"
+                print(f"  ⚠️  {where}: {problem['problem']}")
+            if result['data']['problem_count'] > len(result['data']['problems']):
+                print(f"  ... and {result['data']['problem_count'] - len(result['data']['problems'])} more")
+        else:
+            print(f"Error: {result['message']}")
+        
+        input("\nPress Enter to continue...")
+    
     # ========== BACKUP & RESTORE ==========
     
     def backup_restore_menu(self):
@@ -145,9 +254,10 @@ class AdminMenus:
             print("1. Create Backup")
             print("2. List Backups")
             print("3. Restore from Backup")
+            print("4. Rebuild Backup Catalog")
             if self.session.auth.get_current_user()['role'] == 'super_admin':
-                print("4. Generate Restore Code")
-                print("5. Revoke Restore Code")
+                print("5. Generate Restore Code")
+                print("6. Revoke Restore Code")
             print("\n0. Back to Main Menu")
             print("-" * 40)
             
@@ -161,9 +271,11 @@ class AdminMenus:
                 self.list_backups_submenu()
             elif choice == '3':
                 self.restore_backup_submenu()
-            elif choice == '4' and self.session.auth.get_current_user()['role'] == 'super_admin':
-                self.generate_restore_code_submenu()
+            elif choice == '4':
+                self.rebuild_catalog_submenu()
             elif choice == '5' and self.session.auth.get_current_user()['role'] == 'super_admin':
+                self.generate_restore_code_submenu()
+            elif choice == '6' and self.session.auth.get_current_user()['role'] == 'super_admin':
                 self.revoke_restore_code_submenu()
             else:
                 print("Invalid choice.")
@@ -178,13 +290,25 @@ class AdminMenus:
         if confirm != 'y':
             return
         
+        codecs = available_codecs()
+        print("\nCompression codecs:")
+        for i, name in enumerate(codecs, 1):
+            print(f"{i}. {name:<24} {BACKUP_CODECS[name]['description']}")
+        codec_choice = input(f"Select codec (default {DEFAULT_CODEC}): ").strip()
+        codec = DEFAULT_CODEC
+        if codec_choice.isdigit() and 1 <= int(codec_choice) <= len(codecs):
+            codec = codecs[int(codec_choice) - 1]
+        elif codec_choice in codecs:
+            codec = codec_choice
+        
         print("Creating backup...")
-        result = self.backup_mgr.create_backup()
+        result = self.backup_mgr.create_backup(codec=codec)
         
         print(f"\n{result['message']}")
         if result['success']:
             data = result['data']
             print(f"Backup file: {data['backup_filename']}")
+            print(f"Codec: {data['codec']}")
             print(f"Size: {data['backup_size']} bytes")
         
         input("Press Enter to continue...")
@@ -197,11 +321,12 @@ class AdminMenus:
         result = self.backup_mgr.list_backups()
         if result['success']:
             if result['data']:
-                print(f"{'Filename':<35} {'Size (KB)':<12} {'Created'}")
-                print("-" * 60)
+                print(f"{'Filename':<35} {'Size (KB)':<12} {'Created':<21} {'Codec':<18} {'Tags'}")
+                print("-" * 105)
                 for backup in result['data']:
                     size_kb = backup['size'] // 1024
-                    print(f"{backup['filename']:<35} {size_kb:<12} {backup['created_date']}")
+                    tags = ', '.join(backup['retention_tags'])
+                    print(f"{backup['filename']:<35} {size_kb:<12} {backup['created_date']:<21} {backup['codec']:<18} {tags}")
             else:
                 print("No backups found.")
         else:
@@ -209,6 +334,19 @@ class AdminMenus:
         
         input("\nPress Enter to continue...")
     
+    def rebuild_catalog_submenu(self):
+        """Register backup files missing from the catalog"""
+        self.console.clear_screen()
+        print("=== REBUILD BACKUP CATALOG ===\n")
+        
+        result = self.backup_mgr.rebuild_catalog()
+        print(result['message'])
+        if result['success']:
+            for filename in result['data']:
+                print(f"  + {filename}")
+        
+        input("\nPress Enter to continue...")
+    
     def restore_backup_submenu(self):
         """Restore from backup"""
         self.console.clear_screen()
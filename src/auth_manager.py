@@ -1,15 +1,49 @@
 # auth_manager.py
 from database_manager import DatabaseManager, InputValidator
 from datetime import datetime
+from contextlib import contextmanager
+import contextvars
+import threading
 import time
+from metrics import instrument
 
+
+# Identity of the operator the current thread/task acts for. Kept in context
+# variables instead of on the managers so one set of managers can serve many
+# threads or asyncio tasks, each with its own user.
+_current_user = contextvars.ContextVar('current_user', default=None)
+_session_start_time = contextvars.ContextVar('session_start_time', default=None)
+
+
+@contextmanager
+def session_scope(user, session_start_time=None):
+    """Act as user (a current_user dict, or None) for the duration of the block"""
+    user_token = _current_user.set(user)
+    start_token = _session_start_time.set(session_start_time)
+    try:
+        yield
+    finally:
+        _current_user.reset(user_token)
+        _session_start_time.reset(start_token)
+
+
+@instrument
 class AuthenticationManager:
     def __init__(self):
         self.db = DatabaseManager()
-        self.current_user = None
         self.failed_attempts = {}  # Track failed login attempts
+        self._attempts_lock = threading.Lock()
         self.max_attempts = 3
         self.lockout_time = 300  # 5 minutes in seconds
+
+    @property
+    def current_user(self):
+        """User of the current context (thread/task), None when logged out"""
+        return _current_user.get()
+
+    @current_user.setter
+    def current_user(self, user):
+        _current_user.set(user)
     
     def login(self, username, password):
         """Authenticate user and return user info if successful"""
@@ -106,24 +140,25 @@ class AuthenticationManager:
     def _record_failed_attempt(self, username):
         """Record a failed login attempt"""
         current_time = time.time()
-        if username not in self.failed_attempts:
-            self.failed_attempts[username] = {'count': 0, 'last_attempt': current_time}
-        
-        self.failed_attempts[username]['count'] += 1
-        self.failed_attempts[username]['last_attempt'] = current_time
+        with self._attempts_lock:
+            if username not in self.failed_attempts:
+                self.failed_attempts[username] = {'count': 0, 'last_attempt': current_time}
+            
+            self.failed_attempts[username]['count'] += 1
+            self.failed_attempts[username]['last_attempt'] = current_time
     
     def _reset_failed_attempts(self, username):
         """Reset failed attempts counter"""
-        if username in self.failed_attempts:
-            del self.failed_attempts[username]
+        with self._attempts_lock:
+            self.failed_attempts.pop(username, None)
     
     def _is_locked_out(self, username):
         """Check if user is currently locked out"""
         username_lower = username.lower()
-        if username_lower not in self.failed_attempts:
+        attempts_data = self.failed_attempts.get(username_lower)
+        if attempts_data is None:
             return False
         
-        attempts_data = self.failed_attempts[username_lower]
         if attempts_data['count'] < self.max_attempts:
             return False
         
@@ -137,11 +172,11 @@ class AuthenticationManager:
     
     def _get_remaining_lockout_time(self, username):
         """Get remaining lockout time in seconds"""
-        username_lower = username.lower()
-        if username_lower not in self.failed_attempts:
+        attempts_data = self.failed_attempts.get(username.lower())
+        if attempts_data is None:
             return 0
         
-        time_passed = time.time() - self.failed_attempts[username_lower]['last_attempt']
+        time_passed = time.time() - attempts_data['last_attempt']
         remaining = max(0, self.lockout_time - time_passed)
         return int(remaining)
     
@@ -152,10 +187,7 @@ class AuthenticationManager:
         
         conn = self.db.get_connection()
         cursor = conn.cursor()
-        count = cursor.execute('''
-            SELECT COUNT(*) FROM activity_logs 
-            WHERE suspicious = 1 AND read_status = 0
-        ''').fetchone()[0]
+        count = self.db.log_router.count_unread_suspicious(cursor)
         conn.close()
         return count
     
@@ -203,13 +235,15 @@ class AuthorizationManager:
                 'manage_scooters', 'view_logs', 'create_backup', 'restore_backup',
                 'generate_restore_code', 'revoke_restore_code', 'view_users',
                 'search_travellers', 'search_scooters', 'update_scooter_info',
-                'update_own_password'
+                'update_own_password', 'manage_retention', 'view_metrics',
+                'export_travellers', 'read_changes'
             ],
             'system_admin': [
                 'manage_service_engineers', 'manage_travellers', 'manage_scooters',
                 'view_logs', 'create_backup', 'restore_specific_backup', 'view_users',
                 'search_travellers', 'search_scooters', 'update_scooter_info',
-                'update_own_password', 'update_own_profile', 'delete_own_account'
+                'update_own_password', 'update_own_profile', 'delete_own_account',
+                'export_travellers', 'read_changes'
             ],
             'service_engineer': [
                 'update_scooter_info', 'search_scooters', 'update_own_password'
@@ -230,13 +264,15 @@ class AuthorizationManager:
                 'manage_system_admins', 'manage_service_engineers', 'manage_travellers',
                 'manage_scooters', 'view_logs', 'create_backup', 'restore_backup',
                 'generate_restore_code', 'revoke_restore_code', 'view_users',
-                'search_travellers', 'search_scooters', 'update_scooter_info'
+                'search_travellers', 'search_scooters', 'update_scooter_info',
+                'manage_retention', 'view_metrics', 'export_travellers', 'read_changes'
             ],
             'system_admin': [
                 'manage_service_engineers', 'manage_travellers', 'manage_scooters',
                 'view_logs', 'create_backup', 'restore_specific_backup', 'view_users',
                 'search_travellers', 'search_scooters', 'update_scooter_info',
-                'update_own_profile', 'delete_own_account'
+                'update_own_profile', 'delete_own_account', 'export_travellers',
+                'read_changes'
             ],
             'service_engineer': [
                 'update_scooter_info', 'search_scooters'
@@ -289,8 +325,16 @@ class SessionManager:
     def __init__(self):
         self.auth = AuthenticationManager()
         self.authz = AuthorizationManager(self.auth)
-        self.session_start_time = None
     
+    @property
+    def session_start_time(self):
+        """Start of the current context's session"""
+        return _session_start_time.get()
+
+    @session_start_time.setter
+    def session_start_time(self, value):
+        _session_start_time.set(value)
+
     def start_session(self):
         """Start a new session"""
         self.session_start_time = datetime.now()
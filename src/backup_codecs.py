@@ -0,0 +1,268 @@
+# backup_codecs.py
+import os
+import sys
+import time
+import zipfile
+import zlib
+import lzma
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional
+    zstandard = None
+
+
+CHUNK_SIZE = 4 * 1024 * 1024  # 4 MiB per compression job
+CHUNK_MAGIC = b'UMCHUNK1'
+CHUNKED_SUFFIX = '.chunks'
+DEFAULT_CODEC = 'deflate'
+
+# Codecs either map onto a native zipfile compression method ('zip') or
+# compress the database in independent chunks on a thread pool ('chunked').
+# zlib, lzma and zstandard release the GIL, so chunks compress in parallel.
+BACKUP_CODECS = {
+    'stored': {'kind': 'zip', 'compression': zipfile.ZIP_STORED, 'level': None,
+               'description': 'No compression (fastest, largest)'},
+    'deflate-fast': {'kind': 'zip', 'compression': zipfile.ZIP_DEFLATED, 'level': 1,
+                     'description': 'Deflate level 1'},
+    'deflate': {'kind': 'zip', 'compression': zipfile.ZIP_DEFLATED, 'level': 6,
+                'description': 'Deflate level 6 (default)'},
+    'deflate-max': {'kind': 'zip', 'compression': zipfile.ZIP_DEFLATED, 'level': 9,
+                    'description': 'Deflate level 9'},
+    'lzma': {'kind': 'zip', 'compression': zipfile.ZIP_LZMA, 'level': None,
+             'description': 'LZMA (smallest, slowest)'},
+    'deflate-parallel': {'kind': 'chunked', 'algorithm': 'zlib', 'level': 6,
+                         'description': 'Deflate level 6, multi-threaded chunks'},
+    'deflate-fast-parallel': {'kind': 'chunked', 'algorithm': 'zlib', 'level': 1,
+                              'description': 'Deflate level 1, multi-threaded chunks'},
+    'lzma-parallel': {'kind': 'chunked', 'algorithm': 'lzma', 'level': 6,
+                      'description': 'LZMA preset 6, multi-threaded chunks'},
+    'zstd': {'kind': 'chunked', 'algorithm': 'zstd', 'level': 3,
+             'description': 'Zstandard level 3, multi-threaded chunks (optional)'},
+}
+
+
+def available_codecs():
+    """Return the codec names usable in this environment"""
+    return [name for name, codec in BACKUP_CODECS.items()
+            if codec.get('algorithm') != 'zstd' or zstandard is not None]
+
+
+def get_codec(name):
+    """Look up a codec by name, raising ValueError if it cannot be used"""
+    if name not in BACKUP_CODECS:
+        raise ValueError(f"Unknown backup codec '{name}'. Available: {', '.join(available_codecs())}")
+    if name not in available_codecs():
+        raise ValueError(f"Backup codec '{name}' requires the 'zstandard' package.")
+    return BACKUP_CODECS[name]
+
+
+def _compress_chunk(algorithm, level, data):
+    """Compress a single chunk with the given algorithm"""
+    if algorithm == 'zlib':
+        return zlib.compress(data, level)
+    if algorithm == 'lzma':
+        return lzma.compress(data, preset=level)
+    if algorithm == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Unsupported chunk algorithm '{algorithm}'")
+
+
+def _decompress_chunk(algorithm, data):
+    """Decompress a single chunk with the given algorithm"""
+    if algorithm == 'zlib':
+        return zlib.decompress(data)
+    if algorithm == 'lzma':
+        return lzma.decompress(data)
+    if algorithm == 'zstd':
+        if zstandard is None:
+            raise ValueError("Backup was written with zstd but 'zstandard' is not installed.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported chunk algorithm '{algorithm}'")
+
+
+def _read_chunks(path, chunk_size):
+    """Yield fixed-size chunks of a file"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _default_workers():
+    return min(8, os.cpu_count() or 1)
+
+
+def compress_file_chunked(source_path, out, algorithm, level, workers=None, chunk_size=CHUNK_SIZE):
+    """Compress a file into the chunked container format, writing to out.
+
+    Layout: magic, algorithm name (length-prefixed), then per chunk a
+    (compressed length, raw length) header followed by the payload.
+    At most two chunks per worker are in flight, so memory stays bounded.
+    """
+    workers = workers or _default_workers()
+    name = algorithm.encode()
+    out.write(CHUNK_MAGIC + struct.pack('>B', len(name)) + name)
+
+    def write_frame(raw, future):
+        packed = future.result()
+        out.write(struct.pack('>II', len(packed), len(raw)))
+        out.write(packed)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in _read_chunks(source_path, chunk_size):
+            pending.append((chunk, executor.submit(_compress_chunk, algorithm, level, chunk)))
+            if len(pending) >= workers * 2:
+                write_frame(*pending.popleft())
+        while pending:
+            write_frame(*pending.popleft())
+
+
+def _read_exact(source, size):
+    """Read exactly size bytes from a stream, failing on a truncated payload"""
+    data = source.read(size)
+    if len(data) != size:
+        raise ValueError('Truncated chunked backup payload.')
+    return data
+
+
+def _read_frames(source):
+    """Yield (compressed chunk, raw length) frames from a chunked container stream"""
+    while True:
+        header = source.read(8)
+        if not header:
+            return
+        if len(header) != 8:
+            raise ValueError('Truncated chunked backup payload.')
+        packed_len, raw_len = struct.unpack('>II', header)
+        yield _read_exact(source, packed_len), raw_len
+
+
+def decompress_chunked(source, target_path, workers=None):
+    """Decompress a chunked container read from the stream source into target_path.
+
+    Frames are read as they are decompressed; like compress_file_chunked, at
+    most two chunks per worker are in flight, so memory stays bounded.
+    """
+    if source.read(len(CHUNK_MAGIC)) != CHUNK_MAGIC:
+        raise ValueError('Invalid chunked backup payload.')
+    name_len = _read_exact(source, 1)[0]
+    algorithm = _read_exact(source, name_len).decode()
+
+    def write_frame(out, raw_len, future):
+        raw = future.result()
+        if len(raw) != raw_len:
+            raise ValueError('Corrupt chunk in backup payload.')
+        out.write(raw)
+
+    workers = workers or _default_workers()
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(target_path, 'wb') as out:
+        pending = deque()
+        for packed, raw_len in _read_frames(source):
+            pending.append((raw_len, executor.submit(_decompress_chunk, algorithm, packed)))
+            if len(pending) >= workers * 2:
+                write_frame(out, *pending.popleft())
+        while pending:
+            write_frame(out, *pending.popleft())
+
+
+def write_file_to_zip(backup_zip, source_path, arcname, codec_name, workers=None):
+    """Add a file to an open ZipFile using the selected codec"""
+    codec = get_codec(codec_name)
+    if codec['kind'] == 'zip':
+        backup_zip.write(source_path, arcname,
+                         compress_type=codec['compression'],
+                         compresslevel=codec['level'])
+    else:
+        info = zipfile.ZipInfo(arcname + CHUNKED_SUFFIX,
+                               date_time=time.localtime(os.path.getmtime(source_path))[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        with backup_zip.open(info, 'w', force_zip64=True) as out:
+            compress_file_chunked(source_path, out, codec['algorithm'], codec['level'], workers)
+
+
+def extract_file_from_zip(backup_zip, arcname, target_path, workers=None):
+    """Extract a file written by write_file_to_zip, whichever codec was used.
+
+    Returns False if the archive does not contain the file.
+    """
+    names = backup_zip.namelist()
+    if arcname + CHUNKED_SUFFIX in names:
+        with backup_zip.open(arcname + CHUNKED_SUFFIX) as src:
+            decompress_chunked(src, target_path, workers)
+        return True
+    if arcname in names:
+        with backup_zip.open(arcname) as src, open(target_path, 'wb') as out:
+            while True:
+                block = src.read(CHUNK_SIZE)
+                if not block:
+                    break
+                out.write(block)
+        return True
+    return False
+
+
+def benchmark_codecs(source_path, codecs=None, workers=None):
+    """Measure size and time of every codec on a file.
+
+    Returns a list of dicts sorted by compression time.
+    """
+    import tempfile
+
+    raw_size = os.path.getsize(source_path)
+    arcname = os.path.basename(source_path)
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in codecs or available_codecs():
+            zip_path = os.path.join(tmp_dir, f"{name}.zip")
+            restored_path = os.path.join(tmp_dir, f"{name}.restored")
+
+            start = time.perf_counter()
+            with zipfile.ZipFile(zip_path, 'w') as backup_zip:
+                write_file_to_zip(backup_zip, source_path, arcname, name, workers)
+            compress_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with zipfile.ZipFile(zip_path, 'r') as backup_zip:
+                extract_file_from_zip(backup_zip, arcname, restored_path, workers)
+            decompress_time = time.perf_counter() - start
+
+            size = os.path.getsize(zip_path)
+            results.append({
+                'codec': name,
+                'size': size,
+                'ratio': raw_size / size if size else 0.0,
+                'compress_seconds': compress_time,
+                'decompress_seconds': decompress_time,
+                'description': BACKUP_CODECS[name]['description']
+            })
+
+    results.sort(key=lambda r: r['compress_seconds'])
+    return results
+
+
+def print_benchmark(source_path, workers=None):
+    """Print a size/time trade-off table for all codecs"""
+    raw_size = os.path.getsize(source_path)
+    print(f"Benchmarking backup codecs on {source_path} ({raw_size} bytes)\n")
+    print(f"{'Codec':<24} {'Size (bytes)':>14} {'Ratio':>7} {'Compress (s)':>13} {'Restore (s)':>12}")
+    print("-" * 75)
+    for result in benchmark_codecs(source_path, workers=workers):
+        print(f"{result['codec']:<24} {result['size']:>14} {result['ratio']:>7.2f} "
+              f"{result['compress_seconds']:>13.4f} {result['decompress_seconds']:>12.4f}")
+
+
+if __name__ == "__main__":
+    # Usage: python backup_codecs.py [db_path]
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "data/urban_mobility.db"
+    if not os.path.exists(db_path):
+        print(f"Database not found: {db_path}")
+        sys.exit(1)
+    print_benchmark(db_path)
@@ -1,13 +1,18 @@
 # backup_logging_manager.py
 from database_manager import DatabaseManager
+from retention_manager import LogArchive
+from log_partitions import to_timestamp
+from models import LogEntry, User, LOG_COLUMNS, USER_PROFILE_COLUMNS
 from datetime import datetime
 import os
-import shutil
-import zipfile
 import secrets
 import string
+import json
+import hashlib
+from metrics import instrument
 
 
+@instrument
 class LogManager:
     def __init__(self, session_manager):
         self.db = DatabaseManager()
@@ -32,54 +37,38 @@ class LogManager:
             }
 
         try:
-            conn = self.db.get_connection()
+            # Marking suspicious entries as read needs the live database
+            conn = (self.db.get_connection() if show_suspicious_only
+                    else self.db.get_read_connection())
             cursor = conn.cursor()
 
-            # Build query based on filters
-            query = '''
-                SELECT id, date, time, username, description, additional_info, suspicious, read_status
-                FROM activity_logs
-            '''
-            params = []
-
-            if show_suspicious_only:
-                query += ' WHERE suspicious = 1'
-
-            query += ' ORDER BY id DESC LIMIT ?'
-            params.append(limit)
-
-            cursor.execute(query, params)
-            logs = cursor.fetchall()
+            # Newest partitions first, stopping once the limit is reached
+            partitioned_logs = self.db.log_router.fetch_recent(
+                cursor, limit, suspicious_only=show_suspicious_only)
+            logs = [log for _, log in partitioned_logs]
 
             # Mark suspicious logs as read
             if show_suspicious_only and logs:
-                suspicious_ids = [log[0]
-                                  # suspicious = 1
-                                  for log in logs if log[6] == 1]
+                suspicious_ids = {}
+                for partition, log in partitioned_logs:
+                    if log[6] == 1:  # suspicious = 1
+                        suspicious_ids.setdefault(partition, []).append(log[0])
                 if suspicious_ids:
-                    placeholders = ','.join('?' * len(suspicious_ids))
-                    cursor.execute(f'''
-                        UPDATE activity_logs SET read_status = 1 
-                        WHERE id IN ({placeholders})
-                    ''', suspicious_ids)
+                    self.db.log_router.mark_read(cursor, suspicious_ids)
                     conn.commit()
 
             conn.close()
 
             # Decrypt log entries
+            make_entry = LogEntry.row_factory(LOG_COLUMNS)
             decrypted_logs = []
             for log in logs:
-                decrypted_log = {
-                    'id': log[0],
-                    'date': log[1],
-                    'time': log[2],
-                    'username': self.db.decrypt_data(log[3]) if log[3] else 'SYSTEM',
-                    'description': self.db.decrypt_data(log[4]),
-                    'additional_info': self.db.decrypt_data(log[5]) if log[5] else '',
-                    'suspicious': bool(log[6]),
-                    'read_status': bool(log[7])
-                }
-                decrypted_logs.append(decrypted_log)
+                entry = make_entry(None, log)
+                entry.username = self.db.decrypt_data(entry.username) if entry.username else 'SYSTEM'
+                entry.description = self.db.decrypt_data(entry.description)
+                entry.additional_info = (self.db.decrypt_data(entry.additional_info)
+                                         if entry.additional_info else '')
+                decrypted_logs.append(entry)
 
             # Log this access
             self.db.log_activity(
@@ -101,6 +90,32 @@ class LogManager:
                 'data': None
             }
 
+    def get_unread_suspicious_count(self):
+        """Number of unread suspicious activities (one counter row, for login alerts)"""
+        if not self.authz.check_permission('view_logs'):
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot view suspicious activities.',
+                'data': None
+            }
+
+        try:
+            conn = self.db.get_connection()
+            unread_count = self.db.log_router.count_unread_suspicious(conn.cursor())
+            conn.close()
+            return {
+                'success': True,
+                'message': f'{unread_count} unread suspicious activities.',
+                'data': {'unread_count': unread_count}
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error counting suspicious activities: {str(e)}',
+                'data': None
+            }
+
     def get_suspicious_activity_summary(self):
         """Get summary of suspicious activities"""
         if not self.authz.check_permission('view_logs'):
@@ -115,20 +130,11 @@ class LogManager:
             cursor = conn.cursor()
 
             # Get unread suspicious activities count
-            unread_count = cursor.execute('''
-                SELECT COUNT(*) FROM activity_logs 
-                WHERE suspicious = 1 AND read_status = 0
-            ''').fetchone()[0]
+            unread_count = self.db.log_router.count_unread_suspicious(cursor)
 
             # Get recent suspicious activities (last 10)
-            cursor.execute('''
-                SELECT date, time, username, description, additional_info
-                FROM activity_logs
-                WHERE suspicious = 1
-                ORDER BY id DESC LIMIT 10
-            ''')
-
-            recent_suspicious = cursor.fetchall()
+            recent_suspicious = [log[1:6] for _, log in
+                                 self.db.log_router.fetch_recent(cursor, 10, suspicious_only=True)]
             conn.close()
 
             # Decrypt recent activities
@@ -159,8 +165,8 @@ class LogManager:
                 'data': None
             }
 
-    def search_logs(self, search_term, date_from=None, date_to=None):
-        """Search logs by term and date range"""
+    def search_logs(self, search_term, date_from=None, date_to=None, include_archived=False):
+        """Search logs by term and date range, optionally including archived segments"""
         if not self.authz.check_permission('view_logs'):
             return {
                 'success': False,
@@ -169,36 +175,23 @@ class LogManager:
             }
 
         try:
-            conn = self.db.get_connection()
+            # Full decrypt scans run on the read replica when replica mode is on
+            conn = self.db.get_read_connection()
             cursor = conn.cursor()
 
             # Note: Since logs are encrypted, we need to decrypt them to search
-            # This is less efficient but necessary for security
-            query = 'SELECT * FROM activity_logs'
-            params = []
-
-            # Add date filters if provided
-            conditions = []
-            if date_from:
-                conditions.append('date >= ?')
-                params.append(date_from)
-            if date_to:
-                conditions.append('date <= ?')
-                params.append(date_to)
-
-            if conditions:
-                query += ' WHERE ' + ' AND '.join(conditions)
-
-            query += ' ORDER BY id DESC'
-
-            cursor.execute(query, params)
-            all_logs = cursor.fetchall()
+            # This is less efficient but necessary for security.
+            # The date range becomes an index range scan on ts, and only
+            # partitions whose month overlaps the range are read.
+            all_logs = [log for _, log in self.db.log_router.fetch_window(
+                cursor, to_timestamp(date_from), to_timestamp(date_to, end_of_day=True))]
             conn.close()
 
             # Decrypt and filter logs
             matching_logs = []
             search_lower = search_term.lower()
 
+            make_entry = LogEntry.row_factory(LOG_COLUMNS)
             for log in all_logs:
                 # Decrypt fields for searching
                 username = self.db.decrypt_data(log[3]) if log[3] else 'SYSTEM'
@@ -211,22 +204,23 @@ class LogManager:
                     search_lower in (description or "").lower() or
                         search_lower in (additional_info or "").lower()):
 
-                    matching_logs.append({
-                        'id': log[0],
-                        'date': log[1],
-                        'time': log[2],
-                        'username': username,
-                        'description': description,
-                        'additional_info': additional_info,
-                        'suspicious': bool(log[6]),
-                        'read_status': bool(log[7])
-                    })
+                    entry = make_entry(None, log)
+                    entry.username = username
+                    entry.description = description
+                    entry.additional_info = additional_info
+                    matching_logs.append(entry)
+
+            # Archived segments are only decrypted when asked for
+            if include_archived:
+                matching_logs.extend(
+                    LogArchive(self.db).search(search_term, date_from, date_to))
 
             # Log this search
             self.db.log_activity(
                 self.auth.current_user['username'],
                 "Log search performed",
-                f"Search term: '{search_term}', Results: {len(matching_logs)}"
+                f"Search term: '{search_term}', Results: {len(matching_logs)}, "
+                f"Archived included: {include_archived}"
             )
 
             return {
@@ -243,6 +237,111 @@ class LogManager:
             }
 
 
+    def get_logs_in_window(self, start, end=None, limit=None, suspicious_only=False):
+        """Get logs between two points in time, newest first.
+
+        start and end accept datetimes, epoch seconds or dates (DD-MM-YYYY or
+        YYYY-MM-DD, covering the whole day).
+        """
+        if not self.authz.check_permission('view_logs'):
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot view system logs.',
+                'data': None
+            }
+
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            logs = [log for _, log in self.db.log_router.fetch_window(
+                cursor, to_timestamp(start), to_timestamp(end, end_of_day=True),
+                limit, suspicious_only)]
+            conn.close()
+
+            decrypted_logs = []
+            for log in logs:
+                decrypted_logs.append({
+                    'id': log[0],
+                    'date': log[1],
+                    'time': log[2],
+                    'username': self.db.decrypt_data(log[3]) if log[3] else 'SYSTEM',
+                    'description': self.db.decrypt_data(log[4]),
+                    'additional_info': self.db.decrypt_data(log[5]) if log[5] else '',
+                    'suspicious': bool(log[6]),
+                    'read_status': bool(log[7])
+                })
+
+            return {
+                'success': True,
+                'message': f'Retrieved {len(decrypted_logs)} log entries.',
+                'data': decrypted_logs
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error retrieving logs: {str(e)}',
+                'data': None
+            }
+
+    def verify_log_integrity(self, full=False):
+        """Verify the log hash chain (only what changed since the last checkpoint unless full)"""
+        if not self.authz.check_permission('view_logs'):
+            self.db.log_activity(
+                self.auth.current_user['username'],
+                "Unauthorized log verification attempt",
+                "Attempted to verify the activity log",
+                suspicious=True
+            )
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot verify system logs.',
+                'data': None
+            }
+
+        try:
+            with self.db.read_transaction() as cursor:
+                report = self.db.log_chain.verify(cursor, full=full)
+            with self.db.transaction() as cursor:
+                self.db.log_chain.record_verification(cursor, report)
+                if report['intact']:
+                    self.db.log_activity(
+                        self.auth.current_user['username'],
+                        "Activity log verified",
+                        f"{report['rows_checked']} entries, {report['checkpoints']} checkpoints",
+                        cursor=cursor
+                    )
+                else:
+                    first = report['problems'][0]
+                    self.db.log_activity(
+                        self.auth.current_user['username'],
+                        "Activity log tampering detected",
+                        f"{report['problem_count']} problems, first at log id {first['log_id']}: "
+                        f"{first['problem']}",
+                        suspicious=True,
+                        cursor=cursor
+                    )
+
+            if report['intact']:
+                message = (f"Activity log intact: {report['rows_checked']} entries re-checked, "
+                           f"{report['checkpoints']} checkpoints in {report['elapsed_seconds']}s.")
+            else:
+                message = f"Activity log tampering detected: {report['problem_count']} problems."
+            return {
+                'success': True,
+                'message': message,
+                'data': report
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error verifying logs: {str(e)}',
+                'data': None
+            }
+
+
+@instrument
 class BackupManager:
     def __init__(self, session_manager):
         self.db = DatabaseManager()
@@ -255,8 +354,13 @@ class BackupManager:
         if not os.path.exists(self.backup_dir):
             os.makedirs(self.backup_dir)
 
-    def create_backup(self):
-        """Create a full system backup"""
+    def create_backup(self, codec=None, workers=None):
+        """Create a full system backup and record it in the backup catalog"""
+        # Backup machinery (zipfile, codecs) loads on first use, not at startup
+        import zipfile
+        from backup_codecs import DEFAULT_CODEC, get_codec, write_file_to_zip
+
+        codec = codec or DEFAULT_CODEC
         # Check permissions
         if not self.authz.check_permission('create_backup'):
             self.db.log_activity(
@@ -271,18 +375,33 @@ class BackupManager:
                 'data': None
             }
 
+        try:
+            get_codec(codec)
+        except ValueError as e:
+            return {
+                'success': False,
+                'message': str(e),
+                'data': None
+            }
+
         try:
             # Generate backup filename with timestamp
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            backup_time = datetime.now()
+            timestamp = backup_time.strftime('%Y%m%d_%H%M%S')
             backup_filename = f"urban_mobility_backup_{timestamp}.zip"
             backup_path = os.path.join(self.backup_dir, backup_filename)
 
+            # Snapshot catalog facts before archiving
+            row_counts = self.db.get_table_row_counts()
+            schema_version = self.db.get_schema_version()
+
             # Create backup zip file
             with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as backup_zip:
-                # Add database file
+                # Add database file with the selected codec
                 db_path = self.db.db_path
                 if os.path.exists(db_path):
-                    backup_zip.write(db_path, os.path.basename(db_path))
+                    write_file_to_zip(backup_zip, db_path,
+                                      os.path.basename(db_path), codec, workers)
 
                 # Add encryption key
                 key_path = "encryption.key"
@@ -291,19 +410,32 @@ class BackupManager:
 
                 # Add backup metadata
                 metadata = {
-                    'backup_date': datetime.now().isoformat(),
+                    'backup_date': backup_time.isoformat(),
                     'created_by': self.auth.current_user['username'],
                     'version': '1.0',
+                    'codec': codec,
+                    'schema_version': schema_version,
+                    'row_counts': row_counts,
                     'description': 'Full Urban Mobility system backup'
                 }
 
-                backup_zip.writestr('backup_metadata.txt', str(metadata))
+                backup_zip.writestr('backup_metadata.json', json.dumps(metadata, indent=2))
+
+            # Record the backup in the catalog
+            backup_size = os.path.getsize(backup_path)
+            retention_tags = self._retention_tags_for(backup_time)
+            self._add_catalog_entry(
+                backup_filename, backup_time.strftime('%Y-%m-%d %H:%M:%S'),
+                self.auth.current_user['username'], backup_size,
+                self._file_checksum(backup_path), codec, schema_version,
+                row_counts, retention_tags
+            )
 
             # Log backup creation
             self.db.log_activity(
                 self.auth.current_user['username'],
                 "System backup created",
-                f"Backup file: {backup_filename}"
+                f"Backup file: {backup_filename}, Codec: {codec}"
             )
 
             return {
@@ -312,7 +444,9 @@ class BackupManager:
                 'data': {
                     'backup_filename': backup_filename,
                     'backup_path': backup_path,
-                    'backup_size': os.path.getsize(backup_path)
+                    'backup_size': backup_size,
+                    'codec': codec,
+                    'retention_tags': retention_tags
                 }
             }
 
@@ -325,6 +459,10 @@ class BackupManager:
 
     def restore_backup(self, backup_filename, restore_code=None):
         """Restore system from backup"""
+        import shutil
+        import zipfile
+        from backup_codecs import CHUNKED_SUFFIX, extract_file_from_zip
+
         # Check permissions and restore code requirements
         current_role = self.auth.current_user['role']
 
@@ -374,25 +512,59 @@ class BackupManager:
                     'data': None
                 }
 
+            # Verify archive integrity against the catalog checksum
+            catalog_entry = self._get_catalog_entry(backup_filename)
+            if catalog_entry and self._file_checksum(backup_path) != catalog_entry['checksum']:
+                self.db.log_activity(
+                    self.auth.current_user['username'],
+                    "Backup checksum mismatch",
+                    f"Backup file: {backup_filename}",
+                    suspicious=True
+                )
+                return {
+                    'success': False,
+                    'message': 'Backup file checksum does not match the catalog. Restore aborted.',
+                    'data': None
+                }
+
             # Create restore directory
             restore_dir = "restore_temp"
             if os.path.exists(restore_dir):
                 shutil.rmtree(restore_dir)
             os.makedirs(restore_dir)
 
-            # Extract backup
+            # Extract backup (database may be stored with a chunked codec)
+            db_name = os.path.basename(self.db.db_path)
             with zipfile.ZipFile(backup_path, 'r') as backup_zip:
-                backup_zip.extractall(restore_dir)
+                for member in backup_zip.namelist():
+                    if member not in (db_name, db_name + CHUNKED_SUFFIX):
+                        backup_zip.extract(member, restore_dir)
+                extract_file_from_zip(backup_zip, db_name,
+                                      os.path.join(restore_dir, db_name))
 
             # Backup current database before restore
             current_db_backup = f"pre_restore_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
             shutil.copy2(self.db.db_path, current_db_backup)
 
+            # Keep the current catalog, the restored database predates newer backups
+            current_catalog = self._get_catalog_rows()
+            # ... and the changelog position and consumers, which it predates too
+            conn = self.db.get_connection()
+            changelog_head = self.db.changelog.head(conn.cursor())
+            current_consumers = [row[0] for row in conn.execute('SELECT name FROM changelog_consumers')]
+            conn.close()
+            dropped_consumers = []
+
             # Restore database
             restored_db_path = os.path.join(
                 restore_dir, os.path.basename(self.db.db_path))
             if os.path.exists(restored_db_path):
                 shutil.copy2(restored_db_path, self.db.db_path)
+                self.db.init_database()
+                self._merge_catalog_rows(current_catalog)
+                with self.db.transaction() as cursor:
+                    dropped_consumers = sorted(set(current_consumers).union(
+                        self.db.changelog.after_restore(cursor, changelog_head)))
 
             # Restore encryption key if exists
             restored_key_path = os.path.join(restore_dir, "encryption.key")
@@ -410,7 +582,8 @@ class BackupManager:
             self.db.log_activity(
                 self.auth.current_user['username'],
                 "System restored from backup",
-                f"Backup file: {backup_filename}, Restore code used: {bool(restore_code)}"
+                f"Backup file: {backup_filename}, Restore code used: {bool(restore_code)}, "
+                f"Changelog consumers dropped: {', '.join(dropped_consumers) or 'none'}"
             )
 
             return {
@@ -418,7 +591,8 @@ class BackupManager:
                 'message': 'System restored successfully. Please restart the application.',
                 'data': {
                     'backup_filename': backup_filename,
-                    'current_db_backup': current_db_backup
+                    'current_db_backup': current_db_backup,
+                    'dropped_consumers': dropped_consumers
                 }
             }
 
@@ -585,8 +759,8 @@ class BackupManager:
                 'data': None
             }
 
-    def list_backups(self):
-        """List all available backup files"""
+    def list_backups(self, tag=None, created_by=None, limit=None):
+        """List backups from the catalog, optionally filtered by retention tag or creator"""
         if not self.authz.check_permission('create_backup'):
             return {
                 'success': False,
@@ -595,23 +769,46 @@ class BackupManager:
             }
 
         try:
-            backups = []
+            query = '''
+                SELECT filename, size, created_date, created_by, checksum, codec,
+                       schema_version, row_counts, retention_tags
+                FROM backup_catalog
+                WHERE deleted = 0
+            '''
+            params = []
 
-            if os.path.exists(self.backup_dir):
-                for filename in os.listdir(self.backup_dir):
-                    if filename.endswith('.zip'):
-                        file_path = os.path.join(self.backup_dir, filename)
-                        stat_info = os.stat(file_path)
+            if tag:
+                query += " AND (',' || retention_tags || ',') LIKE ?"
+                params.append(f'%,{tag},%')
+            if created_by:
+                query += ' AND created_by = ?'
+                params.append(created_by)
 
-                        backups.append({
-                            'filename': filename,
-                            'size': stat_info.st_size,
-                            'created_date': datetime.fromtimestamp(stat_info.st_ctime).strftime('%Y-%m-%d %H:%M:%S'),
-                            'modified_date': datetime.fromtimestamp(stat_info.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
-                        })
+            # Newest first
+            query += ' ORDER BY created_date DESC, id DESC'
+            if limit:
+                query += ' LIMIT ?'
+                params.append(limit)
 
-            # Sort by creation date (newest first)
-            backups.sort(key=lambda x: x['created_date'], reverse=True)
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            conn.close()
+
+            backups = []
+            for row in rows:
+                backups.append({
+                    'filename': row[0],
+                    'size': row[1],
+                    'created_date': row[2],
+                    'created_by': row[3],
+                    'checksum': row[4],
+                    'codec': row[5],
+                    'schema_version': row[6],
+                    'row_counts': json.loads(row[7]),
+                    'retention_tags': row[8].split(',') if row[8] else []
+                })
 
             return {
                 'success': True,
@@ -626,6 +823,182 @@ class BackupManager:
                 'data': None
             }
 
+    def rebuild_catalog(self):
+        """Register backup archives that are on disk but missing from the catalog.
+
+        Only needed for backups created before the catalog existed or copied in
+        by hand; this is the one operation that scans the backup directory.
+        """
+        from backup_codecs import DEFAULT_CODEC
+
+        if not self.authz.check_permission('create_backup'):
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot manage backups.',
+                'data': None
+            }
+
+        try:
+            known = {row['filename'] for row in self._get_catalog_rows()}
+            added = []
+
+            for filename in sorted(os.listdir(self.backup_dir)):
+                if not filename.endswith('.zip') or filename in known:
+                    continue
+
+                backup_path = os.path.join(self.backup_dir, filename)
+                metadata = self._read_archive_metadata(backup_path)
+                created = metadata.get('backup_date')
+                created_date = (datetime.fromisoformat(created) if created
+                                else datetime.fromtimestamp(os.path.getmtime(backup_path)))
+
+                self._add_catalog_entry(
+                    filename, created_date.strftime('%Y-%m-%d %H:%M:%S'),
+                    metadata.get('created_by', 'UNKNOWN'), os.path.getsize(backup_path),
+                    self._file_checksum(backup_path), metadata.get('codec', DEFAULT_CODEC),
+                    metadata.get('schema_version', 1), metadata.get('row_counts', {}),
+                    ['imported']
+                )
+                added.append(filename)
+
+            self.db.log_activity(
+                self.auth.current_user['username'],
+                "Backup catalog rebuilt",
+                f"Registered {len(added)} backup files"
+            )
+
+            return {
+                'success': True,
+                'message': f'Registered {len(added)} backup files in the catalog.',
+                'data': added
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error rebuilding backup catalog: {str(e)}',
+                'data': None
+            }
+
+    def _add_catalog_entry(self, filename, created_date, created_by, size, checksum,
+                           codec, schema_version, row_counts, retention_tags):
+        """Insert a backup into the catalog"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO backup_catalog (
+                filename, created_date, created_by, size, checksum, codec,
+                schema_version, row_counts, retention_tags
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (filename, created_date, created_by, size, checksum, codec,
+              schema_version, json.dumps(row_counts), ','.join(retention_tags)))
+
+        conn.commit()
+        conn.close()
+
+    def _get_catalog_entry(self, filename):
+        """Get a single catalog entry by filename"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT filename, size, checksum, codec, created_date
+            FROM backup_catalog
+            WHERE filename = ? AND deleted = 0
+        ''', (filename,))
+
+        entry = cursor.fetchone()
+        conn.close()
+
+        if entry:
+            return {
+                'filename': entry[0],
+                'size': entry[1],
+                'checksum': entry[2],
+                'codec': entry[3],
+                'created_date': entry[4]
+            }
+        return None
+
+    def _get_catalog_rows(self):
+        """Get all catalog rows as dicts (used to carry the catalog across restores)"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT filename, created_date, created_by, size, checksum, codec,
+                   schema_version, row_counts, retention_tags, deleted
+            FROM backup_catalog
+        ''')
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+
+    def _merge_catalog_rows(self, rows):
+        """Re-apply the pre-restore catalog; it describes the files actually on disk"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.executemany('''
+            INSERT OR REPLACE INTO backup_catalog (
+                filename, created_date, created_by, size, checksum, codec,
+                schema_version, row_counts, retention_tags, deleted
+            ) VALUES (:filename, :created_date, :created_by, :size, :checksum, :codec,
+                      :schema_version, :row_counts, :retention_tags, :deleted)
+        ''', rows)
+
+        conn.commit()
+        conn.close()
+
+    def _retention_tags_for(self, backup_time):
+        """Tag a new backup as the first daily/weekly/monthly backup of its period"""
+        month_start = backup_time.replace(day=1).strftime('%Y-%m-%d')
+        week_start = (backup_time.date().toordinal() - backup_time.weekday())
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT created_date FROM backup_catalog
+            WHERE deleted = 0 AND created_date >= ?
+        ''', (min(month_start, datetime.fromordinal(week_start).strftime('%Y-%m-%d')),))
+        existing = [datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S') for row in cursor.fetchall()]
+        conn.close()
+
+        tags = []
+        if not any(d.date() == backup_time.date() for d in existing):
+            tags.append('daily')
+        if not any(d.date().toordinal() >= week_start for d in existing):
+            tags.append('weekly')
+        if not any((d.year, d.month) == (backup_time.year, backup_time.month) for d in existing):
+            tags.append('monthly')
+        return tags
+
+    def _file_checksum(self, path):
+        """SHA-256 of a file, streamed"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _read_archive_metadata(self, backup_path):
+        """Read metadata from an archive (JSON, or the legacy str(dict) format)"""
+        import ast
+        import zipfile
+
+        try:
+            with zipfile.ZipFile(backup_path, 'r') as backup_zip:
+                names = backup_zip.namelist()
+                if 'backup_metadata.json' in names:
+                    return json.loads(backup_zip.read('backup_metadata.json'))
+                if 'backup_metadata.txt' in names:
+                    return ast.literal_eval(backup_zip.read('backup_metadata.txt').decode())
+        except Exception:
+            pass
+        return {}
+
     def _validate_restore_code(self, restore_code, backup_filename):
         """Validate restore code for specific backup and user"""
         try:
@@ -706,23 +1079,13 @@ class BackupManager:
         conn = self.db.get_connection()
         cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT id, username, role, first_name, last_name, registration_date, created_by
+        cursor.row_factory = User.row_factory(USER_PROFILE_COLUMNS)
+        cursor.execute(f'''
+            SELECT {', '.join(USER_PROFILE_COLUMNS)}
             FROM users
             WHERE LOWER(username) = ? AND is_active = 1
         ''', (username.lower(),))
 
         user = cursor.fetchone()
         conn.close()
-
-        if user:
-            return {
-                'id': user[0],
-                'username': user[1],
-                'role': user[2],
-                'first_name': user[3],
-                'last_name': user[4],
-                'registration_date': user[5],
-                'created_by': user[6]
-            }
-        return None
+        return user
@@ -0,0 +1,217 @@
+# batch_runner.py
+"""
+Headless batch mode: authenticate once and run many manager operations.
+
+Each line of the script is a JSON object such as
+    {"op": "update_scooter", "args": {"serial_number": "AB12345678", "state_of_charge": 80}, "id": "job-1"}
+"args" may be an object (keyword arguments) or a list (positional arguments).
+
+All operations run in one process on one database connection and one
+transaction. One JSON result line per operation is streamed to stdout,
+followed by a summary line. With --on-error stop (default) the first failure
+rolls the whole batch back; with --on-error continue the successful
+operations are committed.
+
+Usage (from src/):
+    UM_USERNAME=super_admin UM_PASSWORD=... python um_members.py exec --script ops.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from models import json_default
+
+
+# op name -> console attribute of the manager that implements it.
+# Backup creation/restore are excluded: they work on the database file itself.
+OPERATIONS = {
+    'create_user': 'user_mgr',
+    'update_user': 'user_mgr',
+    'delete_user': 'user_mgr',
+    'reset_password': 'user_mgr',
+    'list_users': 'user_mgr',
+    'search_users': 'user_mgr',
+    'get_user_profile': 'user_mgr',
+    'create_traveller': 'traveller_mgr',
+    'update_traveller': 'traveller_mgr',
+    'delete_traveller': 'traveller_mgr',
+    'search_travellers': 'traveller_mgr',
+    'get_traveller_details': 'traveller_mgr',
+    'create_scooter': 'scooter_mgr',
+    'update_scooter': 'scooter_mgr',
+    'delete_scooter': 'scooter_mgr',
+    'search_scooters': 'scooter_mgr',
+    'get_scooter_details': 'scooter_mgr',
+    'view_logs': 'log_mgr',
+    'search_logs': 'log_mgr',
+    'get_suspicious_activity_summary': 'log_mgr',
+    'get_unread_suspicious_count': 'log_mgr',
+    'verify_log_integrity': 'log_mgr',
+    'list_backups': 'backup_mgr',
+    'register_consumer': 'changelog_mgr',
+    'unregister_consumer': 'changelog_mgr',
+    'poll_changes': 'changelog_mgr',
+    'acknowledge_changes': 'changelog_mgr',
+    'compact_changelog': 'changelog_mgr',
+}
+
+
+class BatchRunner:
+    def __init__(self, session_manager, output=None):
+        from user_manager import UserManager
+        from traveller_manager import TravellerManager
+        from scooter_manager import ScooterManager
+        from backup_logging_manager import LogManager, BackupManager
+        from changelog_manager import ChangelogManager
+
+        self.session = session_manager
+        self.auth = session_manager.auth
+        self.db = session_manager.auth.db
+        self.output = output or sys.stdout
+        self.managers = {
+            'user_mgr': UserManager(session_manager),
+            'traveller_mgr': TravellerManager(session_manager),
+            'scooter_mgr': ScooterManager(session_manager),
+            'log_mgr': LogManager(session_manager),
+            'backup_mgr': BackupManager(session_manager),
+            'changelog_mgr': ChangelogManager(session_manager),
+        }
+
+    def _emit(self, record):
+        self.output.write(json.dumps(record, default=json_default) + "\n")
+        self.output.flush()
+
+    def execute_operation(self, operation):
+        """Run one parsed script entry and return the manager's result dict"""
+        if not isinstance(operation, dict) or 'op' not in operation:
+            return {'success': False, 'message': 'Each line must be an object with an "op" field.', 'data': None}
+
+        name = operation['op']
+        if name not in OPERATIONS:
+            return {'success': False, 'message': f"Unknown or disallowed operation '{name}'.", 'data': None}
+
+        method = getattr(self.managers[OPERATIONS[name]], name)
+        args = operation.get('args', {})
+        try:
+            if isinstance(args, dict):
+                result = method(**args)
+            elif isinstance(args, list):
+                result = method(*args)
+            else:
+                return {'success': False, 'message': '"args" must be an object or a list.', 'data': None}
+        except TypeError as e:
+            return {'success': False, 'message': f'Invalid arguments for {name}: {str(e)}', 'data': None}
+
+        if isinstance(result, dict) and 'success' in result:
+            return result
+        return {'success': True, 'message': 'OK', 'data': result}
+
+    def run(self, lines, stop_on_error=True):
+        """Execute script lines in one transaction, streaming a result per line"""
+        from database_manager import BatchAborted
+
+        start = time.perf_counter()
+        stats = {'operations': 0, 'succeeded': 0, 'failed': 0}
+        denied = []
+        committed = False
+
+        try:
+            with self.db.batch():
+                for line_number, line in enumerate(lines, 1):
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+
+                    operation = None
+                    try:
+                        operation = json.loads(line)
+                        result = self.execute_operation(operation)
+                    except json.JSONDecodeError as e:
+                        result = {'success': False, 'message': f'Invalid JSON: {str(e)}', 'data': None}
+                    except Exception as e:
+                        result = {'success': False, 'message': f'Error: {str(e)}', 'data': None}
+
+                    stats['operations'] += 1
+                    stats['succeeded' if result.get('success') else 'failed'] += 1
+                    if str(result.get('message') or '').startswith('Access denied'):
+                        denied.append(operation.get('op'))
+                    self._emit({
+                        'line': line_number,
+                        'id': operation.get('id') if isinstance(operation, dict) else None,
+                        'op': operation.get('op') if isinstance(operation, dict) else None,
+                        'success': bool(result.get('success')),
+                        'message': result.get('message'),
+                        'data': result.get('data')
+                    })
+
+                    if stop_on_error and not result.get('success'):
+                        raise BatchAborted()
+            committed = True
+        except BatchAborted:
+            pass
+
+        stats['committed'] = committed
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        self._emit({'summary': stats})
+
+        # Audit entry outside the batch so it survives a rollback
+        details = f"Operations: {stats['operations']}, Succeeded: {stats['succeeded']}, Failed: {stats['failed']}"
+        if denied:
+            details += f", Denied: {', '.join(denied)}"
+        self.db.log_activity(
+            self.auth.current_user['username'],
+            "Batch script executed" if committed else "Batch script rolled back",
+            details,
+            suspicious=bool(denied)
+        )
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='um_members.py exec',
+        description='Run manager operations from a JSON-lines script in one transaction')
+    parser.add_argument('--script', required=True, help="JSON-lines file, or '-' for stdin")
+    parser.add_argument('--username', default=os.environ.get('UM_USERNAME'),
+                        help='defaults to $UM_USERNAME')
+    parser.add_argument('--on-error', choices=('stop', 'continue'), default='stop',
+                        help='stop: roll back everything on the first failure; '
+                             'continue: commit the operations that succeeded')
+    args = parser.parse_args(argv)
+
+    username = args.username
+    if not username:
+        print("Username required (--username or UM_USERNAME).", file=sys.stderr)
+        return 2
+    password = os.environ.get('UM_PASSWORD')
+    if password is None:
+        import getpass
+        password = getpass.getpass('Password: ')
+
+    from auth_manager import SessionManager
+
+    session = SessionManager()
+    session.start_session()
+    login = session.auth.login(username, password)
+    if not login['success']:
+        print(json.dumps({'summary': {'committed': False, 'message': login['message']}}))
+        return 2
+
+    try:
+        runner = BatchRunner(session)
+        if args.script == '-':
+            stats = runner.run(sys.stdin, args.on_error == 'stop')
+        else:
+            with open(args.script) as script:
+                stats = runner.run(script, args.on_error == 'stop')
+    finally:
+        session.end_session()
+
+    return 0 if stats['committed'] and not stats['failed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
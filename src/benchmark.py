@@ -0,0 +1,297 @@
+# benchmark.py
+"""
+Benchmark harness for the manager hot paths.
+
+Seeds a throw-away database of configurable size in a temporary working
+directory, times each operation, and prints/writes JSON results with
+latency percentiles. Results can be saved as a baseline and later runs
+compared against it; a regression beyond the tolerance exits with status 1.
+
+Cold start is measured separately: um_members.py is launched under
+-X importtime until it prints the "Username:" prompt.
+
+Usage (from src/):
+    python benchmark.py --travellers 1000 --scooters 1000 --logs 5000
+    python benchmark.py --startup-runs 20 --importtime
+    python benchmark.py --save-baseline benchmarks/baseline.json
+    python benchmark.py --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Add the src directory to the Python path
+sys.path.append(SRC_DIR)
+
+SUPER_ADMIN = ('super_admin', 'Admin_123?')
+PERCENTILES = (50, 90, 95, 99)
+LOGIN_PROMPT = b'Username:'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    values = sorted(sample * 1000.0 for sample in samples)
+    summary = {
+        'count': len(values),
+        'min_ms': values[0],
+        'max_ms': values[-1],
+        'mean_ms': sum(values) / len(values)
+    }
+    for pct in PERCENTILES:
+        summary[f'p{pct}_ms'] = percentile(values, pct)
+    return summary
+
+
+def seed_database(db, travellers, scooters, logs, seed, workers=None):
+    """Insert synthetic travellers, scooters and logs with the data generator"""
+    from data_generator import DataGenerator
+
+    generator = DataGenerator(db, seed, workers)
+    try:
+        generator.generate_travellers(travellers)
+        generator.generate_scooters(scooters)
+        generator.generate_logs(logs)
+    finally:
+        generator.close()
+
+
+def time_operation(func, iterations, warmup=1):
+    """Run func warmup + iterations times; return per-call durations in seconds"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+        if isinstance(result, dict) and not result.get('success', True):
+            raise RuntimeError(result.get('message'))
+    return samples
+
+
+def run_benchmarks(travellers, scooters, logs, iterations, seed=42, workers=None):
+    """Seed a temporary database and benchmark every hot path"""
+    original_cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Managers use paths relative to the working directory
+        os.chdir(work_dir)
+        os.makedirs('data')
+        try:
+            from auth_manager import SessionManager
+            from scooter_manager import ScooterManager
+            from traveller_manager import TravellerManager
+            from backup_logging_manager import LogManager, BackupManager
+
+            session = SessionManager()
+            seed_database(session.auth.db, travellers, scooters, logs, seed, workers)
+            session.auth.login(*SUPER_ADMIN)
+
+            scooter_mgr = ScooterManager(session)
+            traveller_mgr = TravellerManager(session)
+            log_mgr = LogManager(session)
+            backup_mgr = BackupManager(session)
+            heavy = max(3, iterations // 4)
+
+            backup = backup_mgr.create_backup()['data']['backup_filename']
+
+            operations = [
+                ('login', lambda: session.auth.login(*SUPER_ADMIN), iterations),
+                ('log_activity', lambda: session.auth.db.log_activity(
+                    'super_admin', 'Benchmark entry', 'timing'), iterations),
+                ('search_scooters', lambda: scooter_mgr.search_scooters('segway'), iterations),
+                ('search_travellers', lambda: traveller_mgr.search_travellers('visser'), iterations),
+                ('search_logs', lambda: log_mgr.search_logs('traveller'), heavy),
+                ('view_logs', lambda: log_mgr.view_logs(limit=50), iterations),
+                ('create_backup', lambda: backup_mgr.create_backup(), heavy),
+                ('restore_backup', lambda: backup_mgr.restore_backup(backup), heavy)
+            ]
+
+            results = {}
+            for name, func, count in operations:
+                results[name] = summarize(time_operation(func, count))
+        finally:
+            os.chdir(original_cwd)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'travellers': travellers,
+            'scooters': scooters,
+            'logs': logs,
+            'iterations': iterations,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output into (total_us, [(cumulative_us, module), ...])"""
+    total = 0
+    modules = []
+    for line in stderr.decode(errors='replace').splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        cumulative = int(cumulative)
+        if not name.startswith('  '):  # top-level imports include their children
+            total += cumulative
+        modules.append((cumulative, name.strip()))
+    return total, modules
+
+
+def launch_until_prompt(work_dir, timeout=30):
+    """Start um_members.py under -X importtime; return (seconds to prompt, importtime stderr)"""
+    env = dict(os.environ, PYTHONUNBUFFERED='1', TERM=os.environ.get('TERM', 'dumb'))
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-X', 'importtime', os.path.join(SRC_DIR, 'um_members.py')],
+        cwd=work_dir, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE)
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        output = b''
+        while LOGIN_PROMPT not in output:
+            chunk = process.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError('um_members.py exited before showing the login prompt.')
+            output += chunk
+        elapsed = time.perf_counter() - start
+    finally:
+        timer.cancel()
+        process.kill()
+        _, stderr = process.communicate()
+    return elapsed, stderr
+
+
+def run_startup_benchmark(runs, top=10):
+    """Time cold starts up to the login prompt on an initialised database"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.makedirs(os.path.join(work_dir, 'data'))
+        launch_until_prompt(work_dir)  # first run creates the key and database
+
+        prompt_samples = []
+        import_samples = []
+        modules = []
+        for _ in range(runs):
+            elapsed, stderr = launch_until_prompt(work_dir)
+            total_us, modules = parse_importtime(stderr)
+            prompt_samples.append(elapsed)
+            import_samples.append(total_us / 1000000.0)
+
+    slowest = sorted(modules, reverse=True)[:top]
+    return {
+        'startup_to_prompt': summarize(prompt_samples),
+        'startup_imports': summarize(import_samples)
+    }, [{'module': name, 'cumulative_ms': us / 1000.0} for us, name in slowest]
+
+
+def compare_to_baseline(report, baseline, tolerance, min_delta_ms=0.5, metric='p50_ms'):
+    """Return a list of (operation, baseline, current) that regressed beyond tolerance.
+
+    min_delta_ms ignores slowdowns too small to be more than timer noise.
+    """
+    regressions = []
+    for name, base in baseline.get('results', {}).items():
+        current = report['results'].get(name)
+        if current is None:
+            continue
+        limit = max(base[metric] * (1.0 + tolerance), base[metric] + min_delta_ms)
+        if current[metric] > limit:
+            regressions.append((name, base[metric], current[metric]))
+    return regressions
+
+
+def print_report(report):
+    """Print a latency table"""
+    meta = report['meta']
+    print(f"Dataset: {meta['travellers']} travellers, {meta['scooters']} scooters, "
+          f"{meta['logs']} logs | Python {meta['python']} | SQLite {meta['sqlite']}\n")
+    header = f"{'Operation':<20} {'n':>4} " + ' '.join(f"{'p' + str(p) + ' ms':>10}" for p in PERCENTILES)
+    print(header)
+    print("-" * len(header))
+    for name, summary in report['results'].items():
+        cells = ' '.join(f"{summary[f'p{p}_ms']:>10.2f}" for p in PERCENTILES)
+        print(f"{name:<20} {summary['count']:>4} {cells}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Urban Mobility hot path benchmarks')
+    parser.add_argument('--travellers', type=int, default=1000)
+    parser.add_argument('--scooters', type=int, default=1000)
+    parser.add_argument('--logs', type=int, default=5000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='encryption processes used for seeding')
+    parser.add_argument('--output', help='write JSON results to this file')
+    parser.add_argument('--baseline', help='compare against this baseline JSON file')
+    parser.add_argument('--save-baseline', help='store these results as a baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p50 slowdown versus baseline (0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='ignore p50 slowdowns smaller than this many milliseconds')
+    parser.add_argument('--startup-runs', type=int, default=10,
+                        help='cold starts of um_members.py to time (0 to skip)')
+    parser.add_argument('--importtime', action='store_true',
+                        help='print the slowest imports seen at startup')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.travellers, args.scooters, args.logs,
+                            args.iterations, args.seed, args.workers)
+    if args.startup_runs > 0:
+        startup, slowest_imports = run_startup_benchmark(args.startup_runs)
+        report['results'].update(startup)
+        report['startup_imports'] = slowest_imports
+    print_report(report)
+
+    if args.importtime and report.get('startup_imports'):
+        print(f"\n{'Slowest startup imports':<50} {'cumulative ms':>14}")
+        for entry in report['startup_imports']:
+            print(f"{entry['module']:<50} {entry['cumulative_ms']:>14.2f}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\nResults written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\nPerformance regressions (p50 > baseline + {args.tolerance:.0%}):")
+            for name, base, current in regressions:
+                print(f"  {name:<20} {base:.2f} ms -> {current:.2f} ms")
+            return 1
+        print(f"\nNo regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# changelog.py
+"""
+Change data capture for scooters, travellers, users and backup codes.
+
+Triggers append every insert, update and delete to the changelog table with
+a strictly increasing sequence number (AUTOINCREMENT, never reused) and the
+row's new column values as JSON. Downstream systems register as consumers,
+poll the entries after their watermark in batches and acknowledge what they
+have applied; compaction removes entries every consumer has acknowledged.
+A mirror therefore reads O(changes) instead of re-reading whole tables.
+
+Secrets are not captured: password hashes and restore codes are left out of
+the row data, and traveller fields that are stored encrypted stay encrypted.
+Consumers use it through changelog_manager.ChangelogManager.
+"""
+
+import json
+
+from row_versions import VERSIONED_TABLES
+
+
+CAPTURED_TABLES = ('users', 'travellers', 'scooters', 'backup_codes')
+EXCLUDED_COLUMNS = {
+    'users': ('password_hash',),
+    'backup_codes': ('code',),
+}
+
+
+class Changelog:
+    """Changelog table, its capture triggers and the consumer bookkeeping"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def setup(self, cursor):
+        """Create the tables and (re)create the triggers for the current columns"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS changelog (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                operation TEXT NOT NULL CHECK (operation IN ('insert', 'update', 'delete')),
+                changed_at TEXT NOT NULL,
+                row_data TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS changelog_consumers (
+                name TEXT PRIMARY KEY,
+                watermark INTEGER NOT NULL,
+                registered_at TEXT NOT NULL,
+                acknowledged_at TEXT
+            )
+        ''')
+        for table in CAPTURED_TABLES:
+            excluded = EXCLUDED_COLUMNS.get(table, ())
+            columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')
+                       if row[1] not in excluded]
+            row_json = 'json_object({})'.format(
+                ', '.join(f"'{column}', NEW.{column}" for column in columns))
+            # An update that leaves version alone is followed by the row_versions
+            # bump; capture only that final, bumped row
+            update_when = 'WHEN NEW.version <> OLD.version' if table in VERSIONED_TABLES else ''
+            # Triggers list the columns explicitly, so rebuild them after schema changes
+            for operation, event, row_id, data, when in (
+                    ('insert', 'INSERT', 'NEW.id', row_json, ''),
+                    ('update', 'UPDATE', 'NEW.id', row_json, update_when),
+                    ('delete', 'DELETE', 'OLD.id', 'NULL', '')):
+                trigger = f'{table}_changelog_{operation}'
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+                cursor.execute(f'''
+                    CREATE TRIGGER {trigger} AFTER {event} ON {table}
+                    {when}
+                    BEGIN
+                        INSERT INTO changelog (table_name, row_id, operation, changed_at, row_data)
+                        VALUES ('{table}', {row_id}, '{operation}',
+                                datetime('now', 'localtime'), {data});
+                    END
+                ''')
+
+    def head(self, cursor):
+        """Highest sequence number ever assigned (0 when nothing was captured)"""
+        row = cursor.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changelog'").fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, cursor, watermark, limit, tables=None):
+        """Entries with seq > watermark in order, at most limit of them"""
+        query = ('SELECT seq, table_name, row_id, operation, changed_at, row_data '
+                 'FROM changelog WHERE seq > ?')
+        params = [watermark]
+        if tables:
+            query += f" AND table_name IN ({', '.join('?' * len(tables))})"
+            params.extend(tables)
+        query += ' ORDER BY seq LIMIT ?'
+        params.append(limit)
+        return [{
+            'seq': seq,
+            'table': table,
+            'row_id': row_id,
+            'operation': operation,
+            'changed_at': changed_at,
+            'row': json.loads(row_data) if row_data is not None else None
+        } for seq, table, row_id, operation, changed_at, row_data in cursor.execute(query, params)]
+
+    def after_restore(self, cursor, previous_head):
+        """Keep seq increasing past the pre-restore head and drop every consumer.
+
+        A restored database has an older changelog, so its sequence would hand
+        out numbers consumers have already seen, and their mirrors are ahead
+        of the restored rows. Returns the names of the dropped consumers, who
+        must register again and re-read the tables.
+        """
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'changelog'",
+                       (previous_head,))
+        if cursor.rowcount == 0:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('changelog', ?)",
+                           (previous_head,))
+        return [row[0] for row in cursor.execute('DELETE FROM changelog_consumers RETURNING name')]
+
+    def consumer_watermark(self, cursor, name):
+        row = cursor.execute(
+            'SELECT watermark FROM changelog_consumers WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def compact(self, cursor):
+        """Delete the entries every registered consumer has acknowledged"""
+        cursor.execute('''
+            DELETE FROM changelog
+            WHERE seq <= (SELECT MIN(watermark) FROM changelog_consumers)
+        ''')
+        return cursor.rowcount
@@ -0,0 +1,213 @@
+# changelog_manager.py
+from changelog import CAPTURED_TABLES
+from database_manager import DatabaseManager
+from datetime import datetime
+from metrics import instrument
+
+
+# Changes returned per poll
+POLL_LIMIT = 1000
+MAX_POLL_LIMIT = 10000
+
+
+@instrument
+class ChangelogManager:
+    def __init__(self, session_manager):
+        self.db = DatabaseManager()
+        self.session = session_manager
+        self.auth = session_manager.auth
+        self.authz = session_manager.authz
+
+    def _denied(self, action, details):
+        self.db.log_activity(
+            self.auth.current_user['username'],
+            f"Unauthorized changelog {action} attempt",
+            details,
+            suspicious=True
+        )
+        return {
+            'success': False,
+            'message': 'Access denied. Cannot read the changelog.',
+            'data': None
+        }
+
+    def register_consumer(self, name, watermark=None):
+        """Register a changelog consumer starting after watermark (default: now)"""
+        if not self.authz.check_permission('read_changes'):
+            return self._denied('registration', f"Consumer: {name}")
+
+        if not name or not str(name).strip():
+            return {'success': False, 'message': 'Consumer name is required.', 'data': None}
+
+        try:
+            with self.db.transaction() as cursor:
+                if self.db.changelog.consumer_watermark(cursor, name) is not None:
+                    return {'success': False, 'message': 'Consumer already registered.', 'data': None}
+                head = self.db.changelog.head(cursor)
+                start = head if watermark is None else max(0, min(int(watermark), head))
+                cursor.execute('''
+                    INSERT INTO changelog_consumers (name, watermark, registered_at)
+                    VALUES (?, ?, ?)
+                ''', (name, start, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+                self.db.log_activity(
+                    self.auth.current_user['username'],
+                    "Changelog consumer registered",
+                    f"Consumer: {name}, Watermark: {start}",
+                    cursor=cursor
+                )
+
+            return {
+                'success': True,
+                'message': f'Consumer "{name}" registered at sequence {start}.',
+                'data': {'consumer': name, 'watermark': start}
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error registering consumer: {str(e)}',
+                'data': None
+            }
+
+    def unregister_consumer(self, name):
+        """Remove a consumer so it no longer holds back compaction"""
+        if not self.authz.check_permission('read_changes'):
+            return self._denied('unregistration', f"Consumer: {name}")
+
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute('DELETE FROM changelog_consumers WHERE name = ?', (name,))
+                removed = cursor.rowcount
+                if removed:
+                    self.db.log_activity(
+                        self.auth.current_user['username'],
+                        "Changelog consumer unregistered",
+                        f"Consumer: {name}",
+                        cursor=cursor
+                    )
+
+            if not removed:
+                return {'success': False, 'message': 'Consumer not found.', 'data': None}
+            return {'success': True, 'message': f'Consumer "{name}" unregistered.', 'data': None}
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error unregistering consumer: {str(e)}',
+                'data': None
+            }
+
+    def poll_changes(self, name, limit=POLL_LIMIT, tables=None):
+        """Next batch of changes after the consumer's watermark (does not acknowledge)"""
+        if not self.authz.check_permission('read_changes'):
+            return self._denied('poll', f"Consumer: {name}")
+
+        # A bare string would otherwise be expanded character by character
+        if tables is not None and (not isinstance(tables, list)
+                                   or not all(table in CAPTURED_TABLES for table in tables)):
+            return {
+                'success': False,
+                'message': f"tables must be a list of: {', '.join(CAPTURED_TABLES)}.",
+                'data': None
+            }
+
+        try:
+            limit = max(1, min(int(limit), MAX_POLL_LIMIT))
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            watermark = self.db.changelog.consumer_watermark(cursor, name)
+            if watermark is None:
+                conn.close()
+                return {'success': False, 'message': 'Consumer not found.', 'data': None}
+
+            head = self.db.changelog.head(cursor)
+            changes = self.db.changelog.changes_since(cursor, watermark, limit + 1, tables)
+            conn.close()
+
+            more = len(changes) > limit
+            changes = changes[:limit]
+            # Once caught up, entries filtered out by tables are skipped as well
+            next_watermark = changes[-1]['seq'] if changes else watermark
+            if not more:
+                next_watermark = max(next_watermark, head)
+            return {
+                'success': True,
+                'message': f'Retrieved {len(changes)} changes.',
+                'data': {
+                    'consumer': name,
+                    'watermark': watermark,
+                    'next_watermark': next_watermark,
+                    'more': more,
+                    'changes': changes
+                }
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error polling changes: {str(e)}',
+                'data': None
+            }
+
+    def acknowledge_changes(self, name, seq):
+        """Advance the consumer's watermark to seq once its changes are applied"""
+        if not self.authz.check_permission('read_changes'):
+            return self._denied('acknowledge', f"Consumer: {name}")
+
+        try:
+            seq = int(seq)
+            with self.db.transaction() as cursor:
+                if seq > self.db.changelog.head(cursor):
+                    return {'success': False, 'message': 'Sequence number is beyond the changelog.',
+                            'data': None}
+                # Watermarks only move forward
+                row = cursor.execute('''
+                    UPDATE changelog_consumers
+                    SET watermark = MAX(watermark, ?), acknowledged_at = ?
+                    WHERE name = ?
+                    RETURNING watermark
+                ''', (seq, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), name)).fetchone()
+
+            if not row:
+                return {'success': False, 'message': 'Consumer not found.', 'data': None}
+            return {
+                'success': True,
+                'message': f'Watermark of "{name}" is {row[0]}.',
+                'data': {'consumer': name, 'watermark': row[0]}
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error acknowledging changes: {str(e)}',
+                'data': None
+            }
+
+    def compact_changelog(self):
+        """Delete changelog entries acknowledged by every consumer"""
+        if not self.authz.check_permission('read_changes'):
+            return self._denied('compaction', "Attempted to compact the changelog")
+
+        try:
+            with self.db.transaction() as cursor:
+                removed = self.db.changelog.compact(cursor)
+                self.db.log_activity(
+                    self.auth.current_user['username'],
+                    "Changelog compacted",
+                    f"Removed {removed} acknowledged entries",
+                    cursor=cursor
+                )
+
+            return {
+                'success': True,
+                'message': f'Removed {removed} acknowledged changelog entries.',
+                'data': {'removed': removed}
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error compacting changelog: {str(e)}',
+                'data': None
+            }
@@ -2,21 +2,19 @@
 import os
 import sys
 from datetime import datetime
-from auth_manager import SessionManager
-from user_manager import UserManager
-from traveller_manager import TravellerManager
-from scooter_manager import ScooterManager
-from backup_logging_manager import LogManager, BackupManager
 
 
 class ConsoleInterface:
     def __init__(self):
-        self.session = SessionManager()
+        # Created on the first login attempt so the prompt appears before
+        # cryptography, the managers and the database are loaded
+        self.session = None
         self.user_mgr = None
         self.traveller_mgr = None
         self.scooter_mgr = None
         self.log_mgr = None
         self.backup_mgr = None
+        self.retention_mgr = None
         self.running = False
 
     def run(self):
@@ -42,6 +40,7 @@ class ConsoleInterface:
                 self.show_main_menu()
                 choice = input("\nEnter your choice: ").strip()
                 self.handle_main_menu_choice(choice)
+                self.export_metrics()
             except KeyboardInterrupt:
                 print("\n\nExiting application...")
                 self.logout()
@@ -80,6 +79,9 @@ class ConsoleInterface:
                 continue
 
             # Attempt login
+            if self.session is None:
+                from auth_manager import SessionManager
+                self.session = SessionManager()
             self.session.start_session()
             result = self.session.auth.login(username, password)
 
@@ -107,16 +109,27 @@ class ConsoleInterface:
 
     def initialize_managers(self):
         """Initialize all manager instances"""
+        from user_manager import UserManager
+        from traveller_manager import TravellerManager
+        from scooter_manager import ScooterManager
+        from backup_logging_manager import LogManager, BackupManager
+        from retention_manager import RetentionManager
+
         self.user_mgr = UserManager(self.session)
         self.traveller_mgr = TravellerManager(self.session)
         self.scooter_mgr = ScooterManager(self.session)
         self.log_mgr = LogManager(self.session)
         self.backup_mgr = BackupManager(self.session)
+        self.retention_mgr = RetentionManager(self.session)
+
+        # Scheduled maintenance: one bounded log archiving pass when due
+        # (backups are only deleted from the retention menu, after confirmation)
+        self.retention_mgr.run_if_due()
 
     def show_suspicious_activity_alert(self):
         """Show alert for unread suspicious activities"""
         if self.session.authz and self.log_mgr and self.session.authz.check_permission('view_logs'):
-            summary = self.log_mgr.get_suspicious_activity_summary()
+            summary = self.log_mgr.get_unread_suspicious_count()
             if summary and summary.get('success') and summary.get('data') and summary['data'].get('unread_count', 0) > 0:
                 print(f"\n{'=' * 60}")
                 print(
@@ -282,6 +295,15 @@ class ConsoleInterface:
         self.running = False
         print("Session ended successfully.")
 
+    def export_metrics(self):
+        """Refresh the Prometheus text file read by a local scraping agent"""
+        from metrics import REGISTRY
+
+        try:
+            REGISTRY.write_prometheus()
+        except OSError:
+            pass  # metrics export must never interrupt the session
+
     def clear_screen(self):
         """Clear console screen"""
         os.system('cls' if os.name == 'nt' else 'clear')
@@ -0,0 +1,111 @@
+# crypto_pool.py
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from cryptography.fernet import Fernet
+from metrics import count_crypto_op
+
+
+# Values per worker job; large enough to amortise pickling, small enough to balance
+JOB_SIZE = 2000
+
+_worker_cipher = None
+
+
+def _init_worker(key):
+    """Build the Fernet instance once per worker process"""
+    global _worker_cipher
+    _worker_cipher = Fernet(key)
+
+
+def _encrypt_job(values):
+    return [None if value is None else _worker_cipher.encrypt(value.encode()).decode()
+            for value in values]
+
+
+def _decrypt_job(values):
+    return [None if value is None else _worker_cipher.decrypt(value.encode()).decode()
+            for value in values]
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class CryptoPool:
+    """Encrypts/decrypts lists of strings with the system key on worker processes.
+
+    Fernet is pure CPU work, so bulk jobs (seeding, imports, exports) split
+    their values over a process pool. With a single worker everything runs
+    in-process and no pool is started.
+    """
+
+    def __init__(self, key, workers=None):
+        self.key = key
+        self.workers = workers or default_workers()
+        self._cipher = Fernet(key)
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(key,))
+
+    def _run(self, job, local, values):
+        values = list(values)
+        count_crypto_op(len(values))
+        if self._executor is None:
+            future = Future()
+            future.set_result(local(values))
+            return future
+
+        jobs = [self._executor.submit(job, values[i:i + JOB_SIZE])
+                for i in range(0, len(values), JOB_SIZE)]
+        result = Future()
+        pending = [len(jobs)]
+
+        def collect(_):
+            pending[0] -= 1
+            if pending[0] == 0:
+                try:
+                    result.set_result([value for part in jobs for value in part.result()])
+                except Exception as e:
+                    result.set_exception(e)
+
+        if not jobs:
+            result.set_result([])
+        for part in jobs:
+            part.add_done_callback(collect)
+        return result
+
+    def _encrypt_local(self, values):
+        return [None if value is None else self._cipher.encrypt(value.encode()).decode()
+                for value in values]
+
+    def _decrypt_local(self, values):
+        return [None if value is None else self._cipher.decrypt(value.encode()).decode()
+                for value in values]
+
+    def submit_encrypt(self, values):
+        """Start encrypting values; returns a Future of the encrypted list (same order)"""
+        return self._run(_encrypt_job, self._encrypt_local, values)
+
+    def submit_decrypt(self, values):
+        """Start decrypting values; returns a Future of the plaintext list (same order)"""
+        return self._run(_decrypt_job, self._decrypt_local, values)
+
+    def encrypt_many(self, values):
+        """Encrypt a list of strings (None stays None)"""
+        return self.submit_encrypt(values).result()
+
+    def decrypt_many(self, values):
+        """Decrypt a list of tokens (None stays None)"""
+        return self.submit_decrypt(values).result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
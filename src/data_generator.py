@@ -0,0 +1,294 @@
+# data_generator.py
+"""
+Synthetic data generator for sizing and benchmarking.
+
+Generates valid travellers (Dutch zip codes, driving licences, cities from
+the cities table), scooters inside the Rotterdam bounds, and encrypted
+activity logs in chronological order. Rows are inserted with executemany in
+batches while the next batch is encrypted on a process pool.
+
+Usage (from src/):
+    python data_generator.py --travellers 1000000 --scooters 50000 --logs 5000000
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add the src directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database_manager import DatabaseManager
+from crypto_pool import CryptoPool
+
+
+BATCH_SIZE = 10000
+CREATED_BY = 'super_admin'
+
+FIRST_NAMES = ['Jan', 'Sanne', 'Daan', 'Emma', 'Lucas', 'Julia', 'Sem', 'Tess', 'Finn', 'Sophie',
+               'Levi', 'Anna', 'Noah', 'Lotte', 'Milan', 'Fleur', 'Bram', 'Eva', 'Ruben', 'Lisa']
+LAST_NAMES = ['de Jong', 'Jansen', 'de Vries', 'van den Berg', 'van Dijk', 'Bakker', 'Janssen',
+              'Visser', 'Smit', 'Meijer', 'de Boer', 'Mulder', 'de Groot', 'Bos', 'Vos', 'Peters']
+STREETS = ['Coolsingel', 'Witte de Withstraat', 'Meent', 'Lijnbaan', 'Kruiskade', 'Blaak',
+           'Nieuwe Binnenweg', 'Oude Binnenweg', 'Westersingel', 'Mauritsweg', 'Boompjes']
+SCOOTER_MODELS = {
+    'Segway': ['Ninebot Max G30', 'Ninebot E45', 'P100'],
+    'Niu': ['KQi3 Pro', 'KQi2'],
+    'Xiaomi': ['Mi Pro 2', 'Mi 4 Ultra'],
+    'Gotrax': ['G4', 'XR Ultra'],
+    'Unagi': ['Model One']
+}
+LOG_EVENTS = [
+    ('Logged in', '', False),
+    ('Logged out', '', False),
+    ('Session ended', '', False),
+    ('New traveller created', 'Customer ID: {n}', False),
+    ('Traveller updated', 'Customer ID: {n}', False),
+    ('New scooter created', 'Serial: SN{n}', False),
+    ('Scooter updated', 'Serial: SN{n}', False),
+    ('System logs viewed', 'Viewed 50 entries', False),
+    ('Log search performed', 'Search term: {n}', False),
+    ('Unsuccessful login', 'Invalid password', True),
+    ('Unauthorized traveller deletion attempt', 'Attempted to delete traveller {n}', True),
+]
+
+LAT_RANGE = (51.85, 52.05)
+LON_RANGE = (4.35, 4.65)
+
+
+class DataGenerator:
+    """Bulk-inserts synthetic, valid records into an Urban Mobility database"""
+
+    def __init__(self, db, seed=None, workers=None, batch_size=BATCH_SIZE):
+        self.db = db
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.workers = workers
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = CryptoPool(self.db.encryption_key, self.workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def _load(self, batches, write):
+        """Insert batches while the following batch is being encrypted.
+
+        batches yields (rows, secrets); write(cursor, rows, encrypted) inserts
+        one batch once its secrets are encrypted. Commits once per batch.
+        """
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        total = 0
+        pending = None
+        try:
+            for rows, secrets in batches:
+                future = self.pool.submit_encrypt(secrets)
+                if pending:
+                    total += write(cursor, pending[0], pending[1].result())
+                    conn.commit()
+                pending = (rows, future)
+            if pending:
+                total += write(cursor, pending[0], pending[1].result())
+                conn.commit()
+        finally:
+            conn.close()
+        return total
+
+    def _batched(self, count, make_row):
+        """Yield (rows, secrets) batches of make_row(i) -> (row, secrets)"""
+        for start in range(0, count, self.batch_size):
+            rows = []
+            secrets = []
+            for i in range(start, min(count, start + self.batch_size)):
+                row, row_secrets = make_row(i)
+                rows.append(row)
+                secrets.extend(row_secrets)
+            yield rows, secrets
+
+    def _customer_ids(self, count):
+        """Yield count allocated customer IDs, reserved one batch at a time"""
+        for start in range(0, count, self.batch_size):
+            yield from self.db.generate_customer_ids(min(self.batch_size, count - start))
+
+    def generate_travellers(self, count):
+        """Insert count travellers; returns the number inserted"""
+        rng = self.rng
+        cities = self.db.get_cities()
+        customer_ids = self._customer_ids(count)
+        registered = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        def make_row(i):
+            first = rng.choice(FIRST_NAMES)
+            last = rng.choice(LAST_NAMES)
+            birthday = (datetime(1940, 1, 1) + timedelta(days=rng.randrange(24000))).strftime('%Y-%m-%d')
+            zip_code = f"{rng.randint(1000, 9999)}{rng.choice(string.ascii_uppercase)}{rng.choice(string.ascii_uppercase)}"
+            if rng.random() < 0.5:
+                licence = ''.join(rng.choices(string.ascii_uppercase, k=2)) + f"{rng.randrange(10 ** 7):07d}"
+            else:
+                licence = rng.choice(string.ascii_uppercase) + f"{rng.randrange(10 ** 8):08d}"
+            customer_id = next(customer_ids)
+            row = (customer_id, first, last, birthday, rng.choice(('male', 'female')),
+                   zip_code, rng.choice(cities), licence)
+            secrets = [rng.choice(STREETS), str(rng.randint(1, 300)),
+                       f"{first.lower()}.{last.replace(' ', '').lower()}{customer_id}@example.com",
+                       f"+31-6-{rng.randrange(10 ** 8):08d}"]
+            return row, secrets
+
+        def write(cursor, rows, encrypted):
+            values = []
+            for index, row in enumerate(rows):
+                street, house, email, phone = encrypted[index * 4:index * 4 + 4]
+                customer_id, first, last, birthday, gender, zip_code, city, licence = row
+                values.append((customer_id, first, last, birthday, gender, street, house,
+                               zip_code, city, email, phone, licence, registered, CREATED_BY))
+            cursor.executemany('''
+                INSERT INTO travellers (
+                    customer_id, first_name, last_name, birthday, gender,
+                    street_name, house_number, zip_code, city, email_address,
+                    mobile_phone, driving_license_number, registration_date, created_by
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values)
+            return len(values)
+
+        return self._load(self._batched(count, make_row), write)
+
+    def generate_scooters(self, count):
+        """Insert count scooters with coordinates inside the Rotterdam bounds"""
+        rng = self.rng
+        # Per-run prefix keeps serial numbers unique across repeated runs
+        run_prefix = ''.join(rng.choices(string.ascii_uppercase, k=4))
+        brands = list(SCOOTER_MODELS)
+        today = datetime.now()
+
+        def make_row(i):
+            brand = rng.choice(brands)
+            in_service = today - timedelta(days=rng.randrange(1, 1500))
+            maintained = in_service + timedelta(days=rng.randrange((today - in_service).days + 1))
+            soc_min = rng.randint(10, 40)
+            row = (brand, rng.choice(SCOOTER_MODELS[brand]), f"{run_prefix}{i:010d}",
+                   rng.choice((20, 25, 30)), rng.choice((350, 450, 500, 700)),
+                   rng.randint(0, 100), soc_min, rng.randint(soc_min + 30, 100),
+                   round(rng.uniform(*LAT_RANGE), 5), round(rng.uniform(*LON_RANGE), 5),
+                   1 if rng.random() < 0.05 else 0, round(rng.uniform(0, 8000), 1),
+                   maintained.strftime('%Y-%m-%d'), in_service.strftime('%Y-%m-%d %H:%M:%S'),
+                   CREATED_BY)
+            return row, []
+
+        def write(cursor, rows, encrypted):
+            cursor.executemany('''
+                INSERT INTO scooters (
+                    brand, model, serial_number, top_speed, battery_capacity,
+                    state_of_charge, target_range_soc_min, target_range_soc_max,
+                    latitude, longitude, out_of_service_status, mileage,
+                    last_maintenance_date, in_service_date, created_by
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            return len(rows)
+
+        return self._load(self._batched(count, make_row), write)
+
+    def generate_logs(self, count, days=90, usernames=None):
+        """Insert count encrypted log rows spread chronologically over the last days.
+
+        Rows never predate the newest existing log, so ids stay chronological;
+        an empty log is rewound so each row lands in its own month's partition.
+        """
+        rng = self.rng
+        end = datetime.now()
+        start = end - timedelta(days=days)
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        newest = cursor.execute('SELECT MAX(ts) FROM activity_logs').fetchone()[0]
+        if usernames is None:
+            usernames = [row[0] for row in cursor.execute('SELECT username FROM users')]
+        if newest:
+            start = max(start, datetime.fromtimestamp(newest))
+        elif self.db.log_router.rewind(cursor, self.db.log_router.month_key(start)):
+            conn.commit()
+        conn.close()
+
+        span = (end - start).total_seconds()
+        step = span / count if count else 0
+
+        def make_row(i):
+            when = start + timedelta(seconds=step * i + rng.random() * step)
+            description, info, suspicious = rng.choice(LOG_EVENTS)
+            info = info.format(n=rng.randrange(10 ** 6))
+            return (when, suspicious), [rng.choice(usernames), description, info or None]
+
+        router = self.db.log_router
+
+        def insert(cursor, partition, values):
+            cursor.executemany(f'''
+                INSERT INTO {partition} (date, time, username, description, additional_info, suspicious, ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', values)
+
+        def write(cursor, rows, encrypted):
+            partition = None
+            values = []
+            for index, (when, suspicious) in enumerate(rows):
+                # Flush before a month change so the next partition's ids start after these
+                if partition and router.month_key(when) != router.month_key(rows[index - 1][0]):
+                    insert(cursor, partition, values)
+                    partition, values = None, []
+                partition = partition or router.write_partition(cursor, when)
+                username, description, info = encrypted[index * 3:index * 3 + 3]
+                values.append((when.strftime('%d-%m-%Y'), when.strftime('%H:%M:%S'), username,
+                               description, info or "", 1 if suspicious else 0,
+                               int(when.timestamp())))
+            if values:
+                insert(cursor, partition, values)
+            self.db.log_chain.seal_new(cursor)
+            return len(rows)
+
+        return self._load(self._batched(count, make_row), write)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic Urban Mobility data')
+    parser.add_argument('--travellers', type=int, default=0)
+    parser.add_argument('--scooters', type=int, default=0)
+    parser.add_argument('--logs', type=int, default=0)
+    parser.add_argument('--log-days', type=int, default=90,
+                        help='spread generated logs over this many past days')
+    parser.add_argument('--db', default='data/urban_mobility.db')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='encryption processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    os.makedirs('data', exist_ok=True)
+    generator = DataGenerator(DatabaseManager(args.db), args.seed, args.workers, args.batch_size)
+    try:
+        for label, count, generate in (
+                ('travellers', args.travellers, generator.generate_travellers),
+                ('scooters', args.scooters, generator.generate_scooters),
+                ('log entries', args.logs,
+                 lambda n: generator.generate_logs(n, args.log_days))):
+            if count <= 0:
+                continue
+            start = time.perf_counter()
+            inserted = generate(count)
+            elapsed = time.perf_counter() - start
+            print(f"Inserted {inserted} {label} in {elapsed:.1f}s ({inserted / elapsed:,.0f} rows/s)")
+    finally:
+        generator.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,85 @@
 # database_manager.py
 import sqlite3
 import hashlib
-import secrets
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-import base64
 import os
+import contextvars
+import re
+import threading
+import row_versions
+import validation
+from activity_rules import ActivityRules
+from changelog import Changelog
+from contextlib import contextmanager
 from datetime import datetime
+from id_allocator import CustomerIdAllocator
+from log_chain import LogChain
+from log_partitions import LogPartitionRouter
+from read_replica import ReadReplica, configured_max_lag
+from metrics import count_crypto_op
+from sql_tracing import TracedConnection
+
+
+# Bumped whenever init_database adds tables, columns or indexes; stored in PRAGMA user_version
+SCHEMA_VERSION = 12
+
+
+# Connection shared by every DatabaseManager while a batch() or pooled() block is active
+_batch_connection = contextvars.ContextVar('batch_connection', default=None)
+
+
+class BatchAborted(Exception):
+    """Raise inside DatabaseManager.batch() to roll the whole batch back"""
+
+
+class BatchConnection(TracedConnection):
+    """Shared batch connection: commit() and close() wait for the end of the batch"""
+
+    # (username, description, additional_info) of the security events logged
+    # in the batch, written again by DatabaseManager.batch() after a rollback
+    security_events = ()
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def finish(self, commit):
+        if commit:
+            super().commit()
+        else:
+            self.rollback()
+        super().close()
+
+
+class PooledConnection(TracedConnection):
+    """Long-lived per-thread connection: close() keeps it open for the next operation"""
+
+    def close(self):
+        pass
+
+    def release(self):
+        """Discard any transaction an operation left open"""
+        if self.in_transaction:
+            self.rollback()
+
+
+# One PooledConnection per worker thread, created by DatabaseManager.pooled()
+_thread_connections = threading.local()
 
 
 class DatabaseManager:
     def __init__(self, db_path="data/urban_mobility.db"):
         self.db_path = db_path
         self.encryption_key = self._get_or_create_encryption_key()
-        self.cipher_suite = Fernet(self.encryption_key)
+        self._cipher_suite = None
+        self.log_router = LogPartitionRouter(self)
+        self.log_chain = LogChain(self)
+        self.customer_ids = CustomerIdAllocator(self)
+        self.changelog = Changelog(self)
+        self.activity_rules = ActivityRules()
+        max_lag = configured_max_lag()
+        self.replica = ReadReplica(db_path, max_lag) if max_lag else None
         self.init_database()
 
     def _get_or_create_encryption_key(self):
@@ -25,31 +90,46 @@ class DatabaseManager:
                 return f.read()
         else:
             # Generate new key
+            from cryptography.fernet import Fernet
             key = Fernet.generate_key()
             with open(key_file, 'wb') as f:
                 f.write(key)
             return key
 
+    @property
+    def cipher_suite(self):
+        """Fernet cipher, built on first use so startup does not import cryptography"""
+        if self._cipher_suite is None:
+            from cryptography.fernet import Fernet
+            self._cipher_suite = Fernet(self.encryption_key)
+        return self._cipher_suite
+
     def encrypt_data(self, data):
         """Encrypt sensitive data"""
         if data is None:
             return None
+        count_crypto_op()
         return self.cipher_suite.encrypt(data.encode()).decode()
 
     def decrypt_data(self, encrypted_data):
         """Decrypt sensitive data"""
         if encrypted_data is None:
             return None
+        count_crypto_op()
         return self.cipher_suite.decrypt(encrypted_data.encode()).decode()
 
     def hash_password(self, password):
         """Hash password using SHA-256 with salt"""
+        import secrets
+
+        count_crypto_op()
         salt = secrets.token_hex(16)
         password_hash = hashlib.sha256((password + salt).encode()).hexdigest()
         return f"{salt}:{password_hash}"
 
     def verify_password(self, password, stored_hash):
         """Verify password against stored hash"""
+        count_crypto_op()
         try:
             salt, hash_value = stored_hash.split(':')
             password_hash = hashlib.sha256(
@@ -59,13 +139,128 @@ class DatabaseManager:
             return False
 
     def get_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
+        """Get database connection (statements are counted and slow ones logged)"""
+        shared = _batch_connection.get()
+        if shared is not None and shared.db_path == self.db_path:
+            return shared
+        return sqlite3.connect(self.db_path, factory=TracedConnection)
+
+    def get_read_connection(self):
+        """Connection for read-only reporting queries (the replica in replica mode)"""
+        shared = _batch_connection.get()
+        if isinstance(shared, BatchConnection) and shared.db_path == self.db_path:
+            return shared  # a batch reads its own uncommitted writes
+        if self.replica is None:
+            return self.get_connection()
+        return self.replica.connect()
+
+    @contextmanager
+    def batch(self):
+        """Run every operation in the block on one connection and one transaction.
+
+        All DatabaseManager instances in this context share the connection;
+        it commits when the block completes and rolls back if it raises.
+        """
+        conn = sqlite3.connect(self.db_path, factory=BatchConnection)
+        conn.db_path = self.db_path
+        conn.security_events = []
+        conn.execute('BEGIN IMMEDIATE')
+        token = _batch_connection.set(conn)
+        try:
+            yield conn
+        except BaseException:
+            _batch_connection.reset(token)
+            conn.finish(commit=False)
+            # Security events must not be undone by the rollback (nor can they
+            # be written meanwhile: the batch holds the write lock)
+            for username, description, additional_info in conn.security_events:
+                self.log_activity(username, description, additional_info, suspicious=True)
+            raise
+        _batch_connection.reset(token)
+        conn.finish(commit=True)
+
+    @contextmanager
+    def pooled(self):
+        """Run the block on this thread's long-lived connection instead of a new one.
+
+        Used by long-running services so each worker thread keeps one open
+        connection; transactions are still committed by the operations.
+        """
+        if _batch_connection.get() is not None:
+            yield _batch_connection.get()
+            return
+        conn = getattr(_thread_connections, 'conn', None)
+        if conn is None or conn.db_path != self.db_path:
+            if conn is not None:
+                TracedConnection.close(conn)
+            conn = sqlite3.connect(self.db_path, factory=PooledConnection)
+            conn.db_path = self.db_path
+            _thread_connections.conn = conn
+        token = _batch_connection.set(conn)
+        try:
+            yield conn
+        finally:
+            _batch_connection.reset(token)
+            conn.release()
+
+    @contextmanager
+    def transaction(self):
+        """Run the block as one write transaction and yield its cursor.
+
+        Commits when the block completes and rolls back if it raises. Inside
+        a batch (or any open transaction) the block becomes a savepoint, so a
+        failure only undoes this operation.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        nested = conn.in_transaction
+        try:
+            cursor.execute('SAVEPOINT operation' if nested else 'BEGIN IMMEDIATE')
+            try:
+                yield cursor
+            except BaseException:
+                if nested:
+                    cursor.execute('ROLLBACK TO operation')
+                    cursor.execute('RELEASE operation')
+                else:
+                    conn.rollback()
+                raise
+            if nested:
+                cursor.execute('RELEASE operation')
+            else:
+                conn.commit()
+        finally:
+            conn.close()
+
+    @contextmanager
+    def read_transaction(self):
+        """Run the block's reads as one read transaction on the primary and yield its cursor.
+
+        The reads see one consistent snapshot without taking the write lock.
+        Inside a batch (or any open transaction) the block reads through it.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        nested = conn.in_transaction
+        try:
+            if not nested:
+                cursor.execute('BEGIN DEFERRED')
+            yield cursor
+        finally:
+            if not nested:
+                conn.rollback()
+            conn.close()
 
     def init_database(self):
         """Initialize database with all required tables"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        previous_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+
+        # Up-to-date database: nothing to create or migrate
+        if previous_version == SCHEMA_VERSION:
+            conn.close()
+            return
 
         # Users table (System Admins and Service Engineers)
         cursor.execute('''
@@ -102,6 +297,13 @@ class DatabaseManager:
                 created_by TEXT NOT NULL
             )
         ''')
+        # Duplicate checks look travellers up by driving licence
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_travellers_licence
+            ON travellers (driving_license_number)
+        ''')
+        # Customer ID sequence (schema 7); earlier random IDs are registered as legacy
+        self.customer_ids.setup(cursor)
 
         # Scooters table
         cursor.execute('''
@@ -125,19 +327,17 @@ class DatabaseManager:
             )
         ''')
 
-        # Activity logs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS activity_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                time TEXT NOT NULL,
-                username TEXT,
-                description TEXT NOT NULL,
-                additional_info TEXT,
-                suspicious INTEGER DEFAULT 0,
-                read_status INTEGER DEFAULT 0
-            )
-        ''')
+        # Row versions for optimistic concurrency (schema 8)
+        row_versions.setup(cursor)
+
+        # Activity logs: per-month partitions behind the activity_logs view,
+        # hash-chained for tamper evidence (schema 12; entries already in the log
+        # are chained once the archive table below exists)
+        self.log_chain.setup(cursor)
+        self.log_router.setup(cursor, previous_version)
+
+        # Sliding-window state of the suspicious-activity rules (schema 10)
+        self.activity_rules.setup(cursor)
 
         # Backup codes table
         cursor.execute('''
@@ -153,6 +353,59 @@ class DatabaseManager:
             )
         ''')
 
+        # Change data capture for mirrored tables (schema 9)
+        self.changelog.setup(cursor)
+
+        # Backup catalog (one row per backup archive, written at backup time)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS backup_catalog (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT UNIQUE NOT NULL,
+                created_date TEXT NOT NULL,
+                created_by TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                checksum TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                schema_version INTEGER NOT NULL,
+                row_counts TEXT NOT NULL,
+                retention_tags TEXT NOT NULL DEFAULT '',
+                deleted INTEGER DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_backup_catalog_created
+            ON backup_catalog (deleted, created_date)
+        ''')
+
+        # Archived activity logs (compressed + encrypted segments of old rows)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_archive_segments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_log_id INTEGER NOT NULL,
+                last_log_id INTEGER NOT NULL,
+                date_from TEXT NOT NULL,
+                date_to TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                created_date TEXT NOT NULL,
+                payload BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_log_archive_dates
+            ON log_archive_segments (date_from, date_to)
+        ''')
+
+        # Chain the log entries written before schema 12 (or by a legacy migration)
+        self.log_chain.seal_new(cursor)
+
+        # Key/value store for system state (e.g. last retention run)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS system_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+
         # Predefined cities table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS cities (
@@ -183,13 +436,35 @@ class DatabaseManager:
             ''', ('super_admin', password_hash, 'super_admin', 'Super', 'Administrator',
                   datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'SYSTEM'))
 
+        cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
         conn.commit()
         conn.close()
 
-    def log_activity(self, username, description, additional_info="", suspicious=False):
-        """Log user activity"""
+    def get_schema_version(self):
+        """Get the schema version stored in the database file"""
+        conn = self.get_connection()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        conn.close()
+        return version
+
+    def get_table_row_counts(self, tables=('users', 'travellers', 'scooters',
+                                           'activity_logs', 'backup_codes')):
+        """Get row counts for the main tables"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        counts = {}
+        for table in tables:
+            counts[table] = cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        conn.close()
+        return counts
+
+    def log_activity(self, username, description, additional_info="", suspicious=False, cursor=None):
+        """Log user activity (in the caller's transaction when a cursor is given)"""
+        conn = None
+        if cursor is None:
+            conn = self.get_connection()
+            cursor = conn.cursor()
 
         now = datetime.now()
         date_str = now.strftime('%d-%m-%Y')
@@ -197,16 +472,47 @@ class DatabaseManager:
 
         # Encrypt the log entry
         encrypted_description = self.encrypt_data(description)
+        encrypted_username = self.encrypt_data(username) if username else ""
+
+        # Routed to the current month's partition (created on first write)
+        if not cursor.connection.in_transaction:  # a batch() already holds the write lock
+            cursor.execute('BEGIN IMMEDIATE')
+
+        # Sliding-window rules may flag the entry (state is updated in this transaction)
+        reasons = self.activity_rules.evaluate(cursor, username, description, now.timestamp())
+        if reasons:
+            suspicious = True
+            detected = f"Detected: {'; '.join(reasons)}"
+            additional_info = f"{additional_info} [{detected}]" if additional_info else detected
         encrypted_additional_info = self.encrypt_data(
             additional_info) if additional_info else ""
-        encrypted_username = self.encrypt_data(username) if username else ""
 
-        cursor.execute('''
-            INSERT INTO activity_logs (date, time, username, description, additional_info, suspicious)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (date_str, time_str, encrypted_username, encrypted_description,
-              encrypted_additional_info, 1 if suspicious else 0))
+        values = (date_str, time_str, encrypted_username, encrypted_description,
+                  encrypted_additional_info, 1 if suspicious else 0)
+        log_id = self.log_router.insert(cursor, now, values)
+
+        # Hash-chained to the previous entry in the same transaction
+        self.log_chain.append(cursor, (log_id,) + values + (int(now.timestamp()),))
+
+        if suspicious and isinstance(cursor.connection, BatchConnection):
+            cursor.connection.security_events.append((username, description, additional_info))
 
+        if conn is not None:
+            conn.commit()
+            conn.close()
+
+    def get_setting(self, key, default=None):
+        """Get a value from the system settings table"""
+        conn = self.get_connection()
+        row = conn.execute('SELECT value FROM system_settings WHERE key = ?', (key,)).fetchone()
+        conn.close()
+        return row[0] if row else default
+
+    def set_setting(self, key, value):
+        """Store a value in the system settings table"""
+        conn = self.get_connection()
+        conn.execute('INSERT OR REPLACE INTO system_settings (key, value) VALUES (?, ?)',
+                     (key, value))
         conn.commit()
         conn.close()
 
@@ -221,18 +527,11 @@ class DatabaseManager:
 
     def generate_customer_id(self):
         """Generate unique customer ID for travellers"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        return self.customer_ids.next_id()
 
-        while True:
-            customer_id = str(secrets.randbelow(
-                9000000000) + 1000000000)  # 10-digit number
-            exists = cursor.execute(
-                'SELECT COUNT(*) FROM travellers WHERE customer_id = ?', (customer_id,)
-            ).fetchone()[0]
-            if exists == 0:
-                conn.close()
-                return customer_id
+    def generate_customer_ids(self, count, cursor=None):
+        """Reserve count unique customer IDs at once (bulk imports)"""
+        return self.customer_ids.reserve(count, cursor)
 
     def close(self):
         """Clean up resources"""
@@ -242,81 +541,57 @@ class DatabaseManager:
 
 
 class InputValidator:
+    """Single-value checks backed by the patterns compiled in validation.py"""
+
+    _zip_code = re.compile(validation.ZIP_CODE).fullmatch
+    _mobile_phone = re.compile(validation.MOBILE_PHONE).fullmatch
+    _driving_license = re.compile(validation.DRIVING_LICENSE).fullmatch
+    _email = re.compile(validation.EMAIL).fullmatch
+    _username = re.compile(validation.USERNAME).fullmatch
+    _serial_number = re.compile(validation.SERIAL_NUMBER).fullmatch
+
     @staticmethod
     def validate_zip_code(zip_code):
         """Validate Dutch zip code format: DDDDXX"""
-        import re
-        pattern = r'^\d{4}[A-Z]{2}$'
-        return bool(re.match(pattern, zip_code))
+        return InputValidator._zip_code(zip_code) is not None
 
     @staticmethod
     def validate_mobile_phone(phone):
         """Validate mobile phone format: DDDDDDDD (8 digits)"""
-        import re
-        pattern = r'^\d{8}$'
-        return bool(re.match(pattern, phone))
+        return InputValidator._mobile_phone(phone) is not None
 
     @staticmethod
     def validate_driving_license(license_num):
         """Validate driving license format: XXDDDDDDD or XDDDDDDDD"""
-        import re
-        pattern = r'^[A-Z]{1,2}\d{7,8}$'
-        return bool(re.match(pattern, license_num))
+        return InputValidator._driving_license(license_num) is not None
 
     @staticmethod
     def validate_email(email):
         """Basic email validation"""
-        import re
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(pattern, email))
+        return InputValidator._email(email) is not None
 
     @staticmethod
     def validate_username(username):
         """Validate username according to requirements"""
-        import re
-        if len(username) < 8 or len(username) > 10:
-            return False
-        if not username[0].isalpha() and username[0] != '_':
-            return False
-        pattern = r'^[a-zA-Z_][a-zA-Z0-9_.\'-]*$'
-        return bool(re.match(pattern, username))
+        return InputValidator._username(username) is not None
 
     @staticmethod
     def validate_password(password):
         """Validate password according to requirements"""
-        if len(password) < 12 or len(password) > 30:
-            return False
-
-        has_lower = any(c.islower() for c in password)
-        has_upper = any(c.isupper() for c in password)
-        has_digit = any(c.isdigit() for c in password)
-        has_special = any(
-            c in "~!@#$%&_-+=`|\\(){}[]:;'<>,.?/" for c in password)
-
-        return all([has_lower, has_upper, has_digit, has_special])
+        return validation.is_strong_password(password)
 
     @staticmethod
     def validate_serial_number(serial):
         """Validate scooter serial number: 10-17 alphanumeric characters"""
-        import re
-        pattern = r'^[a-zA-Z0-9]{10,17}$'
-        return bool(re.match(pattern, serial))
+        return InputValidator._serial_number(serial) is not None
 
     @staticmethod
     def validate_coordinates(lat, lon):
         """Validate GPS coordinates for Rotterdam region"""
-        # Rotterdam region approximate bounds
-        if not (51.85 <= lat <= 52.05):
-            return False
-        if not (4.35 <= lon <= 4.65):
-            return False
-        return True
+        return (validation.LATITUDE_RANGE[0] <= lat <= validation.LATITUDE_RANGE[1]
+                and validation.LONGITUDE_RANGE[0] <= lon <= validation.LONGITUDE_RANGE[1])
 
     @staticmethod
     def validate_date_iso(date_str):
         """Validate ISO 8601 date format: YYYY-MM-DD"""
-        try:
-            datetime.strptime(date_str, '%Y-%m-%d')
-            return True
-        except ValueError:
-            return False
+        return validation.is_iso_date(date_str)
@@ -0,0 +1,149 @@
+# id_allocator.py
+import hashlib
+import threading
+
+
+CUSTOMER_ID_SEQUENCE = 'customer_id'
+FIRST_CUSTOMER_ID = 1000000000
+CUSTOMER_ID_SPACE = 9000000000      # 10-digit numbers: 1000000000-9999999999
+
+# The Feistel network permutes 2 * HALF_BITS bits; values outside the ID
+# space are walked through the permutation again until they fall inside it.
+HALF_BITS = 17
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+# Counters kept in memory per process for single-ID allocations
+BLOCK_SIZE = 64
+
+
+class CustomerIdAllocator:
+    """Unique, non-sequential customer IDs without existence lookups.
+
+    A persistent counter in id_sequences is advanced with one UPDATE ...
+    RETURNING per reservation, so every process gets disjoint counter ranges
+    (SQLite serialises the writes). Each counter is mapped to a 10-digit ID by
+    a keyed Feistel permutation, which is a bijection: different counters can
+    never give the same ID, and IDs do not reveal the registration order.
+
+    IDs assigned randomly before the sequence existed are recorded as legacy
+    rows; only while such rows exist are candidates checked against them.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._round_keys = None
+        self._lock = threading.Lock()
+        self._block = []   # reserved, committed counters not handed out yet
+        self._legacy_max_id = None
+
+    def setup(self, cursor):
+        """Create the sequence table and register pre-existing random IDs as legacy"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS id_sequences (
+                name TEXT PRIMARY KEY,
+                next_value INTEGER NOT NULL,
+                legacy_max_id INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO id_sequences (name, next_value, legacy_max_id)
+            VALUES (?, 0, (SELECT COALESCE(MAX(id), 0) FROM travellers))
+        ''', (CUSTOMER_ID_SEQUENCE,))
+
+    @property
+    def round_keys(self):
+        """Per-round 32-bit keys derived from the system encryption key"""
+        if self._round_keys is None:
+            digest = hashlib.blake2b(self.db.encryption_key, digest_size=4 * ROUNDS,
+                                     person=b'customer-ids').digest()
+            self._round_keys = [int.from_bytes(digest[i * 4:i * 4 + 4], 'big') for i in range(ROUNDS)]
+        return self._round_keys
+
+    @staticmethod
+    def _round(half, round_key):
+        """Keyed 32-bit multiply/xorshift mix, truncated to one half"""
+        x = ((half ^ round_key) * 0x9E3779B1) & 0xFFFFFFFF
+        x ^= x >> 15
+        x = (x * 0x85EBCA77) & 0xFFFFFFFF
+        x ^= x >> 13
+        return x & HALF_MASK
+
+    def permute(self, counter):
+        """Map a counter in [0, CUSTOMER_ID_SPACE) to a unique 10-digit customer ID"""
+        if not 0 <= counter < CUSTOMER_ID_SPACE:
+            raise ValueError('Customer ID space exhausted.')
+        round_keys = self.round_keys
+        value = counter
+        while True:
+            left, right = value >> HALF_BITS, value & HALF_MASK
+            for round_key in round_keys:
+                left, right = right, left ^ self._round(right, round_key)
+            value = (left << HALF_BITS) | right
+            if value < CUSTOMER_ID_SPACE:
+                return str(FIRST_CUSTOMER_ID + value)
+
+    def _reserve_counters(self, cursor, count):
+        """Advance the persistent counter by count; returns the reserved range"""
+        row = cursor.execute('''
+            UPDATE id_sequences SET next_value = next_value + ?
+            WHERE name = ? RETURNING next_value, legacy_max_id
+        ''', (count, CUSTOMER_ID_SEQUENCE)).fetchone()
+        end, self._legacy_max_id = row
+        if end > CUSTOMER_ID_SPACE:
+            raise ValueError('Customer ID space exhausted.')
+        return range(end - count, end)
+
+    def _without_legacy(self, cursor, ids):
+        """Drop candidates that collide with a legacy random ID"""
+        if not self._legacy_max_id:
+            return ids
+        taken = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            taken.update(row[0] for row in cursor.execute(
+                f"SELECT customer_id FROM travellers WHERE id <= ? "
+                f"AND customer_id IN ({','.join('?' * len(chunk))})", [self._legacy_max_id] + chunk))
+        return [customer_id for customer_id in ids if customer_id not in taken]
+
+    def reserve(self, count, cursor=None):
+        """Reserve count customer IDs with one counter update.
+
+        When the connection already has a transaction open (batch mode) the
+        reservation joins it, so a rollback also releases the IDs; otherwise
+        it is committed at once.
+        """
+        ids = []
+        conn = None
+        if cursor is None:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+        try:
+            own_transaction = not cursor.connection.in_transaction
+            if own_transaction:
+                cursor.execute('BEGIN IMMEDIATE')
+            while len(ids) < count:
+                needed = count - len(ids)
+                ids.extend(self._without_legacy(
+                    cursor, [self.permute(counter) for counter in self._reserve_counters(cursor, needed)]))
+            if own_transaction:
+                cursor.connection.commit()
+        finally:
+            if conn is not None:
+                conn.close()
+        return ids
+
+    def next_id(self):
+        """One customer ID, taken from a block reserved and committed in advance"""
+        with self._lock:
+            if not self._block:
+                conn = self.db.get_connection()
+                try:
+                    if conn.in_transaction:
+                        # Inside a caller's transaction (batch mode): a rollback would
+                        # hand the counters out again, so keep nothing in memory
+                        return self.reserve(1, conn.cursor())[0]
+                    self._block = self.reserve(BLOCK_SIZE, conn.cursor())[::-1]
+                finally:
+                    conn.close()
+            return self._block.pop()
@@ -0,0 +1,416 @@
+# log_chain.py
+"""
+Tamper-evident hash chain over the activity log.
+
+Every log entry gets a MAC in log_chain: an HMAC (keyed from the system
+encryption key) over the previous entry's MAC and the entry's stored columns,
+ciphertext as-is. Editing, deleting or inserting a row outside log_activity
+breaks the chain at that row, and a MAC cannot be recomputed without the key.
+read_status is left out because marking entries as read is a legitimate change.
+
+Every CHECKPOINT_INTERVAL entries a checkpoint records the Merkle root of the
+MACs it covers and is itself signed together with the previous checkpoint's
+signature. Triggers on the partitions (log_partitions.PARTITION_TRIGGERS)
+note the id of every updated or deleted row in log_chain_dirty; verification
+fails if any of them is missing or differs from the installed definition.
+
+Rows only leave the log legitimately through the retention archive or a
+partition drop, and both write a tombstone: an HMAC over the removed id range
+and the archive segment's checksum or the partition's name. A missing row is
+accepted only inside a range whose tombstone verifies, so editing the archive
+or partition registry cannot explain a deletion away.
+
+Incremental verification checks the signed checkpoints and recomputes their
+Merkle roots from the stored MACs, compares the ids they cover with the ids
+still in the log (no decryption, no MAC per row), then re-reads the rows
+written since the last verified checkpoint, the rows marked dirty and the
+ROLLING_CHECKPOINTS least recently re-read checkpoints. It only sees edits the
+triggers recorded: someone with write access to the file can change a row and
+clear log_chain_dirty, which only a full run (or the rotation reaching that
+checkpoint) detects. Full verification re-reads every row and checks the
+archive segment checksums, so it should also run on a schedule.
+
+verify only reads; record_verification then checkpoints the verified tail and
+stamps what was checked, in a short write transaction.
+"""
+
+import bisect
+import hashlib
+import hmac
+import time
+from datetime import datetime
+
+from log_partitions import PARTITION_TRIGGERS
+
+
+CHECKPOINT_INTERVAL = 1000
+
+# Stored columns covered by an entry's MAC, in this order
+CHAINED_COLUMNS = 'id, date, time, username, description, additional_info, suspicious, ts'
+
+# Verification stops collecting problems after this many
+MAX_PROBLEMS = 50
+
+# Verified checkpoints an incremental run re-reads, least recently verified first
+ROLLING_CHECKPOINTS = 10
+
+# Tables the chain depends on; no trigger may be defined on them
+CHAIN_TABLES = ('log_chain', 'log_checkpoints', 'log_tombstones', 'log_chain_dirty')
+
+
+def merkle_root(leaves):
+    """SHA-256 Merkle root of the leaves (an odd node is carried up unchanged)"""
+    level = [hashlib.sha256(b'\x00' + leaf).digest() for leaf in leaves]
+    if not level:
+        return hashlib.sha256(b'').digest()
+    while len(level) > 1:
+        paired = [hashlib.sha256(b'\x01' + level[i] + level[i + 1]).digest()
+                  for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0]
+
+
+class LogChain:
+    """log_chain MACs, signed Merkle checkpoints and their verification"""
+
+    def __init__(self, db):
+        self.db = db
+        self.key = hmac.new(db.encryption_key, b'activity log chain', hashlib.sha256).digest()
+
+    def setup(self, cursor):
+        """Create the chain tables (before the partitions, whose triggers write to them)"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_chain (
+                log_id INTEGER PRIMARY KEY,
+                mac BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_checkpoints (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_id INTEGER NOT NULL,
+                last_id INTEGER NOT NULL,
+                entry_count INTEGER NOT NULL,
+                merkle_root BLOB NOT NULL,
+                head_mac BLOB NOT NULL,
+                signature BLOB NOT NULL,
+                created_at TEXT NOT NULL,
+                verified_at TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_tombstones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_id INTEGER NOT NULL,
+                last_id INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                mac BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_chain_dirty (
+                id INTEGER PRIMARY KEY,
+                log_id INTEGER NOT NULL
+            )
+        ''')
+
+    def _mac(self, previous, row):
+        message = b'\x1f'.join(b'\x00' if value is None else str(value).encode() for value in row)
+        return hmac.new(self.key, previous + b'\x1e' + message, hashlib.sha256).digest()
+
+    def _sign(self, previous_signature, first_id, last_id, count, root, head_mac):
+        message = f'{first_id}:{last_id}:{count}'.encode()
+        return hmac.new(self.key, previous_signature + message + root + head_mac,
+                        hashlib.sha256).digest()
+
+    def _tombstone_mac(self, first_id, last_id, source):
+        return hmac.new(self.key, f'tombstone:{first_id}:{last_id}:{source}'.encode(),
+                        hashlib.sha256).digest()
+
+    def tombstone(self, cursor, first_id, last_id, source):
+        """Record that ids first_id..last_id leave the log, in the remover's transaction.
+
+        source is 'archive:<sha256 of the segment payload>' or 'partition:<name>'.
+        """
+        cursor.execute('''
+            INSERT INTO log_tombstones (first_id, last_id, source, created_at, mac)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (first_id, last_id, source, datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+              self._tombstone_mac(first_id, last_id, source)))
+
+    @staticmethod
+    def _head(cursor):
+        """(log_id, mac) of the newest chained entry, or (0, b'') for an empty chain"""
+        row = cursor.execute('SELECT log_id, mac FROM log_chain ORDER BY log_id DESC LIMIT 1').fetchone()
+        return (row[0], row[1]) if row else (0, b'')
+
+    @staticmethod
+    def _last_checkpoint(cursor):
+        return cursor.execute('''
+            SELECT id, first_id, last_id, entry_count, merkle_root, head_mac, signature
+            FROM log_checkpoints ORDER BY id DESC LIMIT 1
+        ''').fetchone()
+
+    def append(self, cursor, row):
+        """Chain one new entry (row in CHAINED_COLUMNS order) in the writer's transaction"""
+        _, previous = self._head(cursor)
+        cursor.execute('INSERT INTO log_chain (log_id, mac) VALUES (?, ?)',
+                       (row[0], self._mac(previous, row)))
+        self._checkpoint_if_due(cursor, row[0])
+
+    def seal_new(self, cursor):
+        """Chain every entry newer than the chain head (bulk loads, entries from before the chain)"""
+        head_id, previous = self._head(cursor)
+        rows = cursor.execute(f'''
+            SELECT {CHAINED_COLUMNS} FROM activity_logs WHERE id > ? ORDER BY id
+        ''', (head_id,)).fetchall()
+        macs = []
+        for row in rows:
+            previous = self._mac(previous, row)
+            macs.append((row[0], previous))
+        cursor.executemany('INSERT INTO log_chain (log_id, mac) VALUES (?, ?)', macs)
+        while macs and self._checkpoint_if_due(cursor, macs[-1][0]):
+            pass
+        return len(macs)
+
+    def _checkpoint_if_due(self, cursor, head_id):
+        last = self._last_checkpoint(cursor)
+        after = last[2] if last else 0
+        due = cursor.execute('SELECT COUNT(*) FROM log_chain WHERE log_id > ? AND log_id <= ?',
+                             (after, head_id)).fetchone()[0] >= CHECKPOINT_INTERVAL
+        return self.checkpoint(cursor, limit=CHECKPOINT_INTERVAL) if due else None
+
+    def checkpoint(self, cursor, limit=None, upto=None):
+        """Sign the entries after the last checkpoint, at most limit and none past upto; None if none"""
+        last = self._last_checkpoint(cursor)
+        after = last[2] if last else 0
+        query = 'SELECT log_id, mac FROM log_chain WHERE log_id > ? AND log_id <= ? ORDER BY log_id'
+        params = [after, upto if upto is not None else self._head(cursor)[0]]
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        entries = cursor.execute(query, params).fetchall()
+        if not entries:
+            return None
+
+        first_id, last_id, head_mac = entries[0][0], entries[-1][0], entries[-1][1]
+        root = merkle_root([mac for _, mac in entries])
+        signature = self._sign(last[6] if last else b'', first_id, last_id, len(entries),
+                               root, head_mac)
+        cursor.execute('''
+            INSERT INTO log_checkpoints (
+                first_id, last_id, entry_count, merkle_root, head_mac, signature, created_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (first_id, last_id, len(entries), root, head_mac, signature,
+              datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        return last_id
+
+    def _removed_ranges(self, cursor, problems, full):
+        """Merged id ranges of the tombstones that verify, as (starts, ends)"""
+        ranges = []
+        for tombstone_id, first_id, last_id, source, mac in cursor.execute('''
+                SELECT id, first_id, last_id, source, mac FROM log_tombstones
+        ''').fetchall():
+            if not hmac.compare_digest(self._tombstone_mac(first_id, last_id, source), mac):
+                problems.append({'log_id': first_id,
+                                 'problem': f'tombstone {tombstone_id} forged or altered'})
+                continue
+            ranges.append((first_id, last_id))
+            if source.startswith('archive:'):
+                payloads = [row[0] for row in cursor.execute('''
+                    SELECT payload FROM log_archive_segments
+                    WHERE first_log_id <= ? AND last_log_id >= ?
+                ''', (first_id, last_id))]
+                if full:
+                    checksum = source.split(':', 1)[1]
+                    payloads = [p for p in payloads if hashlib.sha256(p).hexdigest() == checksum]
+                if not payloads:
+                    problems.append({'log_id': first_id,
+                                     'problem': f'archive segment for entries {first_id}-{last_id} '
+                                                f'missing or altered'})
+
+        merged = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        return [first for first, _ in merged], [last for _, last in merged]
+
+    @staticmethod
+    def _is_removed(removed, log_id):
+        starts, ends = removed
+        index = bisect.bisect_right(starts, log_id) - 1
+        return index >= 0 and log_id <= ends[index]
+
+    def _verify_rows(self, cursor, after_id, upto_id, problems, removed):
+        """Recompute the MACs of the entries in (after_id, upto_id]; returns rows checked"""
+        row = cursor.execute('SELECT mac FROM log_chain WHERE log_id <= ? ORDER BY log_id DESC LIMIT 1',
+                             (after_id,)).fetchone()
+        previous = row[0] if row else b''
+        rows = {row[0]: row for row in cursor.execute(
+            f'SELECT {CHAINED_COLUMNS} FROM activity_logs WHERE id > ? AND id <= ?',
+            (after_id, upto_id))}
+        chain = cursor.execute('''
+            SELECT log_id, mac FROM log_chain WHERE log_id > ? AND log_id <= ? ORDER BY log_id
+        ''', (after_id, upto_id)).fetchall()
+
+        for log_id, mac in chain:
+            row = rows.pop(log_id, None)
+            if row is None:
+                if not self._is_removed(removed, log_id):
+                    problems.append({'log_id': log_id, 'problem': 'entry deleted'})
+            elif not hmac.compare_digest(self._mac(previous, row), mac):
+                problems.append({'log_id': log_id, 'problem': 'entry modified or chain broken'})
+            previous = mac
+        for log_id in sorted(rows):
+            problems.append({'log_id': log_id, 'problem': 'entry not in the chain'})
+        return len(chain)
+
+    @staticmethod
+    def _check_triggers(cursor, problems):
+        """Every partition must carry exactly the installed triggers, and the chain tables none"""
+        partitions = [row[0] for row in cursor.execute(
+            'SELECT name FROM log_partitions WHERE dropped = 0')]
+        expected = {}
+        for name in partitions:
+            for trigger in PARTITION_TRIGGERS:
+                sql = trigger.format(name=name).replace('IF NOT EXISTS ', '', 1)
+                expected[sql.split()[2]] = sql
+        installed = {name: (table, sql) for name, table, sql in cursor.execute(
+            "SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'trigger'")}
+
+        for name, sql in expected.items():
+            if name not in installed:
+                problems.append({'log_id': 0, 'problem': f'trigger {name} missing'})
+            elif installed[name][1] != sql:
+                problems.append({'log_id': 0, 'problem': f'trigger {name} altered'})
+        watched = set(partitions) | set(CHAIN_TABLES)
+        for name, (table, _) in installed.items():
+            if table in watched and name not in expected:
+                problems.append({'log_id': 0, 'problem': f'unexpected trigger {name} on {table}'})
+
+    def verify(self, cursor, full=False):
+        """Check the chain; incremental unless full (see the module docstring).
+
+        Only reads, so run it in a read transaction for a consistent view.
+        Returns a dict with the problems found (each a log_id and a
+        description, in id order), the checkpoints and rows checked and the
+        elapsed seconds, plus what record_verification needs.
+        """
+        started = time.perf_counter()
+        problems = []
+        self._check_triggers(cursor, problems)
+        checkpoints = cursor.execute('''
+            SELECT id, first_id, last_id, entry_count, merkle_root, head_mac, signature, verified_at
+            FROM log_checkpoints ORDER BY id
+        ''').fetchall()
+
+        # Signed checkpoints: O(checkpoints) plus a hash per stored MAC
+        previous_signature = b''
+        verified_upto = 0
+        broken_checkpoint = False
+        checkpointed_ids = []
+        for cp_id, first_id, last_id, count, root, head_mac, signature, verified_at in checkpoints:
+            expected = self._sign(previous_signature, first_id, last_id, count, root, head_mac)
+            entries = cursor.execute(
+                'SELECT log_id, mac FROM log_chain WHERE log_id >= ? AND log_id <= ? ORDER BY log_id',
+                (first_id, last_id)).fetchall()
+            macs = [mac for _, mac in entries]
+            if not hmac.compare_digest(expected, signature):
+                problems.append({'log_id': first_id, 'problem': f'checkpoint {cp_id} signature invalid'})
+                broken_checkpoint = True
+            elif len(macs) != count or not hmac.compare_digest(merkle_root(macs), root) \
+                    or macs[-1] != head_mac:
+                problems.append({'log_id': first_id,
+                                 'problem': f'chain entries {first_id}-{last_id} differ from checkpoint {cp_id}'})
+                broken_checkpoint = True
+            elif verified_at and not broken_checkpoint:
+                verified_upto = last_id
+            if not broken_checkpoint:
+                checkpointed_ids.extend(log_id for log_id, _ in entries)
+            previous_signature = signature
+
+        # Rows: everything when full, otherwise the unverified tail, the dirty
+        # ids and the least recently re-read checkpoints
+        after_id = 0 if full else verified_upto
+        removed = self._removed_ranges(cursor, problems, full)
+
+        # Verified ranges are not re-read, but their ids must still match the
+        # log: this catches rows dropped or added without firing the triggers
+        if after_id:
+            present = {row[0] for row in cursor.execute(
+                'SELECT id FROM activity_logs WHERE id <= ?', (after_id,))}
+            for log_id in checkpointed_ids:
+                if log_id > after_id:
+                    break
+                if log_id in present:
+                    present.discard(log_id)
+                elif not self._is_removed(removed, log_id):
+                    problems.append({'log_id': log_id, 'problem': 'entry deleted'})
+            problems.extend({'log_id': log_id, 'problem': 'entry not in the chain'}
+                            for log_id in present)
+
+        newest = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM activity_logs').fetchone()[0]
+        checked_upto = max(newest, self._head(cursor)[0])
+        rows_checked = self._verify_rows(cursor, after_id, checked_upto, problems, removed)
+
+        rechecked = []
+        if after_id:
+            rechecked = cursor.execute('''
+                SELECT id, first_id, last_id FROM log_checkpoints
+                WHERE verified_at IS NOT NULL AND last_id <= ?
+                ORDER BY verified_at, id LIMIT ?
+            ''', (after_id, ROLLING_CHECKPOINTS)).fetchall()
+        dirty_upto, = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM log_chain_dirty').fetchone()
+        dirty = [row[0] for row in cursor.execute(
+            'SELECT DISTINCT log_id FROM log_chain_dirty WHERE log_id <= ? ORDER BY log_id', (after_id,))]
+        # Consecutive ids (an archived batch, say) are re-read as one range
+        runs = [[first_id, last_id] for _, first_id, last_id in rechecked]
+        for log_id in dirty:
+            if runs and log_id == runs[-1][1] + 1:
+                runs[-1][1] = log_id
+            else:
+                runs.append([log_id, log_id])
+        for first, last in runs:
+            rows_checked += self._verify_rows(cursor, first - 1, last, problems, removed)
+
+        # A row re-read twice can also show up in the id comparison
+        problems = sorted({(p['log_id'], p['problem']): p for p in problems}.values(),
+                          key=lambda problem: problem['log_id'])
+
+        return {
+            'intact': not problems,
+            'problems': problems[:MAX_PROBLEMS],
+            'problem_count': len(problems),
+            'checkpoints': len(checkpoints),
+            'rows_checked': rows_checked,
+            'full': full,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+            'checked_upto': checked_upto,
+            'dirty_upto': dirty_upto,
+            'rechecked': [cp_id for cp_id, _, _ in rechecked]
+        }
+
+    def record_verification(self, cursor, report):
+        """After an intact verify: checkpoint the verified tail, stamp the checkpoints, clear dirty.
+
+        Runs in its own write transaction, so anything written since verify
+        read the log (newer entries, newly dirty rows) is left for the next run.
+        """
+        if not report['intact']:
+            return
+        self.checkpoint(cursor, upto=report['checked_upto'])
+        cursor.execute('DELETE FROM log_chain_dirty WHERE id <= ?', (report['dirty_upto'],))
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if report['full']:
+            cursor.execute('UPDATE log_checkpoints SET verified_at = ? WHERE last_id <= ?',
+                           (now, report['checked_upto']))
+            return
+        cursor.execute('UPDATE log_checkpoints SET verified_at = ? WHERE verified_at IS NULL AND last_id <= ?',
+                       (now, report['checked_upto']))
+        cursor.executemany('UPDATE log_checkpoints SET verified_at = ? WHERE id = ?',
+                           [(now, cp_id) for cp_id in report['rechecked']])
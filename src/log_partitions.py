@@ -0,0 +1,440 @@
+# log_partitions.py
+from datetime import datetime
+
+
+PARTITION_PREFIX = 'activity_logs_p'
+LOG_VIEW = 'activity_logs'
+LEGACY_COLUMNS = 'id, date, time, username, description, additional_info, suspicious, read_status'
+LOG_COLUMNS = LEGACY_COLUMNS + ', ts'
+
+# Epoch seconds from the stored local 'DD-MM-YYYY' date and 'HH:MM:SS' time
+TS_FROM_DATE_SQL = ("CAST(strftime('%s', substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || "
+                    "substr(date, 1, 2) || ' ' || time, 'utc') AS INTEGER)")
+
+PARTITION_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        username TEXT,
+        description TEXT NOT NULL,
+        additional_info TEXT,
+        suspicious INTEGER DEFAULT 0,
+        read_status INTEGER DEFAULT 0,
+        ts INTEGER
+    )
+'''
+
+PARTITION_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_{name}_suspicious ON {name} (suspicious, read_status)',
+    'CREATE INDEX IF NOT EXISTS idx_{name}_ts ON {name} (ts)'
+]
+
+# Single-row counters kept current by triggers on every partition
+UNREAD_SUSPICIOUS = 'unread_suspicious'
+UNREAD_SQL = '({row}.suspicious = 1 AND {row}.read_status = 0)'
+
+PARTITION_TRIGGERS = [
+    f'''CREATE TRIGGER IF NOT EXISTS {{name}}_unread_insert AFTER INSERT ON {{name}}
+        WHEN {UNREAD_SQL.format(row='NEW')}
+        BEGIN
+            UPDATE log_counters SET value = value + 1 WHERE name = '{UNREAD_SUSPICIOUS}';
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {{name}}_unread_update
+        AFTER UPDATE OF suspicious, read_status ON {{name}}
+        WHEN {UNREAD_SQL.format(row='NEW')} <> {UNREAD_SQL.format(row='OLD')}
+        BEGIN
+            UPDATE log_counters
+            SET value = value + {UNREAD_SQL.format(row='NEW')} - {UNREAD_SQL.format(row='OLD')}
+            WHERE name = '{UNREAD_SUSPICIOUS}';
+        END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {{name}}_unread_delete AFTER DELETE ON {{name}}
+        WHEN {UNREAD_SQL.format(row='OLD')}
+        BEGIN
+            UPDATE log_counters SET value = value - 1 WHERE name = '{UNREAD_SUSPICIOUS}';
+        END''',
+    # Rows changed after they were chained are re-verified (log_chain.LogChain.verify)
+    '''CREATE TRIGGER IF NOT EXISTS {name}_chain_insert AFTER INSERT ON {name}
+        WHEN NEW.id <= (SELECT MAX(log_id) FROM log_chain)
+        BEGIN
+            INSERT INTO log_chain_dirty (log_id) VALUES (NEW.id);
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS {name}_chain_update
+        AFTER UPDATE OF id, date, time, username, description, additional_info, suspicious, ts
+        ON {name}
+        BEGIN
+            INSERT INTO log_chain_dirty (log_id) VALUES (OLD.id);
+            INSERT INTO log_chain_dirty (log_id) VALUES (NEW.id);
+        END''',
+    '''CREATE TRIGGER IF NOT EXISTS {name}_chain_delete AFTER DELETE ON {name}
+        BEGIN
+            INSERT INTO log_chain_dirty (log_id) VALUES (OLD.id);
+        END''',
+]
+
+
+def parse_log_date(date_str):
+    """Parse a log date given as DD-MM-YYYY (stored format) or YYYY-MM-DD"""
+    for fmt in ('%d-%m-%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{date_str}' (expected DD-MM-YYYY or YYYY-MM-DD)")
+
+
+def to_timestamp(value, end_of_day=False):
+    """Convert a date string, datetime or epoch value to epoch seconds.
+
+    Date strings cover the whole day: start of day by default, or the last
+    second of the day with end_of_day=True.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    day = parse_log_date(value)
+    if end_of_day:
+        day = day.replace(hour=23, minute=59, second=59)
+    return int(day.timestamp())
+
+
+class LogPartitionRouter:
+    """Routes activity log reads and writes to per-month partition tables.
+
+    Every month gets its own table (activity_logs_pYYYYMM) registered in
+    log_partitions. Ids stay globally increasing because each new partition's
+    AUTOINCREMENT sequence is seeded past the previous high-water mark, and
+    writes always go to the newest partition. A UNION ALL view named
+    activity_logs keeps ad-hoc and whole-log queries working.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._write_partition = None  # (month, name) cache for the hot partition
+
+    @staticmethod
+    def month_key(when):
+        return when.strftime('%Y%m')
+
+    @staticmethod
+    def partition_name(month):
+        return f"{PARTITION_PREFIX}{month}"
+
+    def setup(self, cursor, schema_version=None):
+        """Create the registry, migrate older layouts and build the view"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_partitions (
+                name TEXT PRIMARY KEY,
+                month TEXT UNIQUE NOT NULL,
+                first_id INTEGER NOT NULL,
+                last_id INTEGER,
+                created_date TEXT NOT NULL,
+                dropped INTEGER DEFAULT 0
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+
+        legacy = cursor.execute(
+            "SELECT type FROM sqlite_master WHERE name = ?", (LOG_VIEW,)).fetchone()
+        if legacy and legacy[0] == 'table':
+            self._migrate_legacy_table(cursor)
+
+        # Schema 5 added the indexed epoch ts column; backfill older partitions
+        if schema_version is not None and schema_version < 5:
+            self._backfill_timestamps(cursor)
+
+        self._create_partition(cursor, self.month_key(datetime.now()))
+
+        # Schema 11 keeps the unread suspicious count in log_counters and schema
+        # 12 tracks changed rows for the hash chain; install the triggers on
+        # older partitions and start from an exact count
+        for name, _, _ in self.partitions(cursor):
+            for trigger in PARTITION_TRIGGERS:
+                cursor.execute(trigger.format(name=name))
+        cursor.execute('INSERT OR REPLACE INTO log_counters (name, value) VALUES (?, ?)',
+                       (UNREAD_SUSPICIOUS, self.recount_unread_suspicious(cursor)))
+
+    def _backfill_timestamps(self, cursor):
+        """Add and fill the ts column on partitions created before it existed"""
+        for name, _, _ in self.partitions(cursor):
+            columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({name})')]
+            if 'ts' not in columns:
+                cursor.execute(f'ALTER TABLE {name} ADD COLUMN ts INTEGER')
+            cursor.execute(f'UPDATE {name} SET ts = {TS_FROM_DATE_SQL} WHERE ts IS NULL')
+            for index in PARTITION_INDEXES:
+                cursor.execute(index.format(name=name))
+        self._rebuild_view(cursor)
+
+    def _migrate_legacy_table(self, cursor):
+        """Move rows of the single activity_logs table into monthly partitions"""
+        # date is stored as DD-MM-YYYY, so YYYYMM is substr(7, 4) || substr(4, 2)
+        month_expr = "substr(date, 7, 4) || substr(date, 4, 2)"
+        valid = "date GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9][0-9][0-9]'"
+        current = self.month_key(datetime.now())
+
+        cursor.execute(f'''
+            SELECT {month_expr}, MIN(id) FROM {LOG_VIEW}
+            WHERE {valid}
+            GROUP BY 1 ORDER BY 1
+        ''')
+        months = cursor.fetchall()
+
+        for month, first_id in months:
+            self._create_partition(cursor, month, first_id=first_id, rebuild_view=False)
+            cursor.execute(f'''
+                INSERT INTO {self.partition_name(month)} ({LOG_COLUMNS})
+                SELECT {LEGACY_COLUMNS}, {TS_FROM_DATE_SQL} FROM {LOG_VIEW}
+                WHERE {valid} AND {month_expr} = ?
+            ''', (month,))
+
+        # Rows with an unparseable date land in the current month
+        self._create_partition(cursor, max([current] + [m for m, _ in months]),
+                               rebuild_view=False)
+        newest = self.partition_name(max([current] + [m for m, _ in months]))
+        cursor.execute(f'''
+            INSERT INTO {newest} ({LOG_COLUMNS})
+            SELECT {LEGACY_COLUMNS}, NULL FROM {LOG_VIEW} WHERE NOT {valid}
+        ''')
+
+        # The newest partition continues after the highest migrated id
+        high = cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {LOG_VIEW}').fetchone()[0]
+        self._set_sequence(cursor, newest, high)
+
+        cursor.execute(f'DROP TABLE {LOG_VIEW}')
+        self._rebuild_view(cursor)
+
+    def _high_water(self, cursor):
+        """Highest log id ever issued across live and dropped partitions"""
+        live = cursor.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name LIKE ?",
+            (PARTITION_PREFIX + '%',)).fetchone()[0]
+        dropped = cursor.execute(
+            'SELECT COALESCE(MAX(last_id), 0) FROM log_partitions WHERE dropped = 1').fetchone()[0]
+        return max(live, dropped)
+
+    def _set_sequence(self, cursor, name, value):
+        """Force a partition's AUTOINCREMENT counter to at least value"""
+        updated = cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?',
+                                 (value, name)).rowcount
+        if not updated and value:
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (name, value))
+
+    def _create_partition(self, cursor, month, first_id=None, rebuild_view=True):
+        """Create and register a month partition if it does not exist yet"""
+        name = self.partition_name(month)
+        exists = cursor.execute(
+            'SELECT 1 FROM log_partitions WHERE name = ? AND dropped = 0', (name,)).fetchone()
+        if exists:
+            return name
+
+        high = self._high_water(cursor)
+        cursor.execute(PARTITION_SCHEMA.format(name=name))
+        for index in PARTITION_INDEXES:
+            cursor.execute(index.format(name=name))
+        for trigger in PARTITION_TRIGGERS:
+            cursor.execute(trigger.format(name=name))
+        if first_id is None:
+            self._set_sequence(cursor, name, high)
+
+        cursor.execute('''
+            INSERT OR REPLACE INTO log_partitions (name, month, first_id, created_date, dropped)
+            VALUES (?, ?, ?, ?, 0)
+        ''', (name, month, first_id if first_id is not None else high + 1,
+              datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+        if rebuild_view:
+            self._rebuild_view(cursor)
+        return name
+
+    def _rebuild_view(self, cursor):
+        """Recreate the activity_logs UNION ALL view over all live partitions"""
+        names = [row[0] for row in self.partitions(cursor, newest_first=False)]
+        cursor.execute(f'DROP VIEW IF EXISTS {LOG_VIEW}')
+        if names:
+            union = '\nUNION ALL\n'.join(f'SELECT {LOG_COLUMNS} FROM {name}' for name in names)
+            cursor.execute(f'CREATE VIEW {LOG_VIEW} AS {union}')
+
+    def partitions(self, cursor, newest_first=True, month_from=None, month_to=None):
+        """List live partitions as (name, month, first_id), optionally limited to a month range"""
+        query = 'SELECT name, month, first_id FROM log_partitions WHERE dropped = 0'
+        params = []
+        if month_from:
+            query += ' AND month >= ?'
+            params.append(month_from)
+        if month_to:
+            query += ' AND month <= ?'
+            params.append(month_to)
+        query += ' ORDER BY month DESC' if newest_first else ' ORDER BY month'
+        return cursor.execute(query, params).fetchall()
+
+    def partitions_for_window(self, cursor, start_ts=None, end_ts=None):
+        """Partition names (newest first) that can hold rows between two epoch times"""
+        month_from = self.month_key(datetime.fromtimestamp(start_ts)) if start_ts is not None else None
+        month_to = self.month_key(datetime.fromtimestamp(end_ts)) if end_ts is not None else None
+        return [row[0] for row in self.partitions(cursor, True, month_from, month_to)]
+
+    def fetch_window(self, cursor, start_ts=None, end_ts=None, limit=None, suspicious_only=False):
+        """Rows between two epoch times, newest first, via each partition's ts index.
+
+        Returns (partition_name, row) pairs with rows in LOG_COLUMNS order.
+        """
+        conditions = []
+        params = []
+        if start_ts is not None:
+            conditions.append('ts >= ?')
+            params.append(start_ts)
+        if end_ts is not None:
+            conditions.append('ts <= ?')
+            params.append(end_ts)
+        if suspicious_only:
+            conditions.append('suspicious = 1')
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+
+        results = []
+        for name in self.partitions_for_window(cursor, start_ts, end_ts):
+            query = f'SELECT {LOG_COLUMNS} FROM {name}{where} ORDER BY ts DESC, id DESC'
+            query_params = list(params)
+            if limit is not None:
+                remaining = limit - len(results)
+                if remaining <= 0:
+                    break
+                query += ' LIMIT ?'
+                query_params.append(remaining)
+            cursor.execute(query, query_params)
+            results.extend((name, row) for row in cursor.fetchall())
+        return results
+
+    def write_partition(self, cursor, when):
+        """Partition for a new row: the row's month, or the newest partition if later"""
+        month = self.month_key(when)
+        if self._write_partition and self._write_partition[0] == month:
+            return self._write_partition[1]
+
+        newest = self.partitions(cursor)
+        if newest and newest[0][1] > month:
+            return newest[0][0]
+
+        name = self._create_partition(cursor, month)
+        self._write_partition = (month, name)
+        return name
+
+    def insert(self, cursor, when, values):
+        """Insert a log row (date, time, username, description, additional_info, suspicious)"""
+        name = self.write_partition(cursor, when)
+        cursor.execute(f'''
+            INSERT INTO {name} (date, time, username, description, additional_info, suspicious, ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', tuple(values) + (int(when.timestamp()),))
+        return cursor.lastrowid
+
+    def fetch_recent(self, cursor, limit, suspicious_only=False):
+        """Newest rows first, reading partitions only until limit rows are found.
+
+        Returns (partition_name, row) pairs with rows in LOG_COLUMNS order.
+        """
+        results = []
+        where = ' WHERE suspicious = 1' if suspicious_only else ''
+        for name, _, _ in self.partitions(cursor):
+            remaining = limit - len(results)
+            if remaining <= 0:
+                break
+            cursor.execute(f'''
+                SELECT {LOG_COLUMNS} FROM {name}{where}
+                ORDER BY id DESC LIMIT ?
+            ''', (remaining,))
+            results.extend((name, row) for row in cursor.fetchall())
+        return results
+
+    def mark_read(self, cursor, rows_by_partition):
+        """Set read_status = 1 for {partition_name: [ids]}"""
+        for name, ids in rows_by_partition.items():
+            if not ids:
+                continue
+            placeholders = ','.join('?' * len(ids))
+            cursor.execute(f'''
+                UPDATE {name} SET read_status = 1
+                WHERE id IN ({placeholders})
+            ''', ids)
+
+    def count_unread_suspicious(self, cursor):
+        """Unread suspicious rows, read from the trigger-maintained counter row"""
+        row = cursor.execute('SELECT value FROM log_counters WHERE name = ?',
+                             (UNREAD_SUSPICIOUS,)).fetchone()
+        return row[0] if row else self.recount_unread_suspicious(cursor)
+
+    def _drop_partition_table(self, cursor, name):
+        """DROP TABLE skips the delete triggers, so take the partition's unread rows off the counter"""
+        unread = cursor.execute(f'''
+            SELECT COUNT(*) FROM {name}
+            WHERE suspicious = 1 AND read_status = 0
+        ''').fetchone()[0] if self._table_exists(cursor, name) else 0
+        if unread:
+            cursor.execute('UPDATE log_counters SET value = value - ? WHERE name = ?',
+                           (unread, UNREAD_SUSPICIOUS))
+        cursor.execute(f'DROP TABLE IF EXISTS {name}')
+
+    @staticmethod
+    def _table_exists(cursor, name):
+        return cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+    def recount_unread_suspicious(self, cursor):
+        """Count unread suspicious rows using each partition's index"""
+        total = 0
+        for name, _, _ in self.partitions(cursor):
+            total += cursor.execute(f'''
+                SELECT COUNT(*) FROM {name}
+                WHERE suspicious = 1 AND read_status = 0
+            ''').fetchone()[0]
+        return total
+
+    def rewind(self, cursor, month):
+        """Let an empty log accept rows from an earlier month (used when seeding history).
+
+        Drops the empty partitions newer than month so later writes create
+        partitions in chronological order. Returns False if the log has rows.
+        """
+        if cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {LOG_VIEW})').fetchone()[0]:
+            return False
+
+        high = self._high_water(cursor)
+        for name, partition_month, first_id in self.partitions(cursor):
+            if partition_month <= month:
+                break
+            self._drop_partition_table(cursor, name)
+            if first_id <= high:
+                self.db.log_chain.tombstone(cursor, first_id, high, f'partition:{name}')
+            cursor.execute('UPDATE log_partitions SET dropped = 1, last_id = ? WHERE name = ?',
+                           (high, name))
+        self._write_partition = None
+        self._rebuild_view(cursor)
+        return True
+
+    def drop_partition(self, cursor, name):
+        """Drop a whole partition in O(1); its id range stays reserved"""
+        newest = self.partitions(cursor)
+        if newest and newest[0][0] == name:
+            raise ValueError('Cannot drop the active log partition.')
+
+        last_id = cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = ?', (name,)).fetchone()
+        first_id = cursor.execute(
+            'SELECT first_id FROM log_partitions WHERE name = ?', (name,)).fetchone()
+        self._drop_partition_table(cursor, name)
+        # The log verifier only accepts the dropped rows as removed with this tombstone
+        if last_id and first_id and first_id[0] <= last_id[0]:
+            self.db.log_chain.tombstone(cursor, first_id[0], last_id[0], f'partition:{name}')
+        cursor.execute('''
+            UPDATE log_partitions SET dropped = 1, last_id = ?
+            WHERE name = ?
+        ''', (last_id[0] if last_id else None, name))
+        self._rebuild_view(cursor)
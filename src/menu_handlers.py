@@ -176,6 +176,9 @@ class MenuHandlers:
             print("3. Update Traveller")
             print("4. Delete Traveller")
             print("5. View Traveller Details")
+            print("6. Import Travellers from File")
+            if self.session.authz.check_permission('export_travellers'):
+                print("7. Export Travellers to File")
             print("\n0. Back to Main Menu")
             print("-" * 40)
             
@@ -193,6 +196,10 @@ class MenuHandlers:
                 self.delete_traveller_submenu()
             elif choice == '5':
                 self.view_traveller_details_submenu()
+            elif choice == '6':
+                self.import_travellers_submenu()
+            elif choice == '7' and self.session.authz.check_permission('export_travellers'):
+                self.export_travellers_submenu()
             else:
                 print("Invalid choice.")
                 input("Press Enter to continue...")
@@ -243,6 +250,54 @@ class MenuHandlers:
         
         input("Press Enter to continue...")
     
+    def import_travellers_submenu(self):
+        """Bulk import travellers from a CSV or JSON-lines file"""
+        self.console.clear_screen()
+        print("=== IMPORT TRAVELLERS ===\n")
+        print("CSV files need a header row; other files are read as JSON lines.")
+        print("Fields: first_name, last_name, birthday, gender, street_name, house_number,")
+        print("        zip_code, city, email_address, mobile_phone, driving_license_number\n")
+
+        source_path = input("File path: ").strip()
+        if not source_path:
+            print("File path is required.")
+            input("Press Enter to continue...")
+            return
+
+        print("\nImporting...")
+        result = self.traveller_mgr.import_travellers(source_path)
+
+        print(f"\n{result['message']}")
+        if result['success']:
+            print(f"Time: {result['data']['seconds']} s")
+            if result['data']['rejects_file']:
+                print(f"Rejected records written to: {result['data']['rejects_file']}")
+
+        input("Press Enter to continue...")
+    
+    def export_travellers_submenu(self):
+        """Export all travellers, decrypted, to a file"""
+        self.console.clear_screen()
+        print("=== EXPORT TRAVELLERS ===\n")
+        print("WARNING: the export contains decrypted personal data.")
+        print("Files ending in .ndjson/.jsonl are written as JSON lines, others as CSV.\n")
+
+        dest_path = input("Destination file: ").strip()
+        if not dest_path:
+            print("Destination file is required.")
+            input("Press Enter to continue...")
+            return
+        recipient_key = input("Recipient Fernet key (leave empty for a plain file): ").strip() or None
+
+        print("\nExporting...")
+        result = self.traveller_mgr.export_travellers(dest_path, recipient_key=recipient_key)
+
+        print(f"\n{result['message']}")
+        if result['success']:
+            print(f"File: {result['data']['file']} ({result['data']['seconds']} s)")
+
+        input("Press Enter to continue...")
+    
     def search_travellers_submenu(self):
         """Search travellers"""
         self.console.clear_screen()
@@ -280,6 +335,16 @@ class MenuHandlers:
             input("Press Enter to continue...")
             return
         
+        # The update only applies if nobody changed the traveller in the meantime
+        current = self.traveller_mgr.get_traveller_details(customer_id)
+        if not current['success']:
+            print(current['message'])
+            input("Press Enter to continue...")
+            return
+        traveller = current['data']
+        print(f"Current: {traveller['first_name']} {traveller['last_name']}, "
+              f"{traveller['email_address']}, {traveller['mobile_phone']}\n")
+        
         print("Enter new information (leave empty to skip):")
         first_name = input("First Name: ").strip() or None
         last_name = input("Last Name: ").strip() or None
@@ -297,7 +362,7 @@ class MenuHandlers:
             input("Press Enter to continue...")
             return
         
-        result = self.traveller_mgr.update_traveller(customer_id, **updates)
+        result = self.traveller_mgr.update_traveller(customer_id, expected_version=traveller['version'], **updates)
         print(f"\n{result['message']}")
         input("Press Enter to continue...")
     
@@ -459,6 +524,17 @@ class MenuHandlers:
             input("Press Enter to continue...")
             return
         
+        # The update only applies if nobody changed the scooter in the meantime
+        current = self.scooter_mgr.get_scooter_details(serial)
+        if not current['success']:
+            print(current['message'])
+            input("Press Enter to continue...")
+            return
+        scooter = current['data']
+        status = "Out of service" if scooter['out_of_service_status'] else "In service"
+        print(f"Current: SoC {scooter['state_of_charge']}%, location {scooter['latitude']}, "
+              f"{scooter['longitude']}, {status}\n")
+        
         print("Enter new information (leave empty to skip):")
         try:
             soc_input = input("State of Charge (%): ").strip()
@@ -488,7 +564,7 @@ class MenuHandlers:
             input("Press Enter to continue...")
             return
         
-        result = self.scooter_mgr.update_scooter(serial, **updates)
+        result = self.scooter_mgr.update_scooter(serial, expected_version=scooter['version'], **updates)
         print(f"\n{result['message']}")
         input("Press Enter to continue...")
     
@@ -0,0 +1,275 @@
+# metrics.py
+import contextvars
+import functools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+METRICS_FILE = "data/metrics.prom"
+METRIC_PREFIX = "urban_mobility"
+
+# Histogram precision: 2**SUB_BUCKET_BITS sub-buckets per power of two (<1% error)
+SUB_BUCKET_BITS = 7
+REPORTED_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+# Operation currently being measured in this thread/task (None outside any)
+current_operation = contextvars.ContextVar('current_operation', default=None)
+
+
+class LatencyHistogram:
+    """HDR-style histogram of microsecond values with log-linear buckets.
+
+    Each power of two is split into 2**SUB_BUCKET_BITS linear sub-buckets,
+    so memory stays small while any recorded value is known to within ~1%.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    @staticmethod
+    def _bucket(value):
+        shift = max(0, value.bit_length() - SUB_BUCKET_BITS - 1)
+        return (shift << (SUB_BUCKET_BITS + 1)) | (value >> shift)
+
+    @staticmethod
+    def _bucket_upper(bucket):
+        shift = bucket >> (SUB_BUCKET_BITS + 1)
+        mantissa = bucket & ((1 << (SUB_BUCKET_BITS + 1)) - 1)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, int(value))
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+
+    def percentile(self, quantile):
+        """Value at the given quantile (0-1), reported as its bucket's upper bound"""
+        if not self.count:
+            return 0
+        rank = max(1, int(round(quantile * self.count)))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._bucket_upper(bucket), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+
+class OperationStats:
+    """Latency histogram and counters for one instrumented operation"""
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.calls = 0
+        self.errors = 0
+        self.db_roundtrips = 0
+        self.crypto_ops = 0
+
+
+class _CallFrame:
+    """Per-call counters; nested calls roll theirs up into the caller"""
+
+    __slots__ = ('name', 'db_roundtrips', 'crypto_ops', 'failed')
+
+    def __init__(self, name):
+        self.name = name
+        self.db_roundtrips = 0
+        self.crypto_ops = 0
+        self.failed = False
+
+
+_current_frame = contextvars.ContextVar('metrics_frame', default=None)
+
+
+class MetricsRegistry:
+    """Thread-safe in-process store of per-operation statistics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+        self.started = time.time()
+
+    def record(self, name, seconds, error, db_roundtrips, crypto_ops):
+        with self._lock:
+            stats = self._operations.get(name)
+            if stats is None:
+                stats = self._operations[name] = OperationStats()
+            stats.latency.record(seconds * 1000000)
+            stats.calls += 1
+            stats.errors += 1 if error else 0
+            stats.db_roundtrips += db_roundtrips
+            stats.crypto_ops += crypto_ops
+
+    def snapshot(self):
+        """Per-operation summary dicts (latencies in milliseconds), sorted by name"""
+        with self._lock:
+            rows = []
+            for name in sorted(self._operations):
+                stats = self._operations[name]
+                latency = stats.latency
+                rows.append({
+                    'operation': name,
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'db_roundtrips': stats.db_roundtrips,
+                    'crypto_ops': stats.crypto_ops,
+                    'mean_ms': latency.mean() / 1000,
+                    'max_ms': latency.max / 1000,
+                    **{f"p{str(q * 100).rstrip('0').rstrip('.')}_ms": latency.percentile(q) / 1000
+                       for q in REPORTED_QUANTILES}
+                })
+            return rows
+
+    def reset(self):
+        with self._lock:
+            self._operations = {}
+            self.started = time.time()
+
+    def to_prometheus(self):
+        """Render all operations in the Prometheus text exposition format"""
+        duration = f"{METRIC_PREFIX}_operation_duration_seconds"
+        counters = [
+            ('calls', 'Instrumented calls'),
+            ('errors', 'Calls that raised or returned success=False'),
+            ('db_roundtrips', 'SQLite statements and commits issued'),
+            ('crypto_ops', 'Encrypt, decrypt and hash operations'),
+        ]
+        with self._lock:
+            lines = [f"# HELP {duration} Operation latency.", f"# TYPE {duration} summary"]
+            for name in sorted(self._operations):
+                latency = self._operations[name].latency
+                label = f'operation="{name}"'
+                for q in REPORTED_QUANTILES:
+                    lines.append(f'{duration}{{{label},quantile="{q}"}} {latency.percentile(q) / 1e6:.6f}')
+                lines.append(f'{duration}_sum{{{label}}} {latency.total / 1e6:.6f}')
+                lines.append(f'{duration}_count{{{label}}} {latency.count}')
+
+            for attribute, help_text in counters:
+                metric = f"{METRIC_PREFIX}_operation_{attribute}_total"
+                lines.append(f"# HELP {metric} {help_text}.")
+                lines.append(f"# TYPE {metric} counter")
+                for name in sorted(self._operations):
+                    value = getattr(self._operations[name], attribute)
+                    lines.append(f'{metric}{{operation="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=METRICS_FILE):
+        """Atomically write the exposition text for a textfile collector"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(self.to_prometheus())
+        os.replace(temp_path, path)
+        return path
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def measure(name, registry=REGISTRY):
+    """Time a block and record it under name, with its DB and crypto counts"""
+    frame = _CallFrame(name)
+    frame_token = _current_frame.set(frame)
+    name_token = current_operation.set(name)
+    start = time.perf_counter()
+    error = False
+    try:
+        yield frame
+    except BaseException:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_frame.reset(frame_token)
+        current_operation.reset(name_token)
+        parent = _current_frame.get()
+        if parent is not None:
+            parent.db_roundtrips += frame.db_roundtrips
+            parent.crypto_ops += frame.crypto_ops
+        registry.record(name, elapsed, error or frame.failed,
+                        frame.db_roundtrips, frame.crypto_ops)
+
+
+def _instrument_method(name, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with measure(name) as frame:
+            result = method(*args, **kwargs)
+            if isinstance(result, dict) and result.get('success') is False:
+                frame.failed = True
+            return result
+    return wrapper
+
+
+def instrument(cls):
+    """Class decorator: measure every public method of a manager class"""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_') or not callable(value) or isinstance(value, (staticmethod, classmethod)):
+            continue
+        setattr(cls, attr, _instrument_method(f"{cls.__name__}.{attr}", value))
+    return cls
+
+
+def count_db_roundtrip(count=1):
+    frame = _current_frame.get()
+    if frame is not None:
+        frame.db_roundtrips += count
+
+
+def count_crypto_op(count=1):
+    frame = _current_frame.get()
+    if frame is not None:
+        frame.crypto_ops += count
+
+
+class MeteredCursor(sqlite3.Cursor):
+    """Cursor that counts statements against the current operation"""
+
+    def execute(self, *args, **kwargs):
+        count_db_roundtrip()
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        count_db_roundtrip()
+        return super().executemany(*args, **kwargs)
+
+    def executescript(self, *args, **kwargs):
+        count_db_roundtrip()
+        return super().executescript(*args, **kwargs)
+
+
+class MeteredConnection(sqlite3.Connection):
+    """Connection factory for sqlite3.connect that counts round-trips"""
+
+    def cursor(self, factory=MeteredCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args, **kwargs):
+        count_db_roundtrip()
+        return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        count_db_roundtrip()
+        return super().executemany(*args, **kwargs)
+
+    def executescript(self, *args, **kwargs):
+        count_db_roundtrip()
+        return super().executescript(*args, **kwargs)
+
+    def commit(self):
+        count_db_roundtrip()
+        return super().commit()
@@ -0,0 +1,160 @@
+# models.py
+"""
+Typed, slotted record classes for rows read from the database.
+
+Queries select only the columns they need (see the *_COLUMNS projections)
+and install Model.row_factory(columns) on their cursor, so SQLite rows are
+turned straight into records without per-row dicts or positional indexing.
+Records remember which columns were loaded: item access (record['city']),
+get(), keys() and to_dict() cover exactly those, so code written for the old
+dict results keeps working.
+"""
+
+from dataclasses import dataclass, field, fields
+from operator import itemgetter
+
+
+class Record:
+    """Dict-style read access for the slotted dataclasses below"""
+
+    __slots__ = ()
+    BOOLEAN_FIELDS = ()
+
+    def __getitem__(self, key):
+        if key not in self.columns:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.columns else default
+
+    def keys(self):
+        return self.columns
+
+    def to_dict(self):
+        return {column: getattr(self, column) for column in self.columns}
+
+    @classmethod
+    def row_factory(cls, columns):
+        """sqlite3 row_factory building cls records from rows of the given columns"""
+        columns = tuple(columns)
+        names = [f.name for f in fields(cls) if f.name != 'columns']
+        # Missing attributes read the None appended to every row
+        getter = itemgetter(*[columns.index(name) if name in columns else len(columns)
+                              for name in names])
+        booleans = [name for name in cls.BOOLEAN_FIELDS if name in columns]
+
+        def make(cursor, row):
+            record = cls(*getter(row + (None,)), columns)
+            for name in booleans:
+                setattr(record, name, bool(getattr(record, name)))
+            return record
+        return make
+
+
+@dataclass(slots=True)
+class User(Record):
+    id: int = None
+    username: str = None
+    role: str = None
+    first_name: str = None
+    last_name: str = None
+    registration_date: str = None
+    created_by: str = None
+    is_active: bool = None
+    version: int = None
+    updated_at: str = None
+    columns: tuple = field(default=(), repr=False, compare=False)
+
+    BOOLEAN_FIELDS = ('is_active',)
+
+
+@dataclass(slots=True)
+class Traveller(Record):
+    id: int = None
+    customer_id: str = None
+    first_name: str = None
+    last_name: str = None
+    birthday: str = None
+    gender: str = None
+    street_name: str = None
+    house_number: str = None
+    zip_code: str = None
+    city: str = None
+    email_address: str = None
+    mobile_phone: str = None
+    driving_license_number: str = None
+    registration_date: str = None
+    created_by: str = None
+    version: int = None
+    updated_at: str = None
+    columns: tuple = field(default=(), repr=False, compare=False)
+
+
+@dataclass(slots=True)
+class Scooter(Record):
+    id: int = None
+    brand: str = None
+    model: str = None
+    serial_number: str = None
+    top_speed: int = None
+    battery_capacity: int = None
+    state_of_charge: int = None
+    target_range_soc_min: int = None
+    target_range_soc_max: int = None
+    latitude: float = None
+    longitude: float = None
+    out_of_service_status: bool = None
+    mileage: float = None
+    last_maintenance_date: str = None
+    in_service_date: str = None
+    created_by: str = None
+    version: int = None
+    updated_at: str = None
+    columns: tuple = field(default=(), repr=False, compare=False)
+
+    BOOLEAN_FIELDS = ('out_of_service_status',)
+
+
+@dataclass(slots=True)
+class LogEntry(Record):
+    id: int = None
+    date: str = None
+    time: str = None
+    username: str = None
+    description: str = None
+    additional_info: str = None
+    suspicious: bool = None
+    read_status: bool = None
+    columns: tuple = field(default=(), repr=False, compare=False)
+
+    BOOLEAN_FIELDS = ('suspicious', 'read_status')
+
+
+# Column projections used by the read paths
+USER_LIST_COLUMNS = ('username', 'role', 'first_name', 'last_name', 'registration_date',
+                     'created_by', 'is_active')
+USER_SEARCH_COLUMNS = USER_LIST_COLUMNS[:-1]
+USER_PROFILE_COLUMNS = ('id', 'username', 'role', 'first_name', 'last_name',
+                        'registration_date', 'created_by', 'version', 'updated_at')
+
+TRAVELLER_SEARCH_COLUMNS = ('customer_id', 'first_name', 'last_name', 'birthday', 'gender',
+                            'zip_code', 'city', 'registration_date')
+TRAVELLER_DETAIL_COLUMNS = tuple(f.name for f in fields(Traveller) if f.name != 'columns')
+
+SCOOTER_SEARCH_COLUMNS = ('serial_number', 'brand', 'model', 'state_of_charge', 'latitude',
+                          'longitude', 'out_of_service_status', 'mileage', 'in_service_date')
+SCOOTER_DETAIL_COLUMNS = tuple(f.name for f in fields(Scooter) if f.name != 'columns')
+
+LOG_COLUMNS = ('id', 'date', 'time', 'username', 'description', 'additional_info',
+               'suspicious', 'read_status')
+
+
+def json_default(value):
+    """json.dumps default= hook: records as dicts, anything else as text"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    return str(value)
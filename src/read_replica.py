@@ -0,0 +1,171 @@
+# read_replica.py
+"""
+Read-only replica of the database for reporting and log analysis.
+
+With UM_READ_REPLICA set to a number of seconds, DatabaseManager.get_read_connection()
+serves read-only queries (log search, searches and listings, exports) from a
+copy of the database next to it instead of from the live file. Once the live
+database has changed and the copy is older than that many seconds, the next
+read starts a refresh on a background thread and is served from the current
+copy meanwhile (only the very first read, with no copy yet, goes to the live
+database). The refresh copies the whole database into a temporary file with
+the SQLite online backup API, a batch of pages at a time so the live
+database is only briefly locked, and the file then replaces the replica.
+Connections already open keep reading the previous copy. Long decrypt scans
+therefore only touch the replica and never delay fleet updates on the live
+database.
+
+A write to the live database restarts a stepped copy from the beginning, so
+under constant writes it might never finish; after MAX_RESTARTS restarts the
+rest is copied in one step, which holds the read lock for the whole copy.
+
+Unset, empty or 0 keeps every read on the live database.
+"""
+
+import os
+import pathlib
+import sqlite3
+import tempfile
+import threading
+import time
+
+from sql_tracing import TracedConnection
+
+
+REPLICA_ENV = 'UM_READ_REPLICA'
+
+# Pages copied per backup step; the live database is unlocked between steps
+PAGES_PER_STEP = 1024
+
+# Restarts of a stepped copy before the copy is done in one step
+MAX_RESTARTS = 3
+
+# One refresh lock per replica file, so refreshing one replica never waits on another
+_refresh_locks = {}
+_refresh_locks_guard = threading.Lock()
+
+
+def _refresh_lock(path):
+    with _refresh_locks_guard:
+        return _refresh_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def configured_max_lag():
+    """Allowed replica staleness in seconds, or None when replica mode is off"""
+    value = os.environ.get(REPLICA_ENV, '').strip()
+    if not value:
+        return None
+    try:
+        max_lag = float(value)
+    except ValueError:
+        return None
+    return max_lag if max_lag > 0 else None
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def replica_path(db_path):
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.replica{ext or '.db'}"
+
+
+class ReadReplica:
+    """A backup-API copy of db_path that is at most max_lag seconds behind"""
+
+    def __init__(self, db_path, max_lag, path=None):
+        self.db_path = db_path
+        self.max_lag = max_lag
+        self.path = path or replica_path(db_path)
+        self._lock = _refresh_lock(self.path)
+
+    def _source_changed_at(self):
+        """Last write to the live database (ctime also covers a restored file)"""
+        changed = 0
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            changed = max(changed, stat.st_mtime, stat.st_ctime)
+        return changed
+
+    def is_stale(self):
+        try:
+            refreshed = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return True
+        return self._source_changed_at() > refreshed and time.time() - refreshed >= self.max_lag
+
+    @staticmethod
+    def _backup(source, dest):
+        """Stepped backup, finished in one step once writes have restarted it MAX_RESTARTS times"""
+        restarts = 0
+        last_remaining = None
+
+        def progress(status, remaining, total):
+            nonlocal restarts, last_remaining
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts >= MAX_RESTARTS:
+                    raise _TooManyRestarts()
+            last_remaining = remaining
+
+        try:
+            source.backup(dest, pages=PAGES_PER_STEP, progress=progress)
+        except _TooManyRestarts:
+            source.backup(dest, pages=-1)
+
+    def _copy(self):
+        """Back up into a temporary file, then swap it in for the replica"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(prefix='.replica-', suffix='.tmp', dir=directory)
+        os.close(fd)
+        try:
+            source = sqlite3.connect(self.db_path)
+            dest = sqlite3.connect(temp_path)
+            try:
+                self._backup(source, dest)
+            finally:
+                dest.close()
+                source.close()
+            os.utime(temp_path)
+            # Atomic rename: open readers keep the old file, new ones get this copy
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def refresh(self):
+        """Copy the live database into the replica; open readers keep the previous copy"""
+        with self._lock:
+            self._copy()
+
+    def refresh_in_background(self):
+        """Start a refresh thread unless one is running; returns whether one was started"""
+        if not self._lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                if self.is_stale():  # a refresh may have finished just before
+                    self._copy()
+            except (sqlite3.Error, OSError):
+                pass  # keep serving the current copy; the next read tries again
+            finally:
+                self._lock.release()
+
+        threading.Thread(target=run, name='replica-refresh', daemon=True).start()
+        return True
+
+    def connect(self):
+        """Read-only connection to the replica; a stale one is refreshed in the background"""
+        if not os.path.exists(self.path):
+            self.refresh_in_background()
+            return sqlite3.connect(self.db_path, factory=TracedConnection)
+        if self.is_stale():
+            self.refresh_in_background()
+        uri = f"{pathlib.Path(os.path.abspath(self.path)).as_uri()}?mode=ro"
+        return sqlite3.connect(uri, uri=True, factory=TracedConnection)
@@ -0,0 +1,403 @@
+# retention_manager.py
+from database_manager import DatabaseManager
+from log_partitions import LOG_COLUMNS, parse_log_date, to_timestamp
+from datetime import datetime, timedelta
+import hashlib
+import os
+import json
+import zlib
+
+
+# Grandfather-father-son backup retention and activity log archiving limits
+RETENTION_POLICY = {
+    'keep_daily': 7,          # newest backup of each of the last 7 days
+    'keep_weekly': 4,         # newest backup of each of the last 4 ISO weeks
+    'keep_monthly': 12,       # newest backup of each of the last 12 months
+    'log_max_age_days': 90,   # archive log rows older than this
+    'log_max_rows': 100000,   # archive oldest rows while the live table is larger
+    'batch_size': 1000,       # rows per archive segment / backups per prune pass
+    'max_batches': 10,        # segments written per run (keeps each run bounded)
+    'run_interval_hours': 24  # how often run_if_due actually does work
+}
+
+
+class LogArchive:
+    """Moves old activity_logs rows into compressed, encrypted archive segments.
+
+    Each segment holds the decrypted rows of one batch as zlib-compressed JSON,
+    encrypted as a whole with the system key, so archived logs stay searchable
+    on demand without keeping them in the live table.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def archive_batch(self, cutoff, max_rows, batch_size):
+        """Archive at most batch_size of the oldest eligible rows.
+
+        A row is eligible when it is older than cutoff or the live log holds
+        more than max_rows rows. Unread suspicious rows are never archived.
+        Partitions are processed oldest first and dropped once empty.
+        Returns the number of rows archived (0 when nothing is eligible).
+        """
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        router = self.db.log_router
+        cutoff_ts = to_timestamp(cutoff)
+
+        total = cursor.execute('SELECT COUNT(*) FROM activity_logs').fetchone()[0]
+        excess = max(0, total - max_rows)
+        partitions = router.partitions(cursor, newest_first=False)
+
+        selected = []
+        source = None
+        for position, (partition, _, _) in enumerate(partitions):
+            cursor.execute(f'''
+                SELECT {LOG_COLUMNS} FROM {partition}
+                WHERE NOT (suspicious = 1 AND read_status = 0)
+                ORDER BY id
+                LIMIT ?
+            ''', (batch_size,))
+            rows = cursor.fetchall()
+
+            newer_found = False
+            for index, log in enumerate(rows):
+                if index < excess or (log[8] or 0) < cutoff_ts:
+                    selected.append(log)
+                else:
+                    newer_found = True  # ids are chronological, so the rest is newer
+                    break
+
+            if selected:
+                source = partition
+                break
+            if newer_found:
+                break
+
+            # Nothing archivable here; drop it if it is an empty, inactive partition
+            is_active = position == len(partitions) - 1
+            if not is_active and not rows and not cursor.execute(
+                    f'SELECT EXISTS (SELECT 1 FROM {partition})').fetchone()[0]:
+                router.drop_partition(cursor, partition)
+                conn.commit()
+
+        if not selected:
+            conn.close()
+            return 0
+
+        entries = []
+        for log in selected:
+            entries.append({
+                'id': log[0],
+                'date': log[1],
+                'time': log[2],
+                'username': self.db.decrypt_data(log[3]) if log[3] else 'SYSTEM',
+                'description': self.db.decrypt_data(log[4]),
+                'additional_info': self.db.decrypt_data(log[5]) if log[5] else '',
+                'suspicious': bool(log[6]),
+                'read_status': bool(log[7])
+            })
+
+        payload = self.db.cipher_suite.encrypt(
+            zlib.compress(json.dumps(entries).encode(), 9))
+        dates = [parse_log_date(entry['date']).strftime('%Y-%m-%d') for entry in entries]
+
+        # Segment insert and row delete commit together
+        cursor.execute('''
+            INSERT INTO log_archive_segments (
+                first_log_id, last_log_id, date_from, date_to, row_count, created_date, payload
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (entries[0]['id'], entries[-1]['id'], min(dates), max(dates), len(entries),
+              datetime.now().strftime('%Y-%m-%d %H:%M:%S'), payload))
+
+        ids = [entry['id'] for entry in entries]
+        placeholders = ','.join('?' * len(ids))
+        cursor.execute(f'DELETE FROM {source} WHERE id IN ({placeholders})', ids)
+
+        # Signed tombstones let the log verifier accept exactly these ids as
+        # removed; kept unread suspicious rows split them into runs
+        checksum = hashlib.sha256(payload).hexdigest()
+        run_start = ids[0]
+        for previous, log_id in zip(ids, ids[1:] + [None]):
+            if log_id != previous + 1:
+                self.db.log_chain.tombstone(cursor, run_start, previous, f'archive:{checksum}')
+                run_start = log_id
+
+        # An emptied old partition is dropped instead of left behind
+        is_active = source == partitions[-1][0]
+        if not is_active and not cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM {source})').fetchone()[0]:
+            router.drop_partition(cursor, source)
+
+        conn.commit()
+        conn.close()
+        return len(entries)
+
+    def iter_segments(self, date_from=None, date_to=None):
+        """Yield the decoded rows of every segment overlapping the date range"""
+        query = 'SELECT id, payload FROM log_archive_segments'
+        params = []
+        conditions = []
+        if date_from:
+            conditions.append('date_to >= ?')
+            params.append(parse_log_date(date_from).strftime('%Y-%m-%d'))
+        if date_to:
+            conditions.append('date_from <= ?')
+            params.append(parse_log_date(date_to).strftime('%Y-%m-%d'))
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY last_log_id DESC'
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        segments = cursor.fetchall()
+        conn.close()
+
+        for segment in segments:
+            yield json.loads(zlib.decompress(self.db.cipher_suite.decrypt(segment[1])))
+
+    def search(self, search_term, date_from=None, date_to=None):
+        """Search archived rows by term (and optional date range), newest first"""
+        search_lower = search_term.lower()
+        start = parse_log_date(date_from) if date_from else None
+        end = parse_log_date(date_to) if date_to else None
+
+        matches = []
+        for entries in self.iter_segments(date_from, date_to):
+            for entry in reversed(entries):
+                logged = parse_log_date(entry['date'])
+                if (start and logged < start) or (end and logged > end):
+                    continue
+                if (search_lower in entry['username'].lower() or
+                        search_lower in entry['description'].lower() or
+                        search_lower in entry['additional_info'].lower()):
+                    entry['archived'] = True
+                    matches.append(entry)
+        return matches
+
+    def get_stats(self):
+        """Get segment and archived row counts"""
+        conn = self.db.get_read_connection()
+        cursor = conn.cursor()
+        segments, rows = cursor.execute('''
+            SELECT COUNT(*), COALESCE(SUM(row_count), 0) FROM log_archive_segments
+        ''').fetchone()
+        conn.close()
+        return {'segments': segments, 'archived_rows': rows}
+
+
+class RetentionManager:
+    def __init__(self, session_manager, policy=None):
+        self.db = DatabaseManager()
+        self.session = session_manager
+        self.auth = session_manager.auth
+        self.authz = session_manager.authz
+        self.policy = dict(RETENTION_POLICY, **(policy or {}))
+        self.archive = LogArchive(self.db)
+        self.backup_dir = "backups"
+
+    def run_retention(self, max_batches=None, delete_backups=()):
+        """Archive old logs in bounded batches and delete the confirmed backups GFS no longer keeps.
+
+        Only backups listed in delete_backups (as returned by
+        plan_backup_pruning and confirmed by the user) are deleted, and only
+        while the policy still selects them.
+        """
+        if not self.authz.check_permission('manage_retention'):
+            self.db.log_activity(
+                self.auth.current_user['username'],
+                "Unauthorized retention run attempt",
+                "Attempted to prune backups and archive logs",
+                suspicious=True
+            )
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot run retention.',
+                'data': None
+            }
+
+        try:
+            pruned = self._prune_backups(delete_backups) if delete_backups else []
+
+            cutoff = datetime.now() - timedelta(days=self.policy['log_max_age_days'])
+            max_batches = max_batches or self.policy['max_batches']
+            archived = 0
+            batches = 0
+            complete = False
+            while batches < max_batches:
+                count = self.archive.archive_batch(
+                    cutoff, self.policy['log_max_rows'], self.policy['batch_size'])
+                if count == 0:
+                    complete = True
+                    break
+                archived += count
+                batches += 1
+
+            self.db.set_setting('retention_last_run', datetime.now().isoformat())
+
+            self.db.log_activity(
+                self.auth.current_user['username'],
+                "Retention run completed",
+                f"Backups pruned: {len(pruned)}, Log rows archived: {archived}, Complete: {complete}"
+            )
+
+            return {
+                'success': True,
+                'message': f'Pruned {len(pruned)} backups and archived {archived} log entries.',
+                'data': {
+                    'backups_pruned': pruned,
+                    'logs_archived': archived,
+                    'batches': batches,
+                    'complete': complete
+                }
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error running retention: {str(e)}',
+                'data': None
+            }
+
+    def run_if_due(self):
+        """Archive old logs in one bounded pass if the run interval has elapsed.
+
+        Backups are never deleted here; that needs run_retention with a
+        confirmed list. Returns None when nothing was due or the current user
+        may not run it.
+        """
+        if not self.authz.check_permission('manage_retention'):
+            return None
+
+        last_run = self.db.get_setting('retention_last_run')
+        interval = timedelta(hours=self.policy['run_interval_hours'])
+        if last_run and datetime.now() - datetime.fromisoformat(last_run) < interval:
+            return None
+
+        return self.run_retention()
+
+    def plan_backup_pruning(self):
+        """List the backups the GFS policy would delete next (oldest first, bounded per run)"""
+        if not self.authz.check_permission('manage_retention'):
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot plan backup pruning.',
+                'data': None
+            }
+
+        try:
+            conn = self.db.get_connection()
+            prunable = self._prunable_backups(conn.cursor())
+            conn.close()
+            return {
+                'success': True,
+                'message': f'{len(prunable)} backups fall outside the retention policy.',
+                'data': prunable
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error planning backup pruning: {str(e)}',
+                'data': None
+            }
+
+    def get_retention_status(self):
+        """Get retention policy, live/archived log counts and last run time"""
+        if not self.authz.check_permission('manage_retention'):
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot view retention status.',
+                'data': None
+            }
+
+        try:
+            conn = self.db.get_connection()
+            cursor = conn.cursor()
+            live_rows = cursor.execute('SELECT COUNT(*) FROM activity_logs').fetchone()[0]
+            partitions = []
+            for name, month, _ in self.db.log_router.partitions(cursor):
+                rows = cursor.execute(f'SELECT COUNT(*) FROM {name}').fetchone()[0]
+                partitions.append({'month': month, 'rows': rows})
+            backups = cursor.execute(
+                'SELECT COUNT(*) FROM backup_catalog WHERE deleted = 0').fetchone()[0]
+            conn.close()
+
+            return {
+                'success': True,
+                'message': 'Retention status retrieved.',
+                'data': {
+                    'policy': self.policy,
+                    'live_log_rows': live_rows,
+                    'partitions': partitions,
+                    'backups': backups,
+                    'last_run': self.db.get_setting('retention_last_run'),
+                    **self.archive.get_stats()
+                }
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error retrieving retention status: {str(e)}',
+                'data': None
+            }
+
+    def _select_gfs_keep(self, backups):
+        """Pick the backups to keep: newest per day/week/month up to the policy limits"""
+        keep = set()
+        periods = [
+            ('keep_daily', lambda d: d.date()),
+            ('keep_weekly', lambda d: d.isocalendar()[:2]),
+            ('keep_monthly', lambda d: (d.year, d.month))
+        ]
+
+        for policy_key, period_of in periods:
+            seen = set()
+            for filename, created in backups:  # newest first
+                period = period_of(created)
+                if period in seen:
+                    continue
+                if len(seen) >= self.policy[policy_key]:
+                    break
+                seen.add(period)
+                keep.add(filename)
+
+        if backups:
+            keep.add(backups[0][0])  # never prune the latest backup
+        return keep
+
+    def _prunable_backups(self, cursor):
+        """Backups outside the GFS policy, oldest first and bounded per run, from the catalog alone"""
+        cursor.execute('''
+            SELECT filename, created_date FROM backup_catalog
+            WHERE deleted = 0
+            ORDER BY created_date DESC, id DESC
+        ''')
+        backups = [(row[0], datetime.strptime(row[1], '%Y-%m-%d %H:%M:%S'))
+                   for row in cursor.fetchall()]
+
+        # Backups with an outstanding restore code must stay available
+        cursor.execute('SELECT backup_file FROM backup_codes WHERE used = 0 AND revoked = 0')
+        protected = {row[0] for row in cursor.fetchall()}
+
+        keep = self._select_gfs_keep(backups) | protected
+        prunable = [filename for filename, _ in reversed(backups) if filename not in keep]
+        return prunable[:self.policy['batch_size']]
+
+    def _prune_backups(self, confirmed):
+        """Delete the confirmed backups the policy still selects"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        pruned = [filename for filename in self._prunable_backups(cursor) if filename in confirmed]
+
+        for filename in pruned:
+            backup_path = os.path.join(self.backup_dir, filename)
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+            cursor.execute('UPDATE backup_catalog SET deleted = 1 WHERE filename = ?', (filename,))
+
+        conn.commit()
+        conn.close()
+        return pruned
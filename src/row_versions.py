@@ -0,0 +1,75 @@
+# row_versions.py
+"""
+Optimistic concurrency control for users, travellers and scooters.
+
+Every row carries a version number and an updated_at timestamp. Updates
+that know the version they were based on pass it as expected_version; the
+UPDATE then only matches while the row still has that version, so a
+concurrent change is reported as a conflict instead of being overwritten.
+No lock is held between reading a row and writing it back.
+
+The manager updates bump the version themselves (VERSION_BUMP); a trigger
+bumps it for any other writer (password changes, direct SQL) so no update
+goes unnoticed.
+"""
+
+
+VERSIONED_TABLES = ('users', 'travellers', 'scooters')
+
+# SET clause fragment for updates that take part in version checks
+VERSION_BUMP = "version = version + 1, updated_at = datetime('now', 'localtime')"
+
+
+def setup(cursor):
+    """Add the version columns to existing tables and install the bump triggers"""
+    for table in VERSIONED_TABLES:
+        columns = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+        if 'version' not in columns:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+        if 'updated_at' not in columns:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN updated_at TEXT')
+        # Recursive triggers are off, so the trigger's own UPDATE does not fire it again
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_row_version
+            AFTER UPDATE ON {table}
+            WHEN NEW.version = OLD.version
+            BEGIN
+                UPDATE {table} SET {VERSION_BUMP} WHERE id = NEW.id;
+            END
+        ''')
+
+
+def versioned_update(cursor, table, assignments, params, where, where_params, expected_version=None):
+    """Compare-and-swap UPDATE of the row matching where.
+
+    Returns (new_version, None) on success, (None, current_version) when the
+    row exists but no longer has expected_version, and (None, None) when no
+    row matches where.
+    """
+    params = list(params) + list(where_params)
+    condition = where
+    if expected_version is not None:
+        condition = f'{where} AND version = ?'
+        params.append(int(expected_version))
+    row = cursor.execute(f'''
+        UPDATE {table} SET {", ".join(assignments)}, {VERSION_BUMP}
+        WHERE {condition}
+        RETURNING version
+    ''', params).fetchone()
+    if row:
+        return row[0], None
+    if expected_version is None:
+        return None, None
+    current = cursor.execute(f'SELECT version FROM {table} WHERE {where}', tuple(where_params)).fetchone()
+    return None, current[0] if current else None
+
+
+def conflict_result(entity, current_version):
+    """Manager result for an update that lost a compare-and-swap"""
+    return {
+        'success': False,
+        'message': f'{entity} was changed by another user (now version {current_version}). '
+                   f'Reload it and try again.',
+        'data': {'conflict': True, 'version': current_version}
+    }
+
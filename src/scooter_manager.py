@@ -1,7 +1,13 @@
 # scooter_manager.py
-from database_manager import DatabaseManager, InputValidator
+from database_manager import DatabaseManager
 from datetime import datetime
+import sqlite3
+from metrics import instrument
+import row_versions
+from models import Scooter, SCOOTER_SEARCH_COLUMNS, SCOOTER_DETAIL_COLUMNS
+import validation
 
+@instrument
 class ScooterManager:
     def __init__(self, session_manager):
         self.db = DatabaseManager()
@@ -85,8 +91,12 @@ class ScooterManager:
                 'data': None
             }
     
-    def update_scooter(self, serial_number, **kwargs):
-        """Update scooter information with role-based attribute editing"""
+    def update_scooter(self, serial_number, expected_version=None, **kwargs):
+        """Update scooter information with role-based attribute editing
+
+        With expected_version the update only applies if nobody changed the
+        scooter since that version was read; otherwise a conflict is returned.
+        """
         # Check basic permission
         if not self.authz.check_permission('update_scooter_info'):
             self.db.log_activity(
@@ -101,15 +111,6 @@ class ScooterManager:
                 'data': None
             }
         
-        # Check if scooter exists
-        scooter = self._get_scooter_by_serial(serial_number)
-        if not scooter:
-            return {
-                'success': False,
-                'message': 'Scooter not found.',
-                'data': None
-            }
-        
         # Validate and filter updates based on user role
         updates = []
         params = []
@@ -124,56 +125,49 @@ class ScooterManager:
                         'data': None
                     }
                 
-                # Validate field-specific values
-                if field in ['state_of_charge', 'target_range_soc_min', 'target_range_soc_max']:
-                    if not (0 <= value <= 100):
-                        return {'success': False, 'message': f'{field} must be between 0-100%.', 'data': None}
-                elif field in ['latitude', 'longitude']:
-                    lat = value if field == 'latitude' else scooter['latitude']
-                    lon = kwargs.get('longitude', scooter['longitude']) if field == 'latitude' else value
-                    if not InputValidator.validate_coordinates(lat, lon):
-                        return {'success': False, 'message': 'Invalid coordinates for Rotterdam region.', 'data': None}
-                elif field == 'last_maintenance_date':
-                    if not InputValidator.validate_date_iso(value):
-                        return {'success': False, 'message': 'Invalid date format (YYYY-MM-DD).', 'data': None}
-                elif field == 'serial_number':
-                    if not InputValidator.validate_serial_number(value):
-                        return {'success': False, 'message': 'Invalid serial number format.', 'data': None}
-                    if value != serial_number and self._serial_number_exists(value):
-                        return {'success': False, 'message': 'Serial number already exists.', 'data': None}
-                
                 updates.append(f"{field} = ?")
                 params.append(value)
         
+        error = validation.first_error(validation.SCOOTER, kwargs, partial=True)
+        if error:
+            return {'success': False, 'message': error, 'data': None}
+        
         if not updates:
             return {'success': False, 'message': 'No valid updates provided.', 'data': None}
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            params.append(serial_number)
-            cursor.execute(f'''
-                UPDATE scooters SET {", ".join(updates)}
-                WHERE serial_number = ?
-            ''', params)
-            
-            conn.commit()
-            conn.close()
+            # Existence/version check, update and log entry in one transaction
+            with self.db.transaction() as cursor:
+                version, current_version = row_versions.versioned_update(
+                    cursor, 'scooters', updates, params, 'serial_number = ?', (serial_number,),
+                    expected_version)
+                
+                if version:
+                    self.db.log_activity(
+                        self.auth.current_user['username'],
+                        "Scooter updated",
+                        f"Serial: {serial_number}, Fields: {', '.join(kwargs.keys())}",
+                        cursor=cursor
+                    )
             
-            # Log activity
-            self.db.log_activity(
-                self.auth.current_user['username'],
-                "Scooter updated",
-                f"Serial: {serial_number}, Fields: {', '.join(kwargs.keys())}"
-            )
+            if current_version is not None:
+                return row_versions.conflict_result('Scooter', current_version)
+            if not version:
+                return {
+                    'success': False,
+                    'message': 'Scooter not found.',
+                    'data': None
+                }
             
             return {
                 'success': True,
                 'message': 'Scooter updated successfully.',
-                'data': None
+                'data': {'version': version}
             }
             
+        except sqlite3.IntegrityError:
+            # The UNIQUE constraint rejects a serial number that is already in use
+            return {'success': False, 'message': 'Serial number already exists.', 'data': None}
         except Exception as e:
             return {
                 'success': False,
@@ -197,30 +191,26 @@ class ScooterManager:
                 'data': None
             }
         
-        # Check if scooter exists
-        scooter = self._get_scooter_by_serial(serial_number)
-        if not scooter:
-            return {
-                'success': False,
-                'message': 'Scooter not found.',
-                'data': None
-            }
-        
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM scooters WHERE serial_number = ?', (serial_number,))
-            
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as cursor:
+                scooter = cursor.execute(
+                    'DELETE FROM scooters WHERE serial_number = ? RETURNING brand, model',
+                    (serial_number,)).fetchone()
+                
+                if scooter:
+                    self.db.log_activity(
+                        self.auth.current_user['username'],
+                        "Scooter deleted",
+                        f"Serial: {serial_number}, Brand: {scooter[0]}, Model: {scooter[1]}",
+                        cursor=cursor
+                    )
             
-            # Log activity
-            self.db.log_activity(
-                self.auth.current_user['username'],
-                "Scooter deleted",
-                f"Serial: {serial_number}, Brand: {scooter['brand']}, Model: {scooter['model']}"
-            )
+            if not scooter:
+                return {
+                    'success': False,
+                    'message': 'Scooter not found.',
+                    'data': None
+                }
             
             return {
                 'success': True,
@@ -246,13 +236,13 @@ class ScooterManager:
             }
         
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_read_connection()
             cursor = conn.cursor()
             
             search_pattern = f'%{search_term.lower()}%'
-            cursor.execute('''
-                SELECT serial_number, brand, model, state_of_charge, latitude, longitude,
-                       out_of_service_status, mileage, in_service_date
+            cursor.row_factory = Scooter.row_factory(SCOOTER_SEARCH_COLUMNS)
+            cursor.execute(f'''
+                SELECT {', '.join(SCOOTER_SEARCH_COLUMNS)}
                 FROM scooters
                 WHERE LOWER(serial_number) LIKE ? OR 
                       LOWER(brand) LIKE ? OR 
@@ -260,23 +250,9 @@ class ScooterManager:
                 ORDER BY brand, model, serial_number
             ''', (search_pattern, search_pattern, search_pattern))
             
-            scooters = cursor.fetchall()
+            scooter_list = cursor.fetchall()
             conn.close()
             
-            scooter_list = []
-            for scooter in scooters:
-                scooter_list.append({
-                    'serial_number': scooter[0],
-                    'brand': scooter[1],
-                    'model': scooter[2],
-                    'state_of_charge': scooter[3],
-                    'latitude': scooter[4],
-                    'longitude': scooter[5],
-                    'out_of_service_status': bool(scooter[6]),
-                    'mileage': scooter[7],
-                    'in_service_date': scooter[8]
-                })
-            
             return {
                 'success': True,
                 'message': f'Found {len(scooter_list)} scooters matching "{search_term}".',
@@ -317,31 +293,16 @@ class ScooterManager:
                                state_of_charge, target_range_soc_min, target_range_soc_max,
                                latitude, longitude, last_maintenance_date):
         """Validate scooter input data"""
-        # Required fields
-        if not all([brand, model, serial_number]):
-            return {'success': False, 'message': 'Brand, model, and serial number are required.', 'data': None}
-        
-        # Serial number format
-        if not InputValidator.validate_serial_number(serial_number):
-            return {'success': False, 'message': 'Invalid serial number format (10-17 alphanumeric).', 'data': None}
-        
-        # Numeric validations
-        if not (0 <= state_of_charge <= 100):
-            return {'success': False, 'message': 'State of charge must be between 0-100%.', 'data': None}
-        
-        if not (0 <= target_range_soc_min <= 100) or not (0 <= target_range_soc_max <= 100):
-            return {'success': False, 'message': 'Target range SoC values must be between 0-100%.', 'data': None}
-        
-        if target_range_soc_min >= target_range_soc_max:
-            return {'success': False, 'message': 'Target range SoC min must be less than max.', 'data': None}
-        
-        # Coordinates validation
-        if not InputValidator.validate_coordinates(latitude, longitude):
-            return {'success': False, 'message': 'Invalid coordinates for Rotterdam region.', 'data': None}
-        
-        # Date validation
-        if last_maintenance_date and not InputValidator.validate_date_iso(last_maintenance_date):
-            return {'success': False, 'message': 'Invalid maintenance date format (YYYY-MM-DD).', 'data': None}
+        record = {
+            'brand': brand, 'model': model, 'serial_number': serial_number,
+            'top_speed': top_speed, 'battery_capacity': battery_capacity,
+            'state_of_charge': state_of_charge, 'target_range_soc_min': target_range_soc_min,
+            'target_range_soc_max': target_range_soc_max, 'latitude': latitude,
+            'longitude': longitude, 'last_maintenance_date': last_maintenance_date
+        }
+        error = validation.first_error(validation.SCOOTER, record)
+        if error:
+            return {'success': False, 'message': error, 'data': None}
         
         return {'success': True, 'message': 'Validation passed.', 'data': None}
     
@@ -363,28 +324,10 @@ class ScooterManager:
         conn = self.db.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM scooters WHERE serial_number = ?', (serial_number,))
+        cursor.row_factory = Scooter.row_factory(SCOOTER_DETAIL_COLUMNS)
+        cursor.execute(f"SELECT {', '.join(SCOOTER_DETAIL_COLUMNS)} FROM scooters WHERE serial_number = ?",
+                       (serial_number,))
         scooter = cursor.fetchone()
         conn.close()
-        
-        if scooter:
-            return {
-                'id': scooter[0],
-                'brand': scooter[1],
-                'model': scooter[2],
-                'serial_number': scooter[3],
-                'top_speed': scooter[4],
-                'battery_capacity': scooter[5],
-                'state_of_charge': scooter[6],
-                'target_range_soc_min': scooter[7],
-                'target_range_soc_max': scooter[8],
-                'latitude': scooter[9],
-                'longitude': scooter[10],
-                'out_of_service_status': bool(scooter[11]),
-                'mileage': scooter[12],
-                'last_maintenance_date': scooter[13],
-                'in_service_date': scooter[14],
-                'created_by': scooter[15]
-            }
-        return None
+        return scooter
 
@@ -0,0 +1,312 @@
+# service_api.py
+"""
+Local HTTP/JSON service exposing the manager operations to concurrent clients.
+
+Endpoints:
+    POST /login          {"username": ..., "password": ...}  -> {"token": ...}
+    POST /logout         (Authorization: Bearer <token>)
+    POST /op/<name>      arguments as a JSON object or list  -> manager result
+    GET  /health
+    GET  /metrics        (Authorization: Bearer <token>, view_metrics) Prometheus text format
+
+All tokens share one set of managers; each request runs as its token's user
+through auth_manager.session_scope(), so requests run in parallel. Blocking
+SQLite and Fernet work runs on a bounded thread pool whose threads each keep
+one pooled SQLite connection, and the number of requests in flight is capped;
+requests that cannot get a slot within QUEUE_TIMEOUT get 503.
+
+Usage (from src/):
+    python um_members.py serve --port 8765
+"""
+
+import argparse
+import asyncio
+import contextvars
+import json
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_runner import OPERATIONS
+from models import json_default
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 1024 * 1024
+SESSION_IDLE_TIMEOUT = 30 * 60   # seconds
+QUEUE_TIMEOUT = 10               # seconds a request may wait for a slot
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+               404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+               500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class ServiceSession:
+    """One logged-in operator: the identity each of its requests runs as"""
+
+    def __init__(self, user, session_start_time):
+        self.user = user
+        self.session_start_time = session_start_time
+        self.last_used = time.monotonic()
+
+
+class ServiceAPI:
+    def __init__(self, workers=8, max_concurrency=32):
+        from auth_manager import SessionManager
+        from user_manager import UserManager
+        from traveller_manager import TravellerManager
+        from scooter_manager import ScooterManager
+        from backup_logging_manager import LogManager, BackupManager
+        from changelog_manager import ChangelogManager
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='um-service')
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.sessions = {}
+
+        # One set of managers for every operator; identity comes from session_scope()
+        self.session_manager = SessionManager()
+        self.db = self.session_manager.auth.db
+        self.managers = {
+            'user_mgr': UserManager(self.session_manager),
+            'traveller_mgr': TravellerManager(self.session_manager),
+            'scooter_mgr': ScooterManager(self.session_manager),
+            'log_mgr': LogManager(self.session_manager),
+            'backup_mgr': BackupManager(self.session_manager),
+            'changelog_mgr': ChangelogManager(self.session_manager),
+        }
+
+    async def _blocking(self, func, *args):
+        """Run func on the executor in a fresh context so no identity leaks between requests"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, contextvars.Context().run, func, *args)
+
+    def _as(self, service_session, func):
+        """Wrap func to run as the session's user on the worker's pooled connection"""
+        from auth_manager import session_scope
+
+        def scoped():
+            with session_scope(service_session.user, service_session.session_start_time):
+                with self.db.pooled():
+                    return func()
+        return scoped
+
+    # ---------- request handlers ----------
+
+    async def login(self, body):
+        if not isinstance(body, dict) or not body.get('username') or not body.get('password'):
+            return 400, {'success': False, 'message': 'username and password are required.', 'data': None}
+
+        session_manager = self.session_manager
+
+        def authenticate():
+            session_manager.start_session()
+            with self.db.pooled():
+                result = session_manager.auth.login(body['username'], body['password'])
+            return result, session_manager.session_start_time
+
+        result, session_start_time = await self._blocking(authenticate)
+        if not result['success']:
+            return 401, {'success': False, 'message': result['message'], 'data': None}
+
+        token = secrets.token_urlsafe(32)
+        self.sessions[token] = ServiceSession(result['user'], session_start_time)
+        return 200, {'success': True, 'message': result['message'],
+                     'data': {'token': token, 'user': result['user']}}
+
+    async def logout(self, token):
+        service_session = self.sessions.pop(token, None)
+        if service_session is None:
+            return 401, {'success': False, 'message': 'Invalid or expired token.', 'data': None}
+        await self._blocking(self._as(service_session, self.session_manager.end_session))
+        return 200, {'success': True, 'message': 'Logged out.', 'data': None}
+
+    async def operation(self, token, name, body):
+        service_session = self.sessions.get(token)
+        if service_session is None:
+            return 401, {'success': False, 'message': 'Invalid or expired token.', 'data': None}
+        if name not in OPERATIONS:
+            return 404, {'success': False, 'message': f"Unknown or disallowed operation '{name}'.", 'data': None}
+
+        method = getattr(self.managers[OPERATIONS[name]], name)
+        if body is None:
+            body = {}
+        if isinstance(body, dict):
+            call = lambda: method(**body)
+        elif isinstance(body, list):
+            call = lambda: method(*body)
+        else:
+            return 400, {'success': False, 'message': 'Body must be a JSON object or list.', 'data': None}
+
+        def run():
+            try:
+                return call()
+            except TypeError as e:
+                return {'success': False, 'message': f'Invalid arguments for {name}: {str(e)}', 'data': None}
+
+        service_session.last_used = time.monotonic()
+        return 200, await self._blocking(self._as(service_session, run))
+
+    async def metrics(self, token):
+        from metrics import REGISTRY
+
+        service_session = self.sessions.get(token)
+        if service_session is None:
+            return 401, {'success': False, 'message': 'Invalid or expired token.', 'data': None}
+
+        def scrape():
+            if not self.session_manager.authz.check_permission('view_metrics'):
+                self.db.log_activity(
+                    service_session.user['username'],
+                    "Unauthorized metrics access attempt",
+                    "Attempted to read /metrics",
+                    suspicious=True
+                )
+                return None
+            return REGISTRY.to_prometheus()
+
+        service_session.last_used = time.monotonic()
+        text = await self._blocking(self._as(service_session, scrape))
+        if text is None:
+            return 403, {'success': False, 'message': 'Access denied. Cannot view metrics.', 'data': None}
+        return 200, text
+
+    async def expire_sessions(self):
+        """End sessions idle for longer than SESSION_IDLE_TIMEOUT"""
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.monotonic() - SESSION_IDLE_TIMEOUT
+            for token, service_session in list(self.sessions.items()):
+                if service_session.last_used < cutoff:
+                    self.sessions.pop(token, None)
+                    await self._blocking(self._as(service_session, self.session_manager.end_session))
+
+    # ---------- HTTP plumbing ----------
+
+    async def dispatch(self, method, path, headers, body):
+        authorization = headers.get('authorization', '')
+        token = authorization[7:] if authorization.lower().startswith('bearer ') else None
+        if path == '/health' and method == 'GET':
+            return 200, {'success': True, 'message': 'OK', 'data': None}
+        if path == '/metrics' and method == 'GET':
+            return await self.metrics(token)
+        if method != 'POST':
+            return 405, {'success': False, 'message': 'Use POST.', 'data': None}
+
+        try:
+            payload = json.loads(body) if body else None
+        except json.JSONDecodeError as e:
+            return 400, {'success': False, 'message': f'Invalid JSON: {str(e)}', 'data': None}
+
+        if path == '/login':
+            return await self.login(payload)
+        if path == '/logout':
+            return await self.logout(token)
+        if path.startswith('/op/'):
+            return await self.operation(token, path[4:], payload)
+        return 404, {'success': False, 'message': 'Not found.', 'data': None}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    await self._respond(writer, 400, {'success': False, 'message': 'Bad request line.', 'data': None}, False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {'success': False, 'message': 'Invalid Content-Length.', 'data': None}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'success': False, 'message': 'Body too large.', 'data': None}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() == 'HTTP/1.1')
+
+                try:
+                    await asyncio.wait_for(self.slots.acquire(), QUEUE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    status, response = 503, {'success': False, 'message': 'Server busy, retry later.', 'data': None}
+                else:
+                    try:
+                        status, response = await self.dispatch(method.upper(), target.split('?', 1)[0],
+                                                               headers, body)
+                    except Exception as e:
+                        status, response = 500, {'success': False, 'message': f'Error: {str(e)}', 'data': None}
+                    finally:
+                        self.slots.release()
+
+                await self._respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, response, keep_alive):
+        if isinstance(response, str):
+            body = response.encode()
+            content_type = 'text/plain; version=0.0.4'
+        else:
+            body = json.dumps(response, default=json_default).encode()
+            content_type = 'application/json'
+        writer.write((
+            f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode() + body)
+        await writer.drain()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        expiry = asyncio.create_task(self.expire_sessions())
+        print(f"Urban Mobility service listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expiry.cancel()
+            self.executor.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='um_members.py serve',
+                                     description='Local HTTP/JSON API for the manager operations')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=8,
+                        help='threads running blocking database/crypto work')
+    parser.add_argument('--max-concurrency', type=int, default=32,
+                        help='requests processed at once; others wait up to %d s' % QUEUE_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    async def run():
+        await ServiceAPI(args.workers, args.max_concurrency).serve(args.host, args.port)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
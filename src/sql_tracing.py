@@ -0,0 +1,252 @@
+# sql_tracing.py
+import os
+import re
+import sys
+import time
+import weakref
+from datetime import datetime
+from metrics import MeteredConnection, MeteredCursor, current_operation
+
+
+# Statements slower than this (execute + fetch time) go to the slow-query log.
+# 0 logs every statement; a negative value disables tracing entirely.
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('UM_SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG = os.environ.get('UM_SLOW_QUERY_LOG', 'data/slow_queries.log')
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# The progress handler fires every PROGRESS_STEPS SQLite VM instructions;
+# the count approximates how much a statement scanned.
+PROGRESS_STEPS = 1000
+
+_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+
+_logger = None
+
+
+def configure(threshold_ms=None, log_path=None):
+    """Change the slow-query threshold and/or log file at runtime"""
+    global SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG, _logger
+    if threshold_ms is not None:
+        SLOW_QUERY_THRESHOLD_MS = float(threshold_ms)
+    if log_path is not None and log_path != SLOW_QUERY_LOG:
+        SLOW_QUERY_LOG = log_path
+        if _logger is not None:
+            for handler in list(_logger.handlers):
+                _logger.removeHandler(handler)
+                handler.close()
+            _logger = None
+
+
+def tracing_enabled():
+    return SLOW_QUERY_THRESHOLD_MS >= 0
+
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        # Imported on first slow query; logging.handlers is costly at startup
+        import logging
+        from logging.handlers import RotatingFileHandler
+
+        _logger = logging.getLogger('urban_mobility.slow_queries')
+        _logger.setLevel(logging.INFO)
+        _logger.propagate = False
+        handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                                      backupCount=SLOW_QUERY_LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _logger.addHandler(handler)
+    return _logger
+
+
+def redact_sql(sql):
+    """Collapse whitespace and replace inline string/number literals with ?"""
+    return _LITERAL_PATTERN.sub('?', _WHITESPACE_PATTERN.sub(' ', sql).strip())
+
+
+def _calling_method():
+    """Instrumented operation if any, else the first caller outside the DB layers"""
+    operation = current_operation.get()
+    if operation:
+        return operation
+    frame = sys._getframe(1)
+    skip = {__file__, sys.modules['metrics'].__file__}
+    while frame is not None and frame.f_code.co_filename in skip:
+        frame = frame.f_back
+    if frame is None:
+        return None
+    module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+    return f"{module}.{frame.f_code.co_name}"
+
+
+class _StatementTrace:
+    __slots__ = ('sql', 'param_count', 'many', 'elapsed', 'rows', 'steps_at_start',
+                 'statements_at_start', 'operation')
+
+    def __init__(self, sql, param_count, many, steps, statements):
+        self.sql = sql
+        self.param_count = param_count
+        self.many = many
+        self.elapsed = 0.0
+        self.rows = 0
+        self.steps_at_start = steps
+        self.statements_at_start = statements
+        self.operation = current_operation.get()
+
+
+class TracedCursor(MeteredCursor):
+    """Cursor that times statements including their fetches and logs slow ones"""
+
+    _trace = None
+
+    def _begin(self, sql, parameters, many):
+        self._finish()
+        if not tracing_enabled():
+            return
+        connection = self.connection
+        if many:
+            param_count = None
+        else:
+            param_count = len(parameters[0]) if parameters else 0
+        self._trace = _StatementTrace(sql, param_count, many, connection.vm_steps,
+                                      connection.statements)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if self._trace is not None:
+                self._trace.elapsed += time.perf_counter() - start
+
+    def _finish(self):
+        trace = self._trace
+        if trace is None:
+            return
+        self._trace = None
+        duration_ms = trace.elapsed * 1000
+        if duration_ms < SLOW_QUERY_THRESHOLD_MS:
+            return
+
+        connection = self.connection
+        rows = trace.rows
+        if not rows and self.rowcount > 0:
+            rows = self.rowcount  # INSERT/UPDATE/DELETE report affected rows
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'duration_ms': round(duration_ms, 3),
+            'rows': rows,
+            'vm_steps': (connection.vm_steps - trace.steps_at_start) * PROGRESS_STEPS,
+            'statements': connection.statements - trace.statements_at_start,
+            'operation': trace.operation or _calling_method(),
+            'executemany': trace.many,
+            'parameters': trace.param_count,
+            'sql': redact_sql(trace.sql)
+        }
+        try:
+            import json
+            _get_logger().info(json.dumps(entry))
+        except OSError:
+            pass  # tracing must never break the query path
+
+    def execute(self, sql, *parameters):
+        self._begin(sql, parameters, False)
+        self._timed(super().execute, sql, *parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None, True)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        return self
+
+    def executescript(self, sql_script):
+        self._begin(sql_script, None, True)
+        self._timed(super().executescript, sql_script)
+        self._finish()
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if self._trace is not None:
+            if row is None:
+                self._finish()
+            else:
+                self._trace.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        rows = self._timed(super().fetchmany, size)
+        if self._trace is not None:
+            self._trace.rows += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._trace is not None:
+            self._trace.rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._trace is not None:
+            self._trace.rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class TracedConnection(MeteredConnection):
+    """Connection factory adding per-statement tracing on top of round-trip counting.
+
+    A progress handler counts VM instructions and a trace callback counts the
+    statements SQLite actually ran (implicit BEGIN/COMMIT, trigger bodies).
+    The trace callback's text is never logged since it has parameters bound.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.vm_steps = 0
+        self.statements = 0
+        self._cursors = weakref.WeakSet()
+        if tracing_enabled():
+            self.set_progress_handler(self._on_progress, PROGRESS_STEPS)
+            self.set_trace_callback(self._on_statement)
+
+    def _on_progress(self):
+        self.vm_steps += 1
+        return 0
+
+    def _on_statement(self, _):
+        self.statements += 1
+
+    def cursor(self, factory=TracedCursor):
+        cursor = super().cursor(factory)
+        self._cursors.add(cursor)
+        return cursor
+
+    # Connection shortcuts would bypass cursor(); route them through a traced cursor
+    def execute(self, sql, *parameters):
+        return self.cursor().execute(sql, *parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def close(self):
+        for cursor in list(self._cursors):
+            if isinstance(cursor, TracedCursor):
+                cursor._finish()
+        super().close()
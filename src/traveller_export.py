@@ -0,0 +1,118 @@
+# traveller_export.py
+"""
+Streaming export of decrypted traveller records to CSV or NDJSON.
+
+Rows are read with fetchmany in chunks; each chunk's encrypted fields are
+decrypted on a process pool while the previous chunk is written, so memory
+use does not grow with the table. With a recipient key every written chunk
+is Fernet-encrypted with that key (one token per line) instead of being
+written as plain text; decrypt_export() turns such a file back into the
+plain export. Used by TravellerManager.export_travellers.
+"""
+
+import csv
+import io
+import json
+import os
+
+
+CHUNK_SIZE = 5000
+FORMATS = ('csv', 'ndjson')
+
+COLUMNS = ('customer_id', 'first_name', 'last_name', 'birthday', 'gender', 'street_name',
+           'house_number', 'zip_code', 'city', 'email_address', 'mobile_phone',
+           'driving_license_number', 'registration_date', 'created_by')
+# Positions of the columns stored encrypted
+ENCRYPTED = (5, 6, 9, 10)
+
+
+def format_for_path(path):
+    return 'ndjson' if path.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+
+def decrypt_export(source_path, recipient_key, dest_path):
+    """Write the plain export contained in a recipient-encrypted export file"""
+    from cryptography.fernet import Fernet
+
+    cipher = Fernet(recipient_key)
+    with open(source_path, 'rb') as source, open(dest_path, 'wb') as dest:
+        for line in source:
+            line = line.strip()
+            if line:
+                dest.write(cipher.decrypt(line))
+
+
+class TravellerExporter:
+    """Writes every traveller to a file in chunks with constant memory use"""
+
+    def __init__(self, db, workers=None, chunk_size=CHUNK_SIZE):
+        self.db = db
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+    def _render(self, rows, fmt, header):
+        buffer = io.StringIO()
+        if fmt == 'csv':
+            writer = csv.writer(buffer, lineterminator='\n')
+            if header:
+                writer.writerow(COLUMNS)
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                buffer.write(json.dumps(dict(zip(COLUMNS, row))) + "\n")
+        return buffer.getvalue().encode('utf-8')
+
+    def _decrypted(self, rows, plaintext):
+        result = []
+        for index, row in enumerate(rows):
+            row = list(row)
+            for offset, column in enumerate(ENCRYPTED):
+                row[column] = plaintext[index * len(ENCRYPTED) + offset]
+            result.append(row)
+        return result
+
+    def run(self, dest_path, fmt='csv', recipient_key=None):
+        """Export to dest_path (replaced atomically); returns the number of rows"""
+        from crypto_pool import CryptoPool
+
+        recipient = None
+        if recipient_key:
+            from cryptography.fernet import Fernet
+            recipient = Fernet(recipient_key)
+
+        temp_path = f"{dest_path}.tmp"
+        conn = self.db.get_read_connection()
+        cursor = conn.cursor()
+        pool = CryptoPool(self.db.encryption_key, self.workers)
+        total = 0
+        try:
+            with open(temp_path, 'wb') as out:
+                def write(rows, plaintext):
+                    data = self._render(self._decrypted(rows, plaintext), fmt, header=(total == 0))
+                    if recipient is not None:
+                        data = recipient.encrypt(data) + b"\n"
+                    out.write(data)
+                    return len(rows)
+
+                cursor.execute(f"SELECT {', '.join(COLUMNS)} FROM travellers ORDER BY id")
+                pending = None
+                while True:
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    # Decrypt this chunk on the pool while the previous one is written
+                    future = pool.submit_decrypt([row[column] for row in rows for column in ENCRYPTED])
+                    if pending:
+                        total += write(pending[0], pending[1].result())
+                    pending = (rows, future)
+                if pending:
+                    total += write(pending[0], pending[1].result())
+                elif fmt == 'csv':
+                    total += write([], [])  # header only
+            os.replace(temp_path, dest_path)
+        finally:
+            pool.close()
+            conn.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return total
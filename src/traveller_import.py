@@ -0,0 +1,191 @@
+# traveller_import.py
+"""
+Streaming bulk import of travellers from CSV or JSON-lines files.
+
+Records are read in chunks, validated column-wise, checked for driving
+licences and email addresses that already exist (in the database or earlier
+in the file), encrypted on a process pool while the previous chunk is
+inserted with executemany, and given customer IDs in bulk. Stored emails are
+ciphertext, so they are decrypted once on the pool when the import starts.
+Rejected records go to a JSON-lines side file with their line number, reasons
+and the offending field names, never the field values.
+Used by TravellerManager.import_travellers.
+"""
+
+import csv
+import json
+from datetime import datetime
+
+from validation import TRAVELLER, validate_batch
+
+
+CHUNK_SIZE = 5000
+
+FIELDS = ('first_name', 'last_name', 'birthday', 'gender', 'street_name', 'house_number',
+          'zip_code', 'city', 'email_address', 'mobile_phone', 'driving_license_number')
+
+
+def read_records(path):
+    """Yield (line_number, record) from a .csv file (header row) or a JSON-lines file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+            return
+
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = {'_error': f'Invalid JSON: {str(e)}'}
+            yield line_number, record
+
+
+def default_rejects_path(source_path):
+    return f"{source_path}.rejects.jsonl"
+
+
+class TravellerImporter:
+    """Imports traveller records in chunks on one connection, committing per chunk"""
+
+    def __init__(self, db, created_by, workers=None, chunk_size=CHUNK_SIZE):
+        self.db = db
+        self.created_by = created_by
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cities = set(db.get_cities())
+        self.seen_licences = set()
+        self.seen_emails = set()
+
+    def normalise(self, record):
+        """Record dict -> tuple of stripped strings in FIELDS order"""
+        values = []
+        for field in FIELDS:
+            value = record.get(field)
+            values.append('' if value is None else str(value).strip())
+        first, last, birthday, gender, street, house, zip_code, city, email, phone, licence = values
+        return (first, last, birthday, gender.lower(), street, house, zip_code.upper(), city,
+                email, phone, licence.upper())
+
+    def _existing_licences(self, cursor, licences):
+        existing = set()
+        licences = list(licences)
+        for start in range(0, len(licences), 500):
+            chunk = licences[start:start + 500]
+            existing.update(row[0] for row in cursor.execute(
+                f"SELECT driving_license_number FROM travellers "
+                f"WHERE driving_license_number IN ({','.join('?' * len(chunk))})", chunk))
+        return existing
+
+    def prepare_chunk(self, cursor, chunk, reject):
+        """Validate and de-duplicate a chunk; returns the accepted value tuples"""
+        records = []
+        for line_number, record in chunk:
+            if not isinstance(record, dict) or '_error' in record:
+                reject(line_number, record.get('_error') if isinstance(record, dict)
+                       else 'Each line must be a JSON object.')
+                continue
+            records.append((line_number, self.normalise(record)))
+
+        # Column-wise validation of the whole chunk, all errors per row
+        columns = {field: [values[index] for _, values in records]
+                   for index, field in enumerate(FIELDS)}
+        errors = validate_batch(TRAVELLER, columns, lookups={'cities': self.cities})
+        valid = []
+        for row, (line_number, values) in enumerate(records):
+            if row in errors:
+                reject(line_number, ' '.join(message for _, message in errors[row]),
+                       [name for name, _ in errors[row] if name])
+            else:
+                valid.append((line_number, values))
+
+        existing = self._existing_licences(cursor, {values[10] for _, values in valid})
+        accepted = []
+        for line_number, values in valid:
+            licence = values[10]
+            email = values[8].lower()
+            if licence in existing or licence in self.seen_licences:
+                reject(line_number, 'Driving license number already exists.', ['driving_license_number'])
+            elif email in self.seen_emails:
+                reject(line_number, 'Email address already exists.', ['email_address'])
+            else:
+                self.seen_licences.add(licence)
+                self.seen_emails.add(email)
+                accepted.append(values)
+        return accepted
+
+    def write_chunk(self, cursor, accepted, encrypted, registered):
+        customer_ids = self.db.generate_customer_ids(len(accepted), cursor)
+        rows = []
+        for index, values in enumerate(accepted):
+            first, last, birthday, gender, _, _, zip_code, city, _, _, licence = values
+            street, house, email, phone = encrypted[index * 4:index * 4 + 4]
+            rows.append((customer_ids[index], first, last, birthday, gender, street, house,
+                         zip_code, city, email, phone, licence, registered, self.created_by))
+        cursor.executemany('''
+            INSERT INTO travellers (
+                customer_id, first_name, last_name, birthday, gender,
+                street_name, house_number, zip_code, city, email_address,
+                mobile_phone, driving_license_number, registration_date, created_by
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        return len(rows)
+
+    def _chunks(self, records):
+        chunk = []
+        for item in records:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def run(self, source_path, rejects_path):
+        """Import source_path; returns {'imported', 'rejected', 'rejects_file'}"""
+        from crypto_pool import CryptoPool
+
+        stats = {'imported': 0, 'rejected': 0, 'rejects_file': None}
+        registered = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        rejects_file = None
+
+        def reject(line_number, message, fields=()):
+            nonlocal rejects_file
+            if rejects_file is None:
+                rejects_file = open(rejects_path, 'w', encoding='utf-8')
+                stats['rejects_file'] = rejects_path
+            rejects_file.write(json.dumps({'line': line_number, 'message': message,
+                                           'fields': list(fields)}) + "\n")
+            stats['rejected'] += 1
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        pool = CryptoPool(self.db.encryption_key, self.workers)
+        pending = None
+        try:
+            stored = [row[0] for row in cursor.execute('SELECT email_address FROM travellers')]
+            self.seen_emails.update(email.lower() for email in pool.decrypt_many(stored))
+            for chunk in self._chunks(read_records(source_path)):
+                accepted = self.prepare_chunk(cursor, chunk, reject)
+                secrets = []
+                for values in accepted:
+                    secrets.extend((values[4], values[5], values[8], f"+31-6-{values[9]}"))
+                # Encrypt this chunk on the pool while the previous one is inserted
+                future = pool.submit_encrypt(secrets)
+                if pending:
+                    stats['imported'] += self.write_chunk(cursor, pending[0], pending[1].result(), registered)
+                    conn.commit()
+                pending = (accepted, future)
+            if pending:
+                stats['imported'] += self.write_chunk(cursor, pending[0], pending[1].result(), registered)
+                conn.commit()
+        finally:
+            pool.close()
+            conn.close()
+            if rejects_file is not None:
+                rejects_file.close()
+        return stats
@@ -1,7 +1,14 @@
 # traveller_manager.py
-from database_manager import DatabaseManager, InputValidator
+from database_manager import DatabaseManager
 from datetime import datetime
+from metrics import instrument
+import row_versions
+from models import Traveller, TRAVELLER_SEARCH_COLUMNS, TRAVELLER_DETAIL_COLUMNS
+import os
+import time
+import validation
 
+@instrument
 class TravellerManager:
     def __init__(self, session_manager):
         self.db = DatabaseManager()
@@ -90,8 +97,8 @@ class TravellerManager:
                 'data': None
             }
     
-    def update_traveller(self, customer_id, **kwargs):
-        """Update traveller information"""
+    def update_traveller(self, customer_id, expected_version=None, **kwargs):
+        """Update traveller information (only from expected_version, when given)"""
         # Check permissions
         if not self.authz.check_permission('manage_travellers'):
             self.db.log_activity(
@@ -106,16 +113,13 @@ class TravellerManager:
                 'data': None
             }
         
-        # Check if traveller exists
-        traveller = self._get_traveller_by_customer_id(customer_id)
-        if not traveller:
-            return {
-                'success': False,
-                'message': 'Traveller not found.',
-                'data': None
-            }
-        
         # Validate update fields
+        cities = self.db.get_cities() if kwargs.get('city') is not None else ()
+        error = validation.first_error(validation.TRAVELLER, kwargs, partial=True,
+                                       lookups={'cities': cities})
+        if error:
+            return {'success': False, 'message': error, 'data': None}
+        
         updates = []
         params = []
         
@@ -125,20 +129,6 @@ class TravellerManager:
                 'house_number', 'zip_code', 'city', 'email_address', 'mobile_phone',
                 'driving_license_number'
             ]:
-                # Validate specific fields
-                if field == 'zip_code' and not InputValidator.validate_zip_code(value):
-                    return {'success': False, 'message': 'Invalid zip code format (DDDDXX).', 'data': None}
-                elif field == 'mobile_phone' and not InputValidator.validate_mobile_phone(value):
-                    return {'success': False, 'message': 'Invalid mobile phone format (8 digits).', 'data': None}
-                elif field == 'email_address' and not InputValidator.validate_email(value):
-                    return {'success': False, 'message': 'Invalid email address format.', 'data': None}
-                elif field == 'driving_license_number' and not InputValidator.validate_driving_license(value):
-                    return {'success': False, 'message': 'Invalid driving license format.', 'data': None}
-                elif field == 'gender' and value not in ['male', 'female']:
-                    return {'success': False, 'message': 'Gender must be male or female.', 'data': None}
-                elif field == 'city' and value not in self.db.get_cities():
-                    return {'success': False, 'message': 'Invalid city. Must be from predefined list.', 'data': None}
-                
                 # Encrypt sensitive fields
                 if field in ['email_address', 'street_name', 'house_number']:
                     value = self.db.encrypt_data(value)
@@ -152,35 +142,132 @@ class TravellerManager:
             return {'success': False, 'message': 'No valid updates provided.', 'data': None}
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            # Existence/version check, update and log entry in one transaction
+            with self.db.transaction() as cursor:
+                version, current_version = row_versions.versioned_update(
+                    cursor, 'travellers', updates, params, 'customer_id = ?', (customer_id,),
+                    expected_version)
+                
+                if version:
+                    self.db.log_activity(
+                        self.auth.current_user['username'],
+                        "Traveller updated",
+                        f"Customer ID: {customer_id}, Fields: {', '.join(kwargs.keys())}",
+                        cursor=cursor
+                    )
             
-            params.append(customer_id)
-            cursor.execute(f'''
-                UPDATE travellers SET {", ".join(updates)}
-                WHERE customer_id = ?
-            ''', params)
+            if current_version is not None:
+                return row_versions.conflict_result('Traveller', current_version)
+            if not version:
+                return {
+                    'success': False,
+                    'message': 'Traveller not found.',
+                    'data': None
+                }
             
-            conn.commit()
-            conn.close()
+            return {
+                'success': True,
+                'message': 'Traveller updated successfully.',
+                'data': {'version': version}
+            }
             
-            # Log activity
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error updating traveller: {str(e)}',
+                'data': None
+            }
+    
+    def import_travellers(self, source_path, rejects_path=None, workers=None):
+        """Bulk import travellers from a CSV or JSON-lines file"""
+        from traveller_import import TravellerImporter, default_rejects_path
+
+        if not self.authz.check_permission('manage_travellers'):
             self.db.log_activity(
                 self.auth.current_user['username'],
-                "Traveller updated",
-                f"Customer ID: {customer_id}, Fields: {', '.join(kwargs.keys())}"
+                "Unauthorized traveller import attempt",
+                f"Attempted to import: {source_path}",
+                suspicious=True
             )
-            
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot create traveller records.',
+                'data': None
+            }
+
+        if not os.path.isfile(source_path):
+            return {'success': False, 'message': 'Import file not found.', 'data': None}
+
+        try:
+            start = time.perf_counter()
+            importer = TravellerImporter(self.db, self.auth.current_user['username'], workers)
+            stats = importer.run(source_path, rejects_path or default_rejects_path(source_path))
+            stats['seconds'] = round(time.perf_counter() - start, 3)
+
+            self.db.log_activity(
+                self.auth.current_user['username'],
+                "Travellers imported",
+                f"File: {os.path.basename(source_path)}, Imported: {stats['imported']}, "
+                f"Rejected: {stats['rejected']}"
+            )
+
             return {
                 'success': True,
-                'message': 'Traveller updated successfully.',
+                'message': f"Imported {stats['imported']} travellers, rejected {stats['rejected']}.",
+                'data': stats
+            }
+
+        except Exception as e:
+            return {
+                'success': False,
+                'message': f'Error importing travellers: {str(e)}',
                 'data': None
             }
-            
+    
+    def export_travellers(self, dest_path, fmt=None, recipient_key=None, workers=None):
+        """Export all travellers, decrypted, to a CSV or NDJSON file"""
+        from traveller_export import TravellerExporter, FORMATS, format_for_path
+
+        if not self.authz.check_permission('export_travellers'):
+            self.db.log_activity(
+                self.auth.current_user['username'],
+                "Unauthorized traveller export attempt",
+                f"Attempted to export to: {dest_path}",
+                suspicious=True
+            )
+            return {
+                'success': False,
+                'message': 'Access denied. Cannot export traveller records.',
+                'data': None
+            }
+
+        fmt = fmt or format_for_path(dest_path)
+        if fmt not in FORMATS:
+            return {'success': False, 'message': f"Format must be one of: {', '.join(FORMATS)}.", 'data': None}
+
+        try:
+            start = time.perf_counter()
+            exported = TravellerExporter(self.db, workers).run(dest_path, fmt, recipient_key)
+            seconds = round(time.perf_counter() - start, 3)
+
+            self.db.log_activity(
+                self.auth.current_user['username'],
+                "Travellers exported",
+                f"File: {os.path.basename(dest_path)}, Rows: {exported}, Format: {fmt}, "
+                f"Recipient encrypted: {'yes' if recipient_key else 'no'}"
+            )
+
+            return {
+                'success': True,
+                'message': f'Exported {exported} travellers.',
+                'data': {'exported': exported, 'file': dest_path, 'format': fmt,
+                         'encrypted': bool(recipient_key), 'seconds': seconds}
+            }
+
         except Exception as e:
             return {
                 'success': False,
-                'message': f'Error updating traveller: {str(e)}',
+                'message': f'Error exporting travellers: {str(e)}',
                 'data': None
             }
     
@@ -200,30 +287,26 @@ class TravellerManager:
                 'data': None
             }
         
-        # Check if traveller exists
-        traveller = self._get_traveller_by_customer_id(customer_id)
-        if not traveller:
-            return {
-                'success': False,
-                'message': 'Traveller not found.',
-                'data': None
-            }
-        
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM travellers WHERE customer_id = ?', (customer_id,))
-            
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as cursor:
+                traveller = cursor.execute(
+                    'DELETE FROM travellers WHERE customer_id = ? RETURNING first_name, last_name',
+                    (customer_id,)).fetchone()
+                
+                if traveller:
+                    self.db.log_activity(
+                        self.auth.current_user['username'],
+                        "Traveller deleted",
+                        f"Customer ID: {customer_id}, Name: {traveller[0]} {traveller[1]}",
+                        cursor=cursor
+                    )
             
-            # Log activity
-            self.db.log_activity(
-                self.auth.current_user['username'],
-                "Traveller deleted",
-                f"Customer ID: {customer_id}, Name: {traveller['first_name']} {traveller['last_name']}"
-            )
+            if not traveller:
+                return {
+                    'success': False,
+                    'message': 'Traveller not found.',
+                    'data': None
+                }
             
             return {
                 'success': True,
@@ -249,14 +332,14 @@ class TravellerManager:
             }
         
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_read_connection()
             cursor = conn.cursor()
             
             # Search by customer ID or name
             search_pattern = f'%{search_term.lower()}%'
-            cursor.execute('''
-                SELECT customer_id, first_name, last_name, birthday, gender, 
-                       zip_code, city, registration_date
+            cursor.row_factory = Traveller.row_factory(TRAVELLER_SEARCH_COLUMNS)
+            cursor.execute(f'''
+                SELECT {', '.join(TRAVELLER_SEARCH_COLUMNS)}
                 FROM travellers
                 WHERE customer_id LIKE ? OR 
                       LOWER(first_name) LIKE ? OR 
@@ -264,22 +347,9 @@ class TravellerManager:
                 ORDER BY last_name, first_name
             ''', (search_pattern, search_pattern, search_pattern))
             
-            travellers = cursor.fetchall()
+            traveller_list = cursor.fetchall()
             conn.close()
             
-            traveller_list = []
-            for traveller in travellers:
-                traveller_list.append({
-                    'customer_id': traveller[0],
-                    'first_name': traveller[1],
-                    'last_name': traveller[2],
-                    'birthday': traveller[3],
-                    'gender': traveller[4],
-                    'zip_code': traveller[5],
-                    'city': traveller[6],
-                    'registration_date': traveller[7]
-                })
-            
             return {
                 'success': True,
                 'message': f'Found {len(traveller_list)} travellers matching "{search_term}".',
@@ -320,35 +390,16 @@ class TravellerManager:
                                 house_number, zip_code, city, email_address, mobile_phone,
                                 driving_license_number):
         """Validate traveller input data"""
-        # Required fields
-        if not all([first_name, last_name, birthday, gender, street_name, house_number,
-                   zip_code, city, email_address, mobile_phone, driving_license_number]):
-            return {'success': False, 'message': 'All fields are required.', 'data': None}
-        
-        # Format validations
-        if not InputValidator.validate_zip_code(zip_code):
-            return {'success': False, 'message': 'Invalid zip code format (DDDDXX).', 'data': None}
-        
-        if not InputValidator.validate_mobile_phone(mobile_phone):
-            return {'success': False, 'message': 'Invalid mobile phone format (8 digits).', 'data': None}
-        
-        if not InputValidator.validate_email(email_address):
-            return {'success': False, 'message': 'Invalid email address format.', 'data': None}
-        
-        if not InputValidator.validate_driving_license(driving_license_number):
-            return {'success': False, 'message': 'Invalid driving license format.', 'data': None}
-        
-        if gender not in ['male', 'female']:
-            return {'success': False, 'message': 'Gender must be male or female.', 'data': None}
-        
-        if city not in self.db.get_cities():
-            return {'success': False, 'message': 'Invalid city. Must be from predefined list.', 'data': None}
-        
-        # Date validation
-        try:
-            datetime.strptime(birthday, '%Y-%m-%d')
-        except ValueError:
-            return {'success': False, 'message': 'Invalid birthday format (YYYY-MM-DD).', 'data': None}
+        record = {
+            'first_name': first_name, 'last_name': last_name, 'birthday': birthday,
+            'gender': gender, 'street_name': street_name, 'house_number': house_number,
+            'zip_code': zip_code, 'city': city, 'email_address': email_address,
+            'mobile_phone': mobile_phone, 'driving_license_number': driving_license_number
+        }
+        error = validation.first_error(validation.TRAVELLER, record,
+                                       lookups={'cities': self.db.get_cities()})
+        if error:
+            return {'success': False, 'message': error, 'data': None}
         
         return {'success': True, 'message': 'Validation passed.', 'data': None}
     
@@ -386,27 +437,15 @@ class TravellerManager:
         conn = self.db.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM travellers WHERE customer_id = ?', (customer_id,))
+        cursor.row_factory = Traveller.row_factory(TRAVELLER_DETAIL_COLUMNS)
+        cursor.execute(f"SELECT {', '.join(TRAVELLER_DETAIL_COLUMNS)} FROM travellers WHERE customer_id = ?",
+                       (customer_id,))
         traveller = cursor.fetchone()
         conn.close()
         
-        if traveller:
-            result = {
-                'id': traveller[0],
-                'customer_id': traveller[1],
-                'first_name': traveller[2],
-                'last_name': traveller[3],
-                'birthday': traveller[4],
-                'gender': traveller[5],
-                'street_name': traveller[6] if not decrypt else self.db.decrypt_data(traveller[6]),
-                'house_number': traveller[7] if not decrypt else self.db.decrypt_data(traveller[7]),
-                'zip_code': traveller[8],
-                'city': traveller[9],
-                'email_address': traveller[10] if not decrypt else self.db.decrypt_data(traveller[10]),
-                'mobile_phone': traveller[11] if not decrypt else self.db.decrypt_data(traveller[11]),
-                'driving_license_number': traveller[12],
-                'registration_date': traveller[13],
-                'created_by': traveller[14]
-            }
-            return result
-        return None
+        if traveller and decrypt:
+            traveller.street_name = self.db.decrypt_data(traveller.street_name)
+            traveller.house_number = self.db.decrypt_data(traveller.house_number)
+            traveller.email_address = self.db.decrypt_data(traveller.email_address)
+            traveller.mobile_phone = self.db.decrypt_data(traveller.mobile_phone)
+        return traveller
@@ -27,6 +27,16 @@ from console_interface import ConsoleInterface
 
 def main():
     """Main application entry point"""
+    # Headless mode: um_members.py exec --script ops.jsonl
+    if len(sys.argv) > 1 and sys.argv[1] == 'exec':
+        from batch_runner import main as exec_main
+        sys.exit(exec_main(sys.argv[2:]))
+
+    # Service mode: um_members.py serve --port 8765
+    if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+        from service_api import main as serve_main
+        sys.exit(serve_main(sys.argv[2:]))
+
     try:
         # Initialize and run the console interface
         app = ConsoleInterface()
@@ -1,9 +1,17 @@
 # user_manager.py
-from database_manager import DatabaseManager, InputValidator
+from database_manager import DatabaseManager
 from datetime import datetime
 import secrets
 import string
+from metrics import instrument
+import row_versions
+from models import User, USER_LIST_COLUMNS, USER_SEARCH_COLUMNS, USER_PROFILE_COLUMNS
+import validation
 
+# Writes only apply while the account is active and still has the role that was checked
+ACTIVE_USER_WITH_ROLE = 'LOWER(username) = ? AND role = ? AND is_active = 1'
+
+@instrument
 class UserManager:
     def __init__(self, session_manager):
         self.db = DatabaseManager()
@@ -80,8 +88,9 @@ class UserManager:
                 'data': None
             }
     
-    def update_user(self, username, first_name=None, last_name=None, new_password=None):
-        """Update user profile information"""
+    def update_user(self, username, first_name=None, last_name=None, new_password=None,
+                    expected_version=None):
+        """Update user profile information (only from expected_version, when given)"""
         # Check if user exists and get user info
         user_info = self._get_user_by_username(username)
         if not user_info:
@@ -117,65 +126,68 @@ class UserManager:
             return {'success': False, 'message': 'First name cannot be empty.', 'data': None}
         if last_name and not last_name.strip():
             return {'success': False, 'message': 'Last name cannot be empty.', 'data': None}
-        if new_password and not InputValidator.validate_password(new_password):
+        if new_password and not validation.is_strong_password(new_password):
             return {
                 'success': False, 
                 'message': 'Password must be 12-30 characters with uppercase, lowercase, digit, and special character.',
                 'data': None
             }
         
+        updates = []
+        params = []
+        
+        if first_name:
+            updates.append("first_name = ?")
+            params.append(first_name.strip())
+        
+        if last_name:
+            updates.append("last_name = ?")
+            params.append(last_name.strip())
+        
+        if new_password:
+            updates.append("password_hash = ?")
+            params.append(self.db.hash_password(new_password))
+        
+        if not updates:
+            return {
+                'success': False,
+                'message': 'No updates provided.',
+                'data': None
+            }
+        
+        update_fields = []
+        if first_name: update_fields.append("first_name")
+        if last_name: update_fields.append("last_name")
+        if new_password: update_fields.append("password")
+        
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            updates = []
-            params = []
-            
-            if first_name:
-                updates.append("first_name = ?")
-                params.append(first_name.strip())
-            
-            if last_name:
-                updates.append("last_name = ?")
-                params.append(last_name.strip())
-            
-            if new_password:
-                updates.append("password_hash = ?")
-                params.append(self.db.hash_password(new_password))
-            
-            if not updates:
+            # Only the active account with the role checked above is updated
+            with self.db.transaction() as cursor:
+                version, current_version = row_versions.versioned_update(
+                    cursor, 'users', updates, params, ACTIVE_USER_WITH_ROLE,
+                    (username.lower(), user_info['role']), expected_version)
+                
+                if version:
+                    self.db.log_activity(
+                        current_username,
+                        f"User profile updated",
+                        f"Updated user: {username}, fields: {', '.join(update_fields)}",
+                        cursor=cursor
+                    )
+            
+            if current_version is not None:
+                return row_versions.conflict_result('User', current_version)
+            if not version:
                 return {
                     'success': False,
-                    'message': 'No updates provided.',
+                    'message': 'User not found.',
                     'data': None
                 }
             
-            params.append(username)
-            
-            cursor.execute(f'''
-                UPDATE users SET {", ".join(updates)}
-                WHERE username = ?
-            ''', params)
-            
-            conn.commit()
-            conn.close()
-            
-            # Log activity
-            update_fields = []
-            if first_name: update_fields.append("first_name")
-            if last_name: update_fields.append("last_name")
-            if new_password: update_fields.append("password")
-            
-            self.db.log_activity(
-                current_username,
-                f"User profile updated",
-                f"Updated user: {username}, fields: {', '.join(update_fields)}"
-            )
-            
             return {
                 'success': True,
                 'message': 'User updated successfully.',
-                'data': None
+                'data': {'version': version}
             }
             
         except Exception as e:
@@ -229,24 +241,26 @@ class UserManager:
             }
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # Soft delete (mark as inactive)
-            cursor.execute('''
-                UPDATE users SET is_active = 0
-                WHERE username = ?
-            ''', (username,))
-            
-            conn.commit()
-            conn.close()
-            
-            # Log activity
-            self.db.log_activity(
-                current_username,
-                f"User deleted",
-                f"Deleted user: {username} ({user_info['role']})"
-            )
+            # Soft delete (mark as inactive) and log it in one transaction
+            with self.db.transaction() as cursor:
+                deleted, _ = row_versions.versioned_update(
+                    cursor, 'users', ['is_active = 0'], (), ACTIVE_USER_WITH_ROLE,
+                    (username.lower(), user_info['role']))
+                
+                if deleted:
+                    self.db.log_activity(
+                        current_username,
+                        f"User deleted",
+                        f"Deleted user: {username} ({user_info['role']})",
+                        cursor=cursor
+                    )
+            
+            if not deleted:
+                return {
+                    'success': False,
+                    'message': 'User not found.',
+                    'data': None
+                }
             
             # If user deleted themselves, logout
             if username.lower() == current_username.lower():
@@ -294,25 +308,27 @@ class UserManager:
         temp_password = self._generate_temporary_password()
         
         try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            # Update password
+            # Update password and log it in one transaction
             password_hash = self.db.hash_password(temp_password)
-            cursor.execute('''
-                UPDATE users SET password_hash = ?
-                WHERE username = ?
-            ''', (password_hash, username))
-            
-            conn.commit()
-            conn.close()
-            
-            # Log activity
-            self.db.log_activity(
-                self.auth.current_user['username'],
-                f"Password reset",
-                f"Reset password for user: {username}"
-            )
+            with self.db.transaction() as cursor:
+                updated, _ = row_versions.versioned_update(
+                    cursor, 'users', ['password_hash = ?'], (password_hash,), ACTIVE_USER_WITH_ROLE,
+                    (username.lower(), user_info['role']))
+                
+                if updated:
+                    self.db.log_activity(
+                        self.auth.current_user['username'],
+                        f"Password reset",
+                        f"Reset password for user: {username}",
+                        cursor=cursor
+                    )
+            
+            if not updated:
+                return {
+                    'success': False,
+                    'message': 'User not found.',
+                    'data': None
+                }
             
             return {
                 'success': True,
@@ -338,31 +354,20 @@ class UserManager:
             }
         
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_read_connection()
             cursor = conn.cursor()
             
-            cursor.execute('''
-                SELECT username, role, first_name, last_name, registration_date, created_by, is_active
+            cursor.row_factory = User.row_factory(USER_LIST_COLUMNS)
+            cursor.execute(f'''
+                SELECT {', '.join(USER_LIST_COLUMNS)}
                 FROM users
                 WHERE is_active = 1
                 ORDER BY role, username
             ''')
             
-            users = cursor.fetchall()
+            user_list = cursor.fetchall()
             conn.close()
             
-            user_list = []
-            for user in users:
-                user_list.append({
-                    'username': user[0],
-                    'role': user[1],
-                    'first_name': user[2],
-                    'last_name': user[3],
-                    'registration_date': user[4],
-                    'created_by': user[5],
-                    'is_active': bool(user[6])
-                })
-            
             return {
                 'success': True,
                 'message': f'Found {len(user_list)} active users.',
@@ -386,12 +391,13 @@ class UserManager:
             }
         
         try:
-            conn = self.db.get_connection()
+            conn = self.db.get_read_connection()
             cursor = conn.cursor()
             
             search_pattern = f'%{search_term.lower()}%'
-            cursor.execute('''
-                SELECT username, role, first_name, last_name, registration_date, created_by
+            cursor.row_factory = User.row_factory(USER_SEARCH_COLUMNS)
+            cursor.execute(f'''
+                SELECT {', '.join(USER_SEARCH_COLUMNS)}
                 FROM users
                 WHERE is_active = 1 AND (
                     LOWER(username) LIKE ? OR 
@@ -401,20 +407,9 @@ class UserManager:
                 ORDER BY role, username
             ''', (search_pattern, search_pattern, search_pattern))
             
-            users = cursor.fetchall()
+            user_list = cursor.fetchall()
             conn.close()
             
-            user_list = []
-            for user in users:
-                user_list.append({
-                    'username': user[0],
-                    'role': user[1],
-                    'first_name': user[2],
-                    'last_name': user[3],
-                    'registration_date': user[4],
-                    'created_by': user[5]
-                })
-            
             return {
                 'success': True,
                 'message': f'Found {len(user_list)} users matching "{search_term}".',
@@ -460,44 +455,11 @@ class UserManager:
     
     def _validate_user_input(self, username, password, role, first_name, last_name):
         """Validate user input data"""
-        # Validate username
-        if not InputValidator.validate_username(username):
-            return {
-                'success': False,
-                'message': 'Username must be 8-10 characters, start with letter/underscore, contain only letters, numbers, underscores, apostrophes, and periods.',
-                'data': None
-            }
-        
-        # Validate password
-        if not InputValidator.validate_password(password):
-            return {
-                'success': False,
-                'message': 'Password must be 12-30 characters with at least one uppercase, lowercase, digit, and special character.',
-                'data': None
-            }
-        
-        # Validate role
-        if role not in ['system_admin', 'service_engineer']:
-            return {
-                'success': False,
-                'message': 'Invalid role. Must be system_admin or service_engineer.',
-                'data': None
-            }
-        
-        # Validate names
-        if not first_name or not first_name.strip():
-            return {
-                'success': False,
-                'message': 'First name is required.',
-                'data': None
-            }
-        
-        if not last_name or not last_name.strip():
-            return {
-                'success': False,
-                'message': 'Last name is required.',
-                'data': None
-            }
+        record = {'username': username, 'password': password, 'role': role,
+                  'first_name': first_name, 'last_name': last_name}
+        error = validation.first_error(validation.USER, record)
+        if error:
+            return {'success': False, 'message': error, 'data': None}
         
         return {'success': True, 'message': 'Validation passed.', 'data': None}
     
@@ -519,26 +481,16 @@ class UserManager:
         conn = self.db.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT id, username, role, first_name, last_name, registration_date, created_by
+        cursor.row_factory = User.row_factory(USER_PROFILE_COLUMNS)
+        cursor.execute(f'''
+            SELECT {', '.join(USER_PROFILE_COLUMNS)}
             FROM users
             WHERE LOWER(username) = ? AND is_active = 1
         ''', (username.lower(),))
         
         user = cursor.fetchone()
         conn.close()
-        
-        if user:
-            return {
-                'id': user[0],
-                'username': user[1],
-                'role': user[2],
-                'first_name': user[3],
-                'last_name': user[4],
-                'registration_date': user[5],
-                'created_by': user[6]
-            }
-        return None
+        return user
     
     def _generate_temporary_password(self):
         """Generate a secure temporary password"""
@@ -0,0 +1,253 @@
+# validation.py
+"""
+Declarative field schemas for travellers, scooters and users.
+
+Each schema is compiled once at import: patterns are pre-compiled and every
+field becomes a list of (check, message) pairs. validate() checks a single
+record and collects all errors; first_error() returns the first message, the
+way the interactive managers report it; validate_batch() checks whole
+columns at once for bulk paths such as the traveller import.
+"""
+
+import re
+from datetime import datetime
+
+
+class Field:
+    """Rules for one field; only the rules that are set are checked"""
+
+    def __init__(self, name, message, required=True, pattern=None, choices=None,
+                 number=False, minimum=None, maximum=None, check=None):
+        self.name = name
+        self.message = message
+        self.required = required
+        self.pattern = pattern
+        self.choices = choices      # a collection, or a lookup name given at validation time
+        self.number = number
+        self.minimum = minimum
+        self.maximum = maximum
+        self.check = check
+
+    def compile(self):
+        """List of (predicate(value, lookups), message) pairs for a present value"""
+        rules = []
+        if self.number:
+            rules.append((lambda value, _: _is_number(value), self.message))
+            if self.minimum is not None:
+                minimum = self.minimum
+                rules.append((lambda value, _: float(value) >= minimum, self.message))
+            if self.maximum is not None:
+                maximum = self.maximum
+                rules.append((lambda value, _: float(value) <= maximum, self.message))
+        if self.pattern is not None:
+            match = re.compile(self.pattern).fullmatch
+            rules.append((lambda value, _: isinstance(value, str) and match(value) is not None,
+                          self.message))
+        if self.choices is not None:
+            if isinstance(self.choices, str):
+                lookup = self.choices
+                rules.append((lambda value, lookups: value in lookups[lookup], self.message))
+            else:
+                choices = frozenset(self.choices)
+                rules.append((lambda value, _: value in choices, self.message))
+        if self.check is not None:
+            check = self.check
+            rules.append((lambda value, _: check(value), self.message))
+        return rules
+
+
+class Schema:
+    """Compiled set of fields plus checks that span several fields"""
+
+    def __init__(self, name, fields, required_message=None, record_checks=()):
+        self.name = name
+        self.fields = fields
+        self.field_names = tuple(field.name for field in fields)
+        self.required = tuple(field.name for field in fields if field.required)
+        self.required_message = required_message
+        self.record_checks = record_checks  # (predicate(record), message)
+        self.rules = [(field.name, field.compile()) for field in fields]
+
+
+def _is_number(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def is_iso_date(value):
+    """YYYY-MM-DD and an existing calendar date"""
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def is_strong_password(password):
+    """12-30 characters with a lowercase, uppercase, digit and special character"""
+    if not isinstance(password, str) or not 12 <= len(password) <= 30:
+        return False
+    return (any(c.islower() for c in password) and any(c.isupper() for c in password)
+            and any(c.isdigit() for c in password) and any(c in PASSWORD_SPECIALS for c in password))
+
+
+PASSWORD_SPECIALS = "~!@#$%&_-+=`|\\(){}[]:;'<>,.?/"
+
+# Shared patterns (also used by database_manager.InputValidator)
+ZIP_CODE = r'\d{4}[A-Z]{2}'
+MOBILE_PHONE = r'\d{8}'
+DRIVING_LICENSE = r'[A-Z]{1,2}\d{7,8}'
+EMAIL = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+USERNAME = r"[a-zA-Z_][a-zA-Z0-9_.'-]{7,9}"
+SERIAL_NUMBER = r'[a-zA-Z0-9]{10,17}'
+
+# Rotterdam region approximate bounds
+LATITUDE_RANGE = (51.85, 52.05)
+LONGITUDE_RANGE = (4.35, 4.65)
+
+
+TRAVELLER = Schema('traveller', [
+    Field('first_name', 'First name is required.'),
+    Field('last_name', 'Last name is required.'),
+    Field('zip_code', 'Invalid zip code format (DDDDXX).', pattern=ZIP_CODE),
+    Field('mobile_phone', 'Invalid mobile phone format (8 digits).', pattern=MOBILE_PHONE),
+    Field('email_address', 'Invalid email address format.', pattern=EMAIL),
+    Field('driving_license_number', 'Invalid driving license format.', pattern=DRIVING_LICENSE),
+    Field('gender', 'Gender must be male or female.', choices=('male', 'female')),
+    Field('city', 'Invalid city. Must be from predefined list.', choices='cities'),
+    Field('birthday', 'Invalid birthday format (YYYY-MM-DD).', check=is_iso_date),
+    Field('street_name', 'Street name is required.'),
+    Field('house_number', 'House number is required.'),
+], required_message='All fields are required.')
+
+SCOOTER = Schema('scooter', [
+    Field('brand', 'Brand is required.'),
+    Field('model', 'Model is required.'),
+    Field('serial_number', 'Invalid serial number format (10-17 alphanumeric).', pattern=SERIAL_NUMBER),
+    Field('top_speed', 'Top speed must be a number.', required=False, number=True, minimum=0),
+    Field('battery_capacity', 'Battery capacity must be a number.', required=False, number=True, minimum=0),
+    Field('state_of_charge', 'State of charge must be between 0-100%.', required=False,
+          number=True, minimum=0, maximum=100),
+    Field('target_range_soc_min', 'Target range SoC values must be between 0-100%.', required=False,
+          number=True, minimum=0, maximum=100),
+    Field('target_range_soc_max', 'Target range SoC values must be between 0-100%.', required=False,
+          number=True, minimum=0, maximum=100),
+    Field('latitude', 'Invalid coordinates for Rotterdam region.', required=False, number=True,
+          minimum=LATITUDE_RANGE[0], maximum=LATITUDE_RANGE[1]),
+    Field('longitude', 'Invalid coordinates for Rotterdam region.', required=False, number=True,
+          minimum=LONGITUDE_RANGE[0], maximum=LONGITUDE_RANGE[1]),
+    Field('mileage', 'Mileage must be a positive number.', required=False, number=True, minimum=0),
+    Field('last_maintenance_date', 'Invalid maintenance date format (YYYY-MM-DD).', required=False,
+          check=is_iso_date),
+], required_message='Brand, model, and serial number are required.', record_checks=(
+    (lambda record: _is_blank(record.get('target_range_soc_min'))
+     or _is_blank(record.get('target_range_soc_max'))
+     or float(record['target_range_soc_min']) < float(record['target_range_soc_max']),
+     'Target range SoC min must be less than max.'),
+))
+
+USER = Schema('user', [
+    Field('username', 'Username must be 8-10 characters, start with letter/underscore, contain only '
+                      'letters, numbers, underscores, apostrophes, and periods.', pattern=USERNAME),
+    Field('password', 'Password must be 12-30 characters with at least one uppercase, lowercase, '
+                      'digit, and special character.', check=is_strong_password),
+    Field('role', 'Invalid role. Must be system_admin or service_engineer.',
+          choices=('system_admin', 'service_engineer')),
+    Field('first_name', 'First name is required.'),
+    Field('last_name', 'Last name is required.'),
+])
+
+
+def validate(schema, record, partial=False, lookups=None):
+    """All (field, message) errors of one record dict.
+
+    partial=True checks only the fields present and not None (updates) and
+    skips required and cross-field checks. lookups supplies choice lists
+    named in the schema, e.g. {'cities': {...}}.
+    """
+    lookups = lookups or {}
+    if not partial and schema.required_message:
+        missing = [name for name in schema.required if _is_blank(record.get(name))]
+        if missing:
+            return [(name, schema.required_message) for name in missing]
+
+    errors = []
+    required = set(schema.required)
+    for field, (name, rules) in zip(schema.fields, schema.rules):
+        value = record.get(name)
+        if _is_blank(value):
+            # Without a schema-wide message a missing field reports its own
+            if not partial and name in required:
+                errors.append((name, field.message))
+            if value is None or not partial:
+                continue
+        for predicate, message in rules:
+            if not predicate(value, lookups):
+                errors.append((name, message))
+                break
+
+    if not partial and not errors:
+        for predicate, message in schema.record_checks:
+            if not predicate(record):
+                errors.append((None, message))
+    return errors
+
+
+def first_error(schema, record, partial=False, lookups=None):
+    """Message of the first error, or None when the record is valid"""
+    errors = validate(schema, record, partial, lookups)
+    return errors[0][1] if errors else None
+
+
+def validate_batch(schema, columns, lookups=None):
+    """Validate many records given column-wise ({field: [values...]}).
+
+    Each rule runs over a whole column at a time. Returns {row index: [(field,
+    message)]} for the rows with errors (field is None for cross-field
+    checks); rows without errors are absent.
+    """
+    lookups = lookups or {}
+    count = max((len(values) for values in columns.values()), default=0)
+    errors = {}
+
+    def add(row, name, message):
+        errors.setdefault(row, []).append((name, message))
+
+    for name in schema.required:
+        values = columns.get(name) or [None] * count
+        for row, value in enumerate(values):
+            if _is_blank(value):
+                add(row, name, f'{name} is required.')
+
+    for name, rules in schema.rules:
+        values = columns.get(name)
+        if values is None:
+            continue
+        failed = set()
+        for predicate, message in rules:
+            for row, value in enumerate(values):
+                if row in failed or _is_blank(value):
+                    continue
+                if not predicate(value, lookups):
+                    failed.add(row)
+                    add(row, name, message)
+
+    for predicate, message in schema.record_checks:
+        for row in range(count):
+            if row in errors:
+                continue
+            record = {name: values[row] for name, values in columns.items()}
+            if not predicate(record):
+                add(row, None, message)
+    return errors
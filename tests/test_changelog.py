@@ -0,0 +1,77 @@
+# test_changelog.py
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from auth_manager import SessionManager  # noqa: E402
+from backup_logging_manager import BackupManager  # noqa: E402
+from changelog_manager import ChangelogManager  # noqa: E402
+from scooter_manager import ScooterManager  # noqa: E402
+
+
+class ChangelogTest(unittest.TestCase):
+    """Every change is captured once, with the row as it was committed"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.mkdir('data')
+        self.session = SessionManager()
+        self.session.auth.login('super_admin', 'Admin_123?')
+        self.scooters = ScooterManager(self.session)
+        self.db = self.scooters.db
+        self.scooters.create_scooter('Segway', 'Ninebot', 'AB12345678', 25, 500, 80, 20, 90, 51.92, 4.48)
+
+    def tearDown(self):
+        self.session.auth.logout()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _scooter_changes(self):
+        conn = self.db.get_connection()
+        changes = [change for change in self.db.changelog.changes_since(conn.cursor(), 0, 100)
+                   if change['table'] == 'scooters']
+        conn.close()
+        return changes
+
+    def test_one_entry_per_update(self):
+        self.scooters.update_scooter('AB12345678', state_of_charge=60)
+
+        changes = self._scooter_changes()
+        self.assertEqual([change['operation'] for change in changes], ['insert', 'update'])
+        self.assertEqual(changes[1]['row']['state_of_charge'], 60)
+        self.assertEqual(changes[1]['row']['version'], 2)
+
+    def test_direct_update_is_captured_once_with_the_bumped_version(self):
+        conn = self.db.get_connection()
+        conn.execute("UPDATE scooters SET mileage = 12 WHERE serial_number = 'AB12345678'")
+        conn.commit()
+        conn.close()
+
+        changes = self._scooter_changes()
+        self.assertEqual([change['operation'] for change in changes], ['insert', 'update'])
+        self.assertEqual((changes[1]['row']['mileage'], changes[1]['row']['version']), (12, 2))
+
+    def test_restore_keeps_seq_increasing_and_drops_consumers(self):
+        backups = BackupManager(self.session)
+        consumers = ChangelogManager(self.session)
+        backup = backups.create_backup()['data']['backup_filename']
+        consumers.register_consumer('mirror')
+        self.scooters.update_scooter('AB12345678', state_of_charge=60)
+        head = self._scooter_changes()[-1]['seq']
+
+        result = backups.restore_backup(backup)
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(result['data']['dropped_consumers'], ['mirror'])
+        self.assertFalse(consumers.poll_changes('mirror')['success'])
+
+        self.scooters.update_scooter('AB12345678', state_of_charge=50)
+        self.assertGreater(self._scooter_changes()[-1]['seq'], head)
+
+
+if __name__ == '__main__':
+    unittest.main()
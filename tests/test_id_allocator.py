@@ -0,0 +1,49 @@
+# test_id_allocator.py
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from database_manager import DatabaseManager  # noqa: E402
+from id_allocator import BLOCK_SIZE  # noqa: E402
+
+
+class CustomerIdAllocatorTest(unittest.TestCase):
+    """IDs handed out by next_id and reserve never repeat, across allocators"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.mkdir('data')
+        self.db = DatabaseManager()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_next_id_and_reserve_never_overlap(self):
+        # A second manager stands in for another process sharing the database
+        other = DatabaseManager()
+        ids = []
+        for _ in range(3):
+            ids.extend(self.db.generate_customer_id() for _ in range(BLOCK_SIZE // 2))
+            ids.extend(self.db.generate_customer_ids(100))
+            ids.append(other.generate_customer_id())
+            ids.extend(other.generate_customer_ids(7))
+
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertTrue(all(len(customer_id) == 10 and customer_id.isdigit() for customer_id in ids))
+
+    def test_reservation_rolled_back_with_the_batch_is_handed_out_again(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.batch():
+                rolled_back = self.db.generate_customer_ids(5)
+                raise RuntimeError('abort')
+        self.assertEqual(self.db.generate_customer_ids(5), rolled_back)
+
+
+if __name__ == '__main__':
+    unittest.main()
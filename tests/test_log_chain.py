@@ -0,0 +1,157 @@
+# test_log_chain.py
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from database_manager import DatabaseManager  # noqa: E402
+from retention_manager import LogArchive  # noqa: E402
+
+
+class LogChainTest(unittest.TestCase):
+    """Removals must carry a signed tombstone; forged registry or archive rows do not count"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.mkdir('data')
+        self.db = DatabaseManager()
+
+        # Two older months of entries plus a few in the current month
+        now = datetime.now()
+        old = now.replace(day=1) - timedelta(days=45)
+        with self.db.transaction() as cursor:
+            self.db.log_router.rewind(cursor, self.db.log_router.month_key(old))
+        for month_start in (old, now.replace(day=1) - timedelta(days=15)):
+            for i in range(20):
+                self._write(month_start + timedelta(minutes=i), f'entry {i}')
+        for i in range(5):
+            self.db.log_activity('super_admin', f'recent {i}')
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _write(self, when, description):
+        with self.db.transaction() as cursor:
+            values = (when.strftime('%d-%m-%Y'), when.strftime('%H:%M:%S'),
+                      self.db.encrypt_data('super_admin'), self.db.encrypt_data(description), '', 0)
+            log_id = self.db.log_router.insert(cursor, when, values)
+            self.db.log_chain.append(cursor, (log_id,) + values + (int(when.timestamp()),))
+
+    def _verify(self, full=False):
+        with self.db.read_transaction() as cursor:
+            report = self.db.log_chain.verify(cursor, full=full)
+        with self.db.transaction() as cursor:
+            self.db.log_chain.record_verification(cursor, report)
+        return report
+
+    def _oldest_partition(self, conn):
+        return conn.execute('''
+            SELECT name, first_id FROM log_partitions WHERE dropped = 0 ORDER BY month LIMIT 1
+        ''').fetchone()
+
+    def _raw(self):
+        return sqlite3.connect(self.db.db_path)
+
+    def test_untouched_log_is_intact(self):
+        self.assertTrue(self._verify(full=True)['intact'])
+        self.assertTrue(self._verify()['intact'])
+
+    def test_forged_partition_drop_is_reported(self):
+        self.assertTrue(self._verify()['intact'])  # stamps the checkpoints as verified
+
+        conn = self._raw()
+        name, first_id = self._oldest_partition(conn)
+        last_id = conn.execute(f'SELECT MAX(id) FROM {name}').fetchone()[0]
+        conn.execute(f'DROP TABLE {name}')
+        conn.execute('UPDATE log_partitions SET dropped = 1, last_id = ? WHERE name = ?',
+                     (last_id, name))
+        self.db.log_router._rebuild_view(conn.cursor())
+        conn.commit()
+        conn.close()
+
+        for full in (False, True):
+            report = self._verify(full=full)
+            self.assertFalse(report['intact'])
+            self.assertIn({'log_id': first_id, 'problem': 'entry deleted'}, report['problems'])
+
+    def test_forged_archive_segment_is_reported(self):
+        conn = self._raw()
+        name, first_id = self._oldest_partition(conn)
+        conn.execute(f'DROP TRIGGER {name}_chain_delete')
+        conn.execute(f'DELETE FROM {name} WHERE id <= ?', (first_id + 4,))
+        conn.execute('''
+            INSERT INTO log_archive_segments (
+                first_log_id, last_log_id, date_from, date_to, row_count, created_date, payload
+            ) VALUES (?, ?, '2000-01-01', '2000-01-01', 5, '2000-01-01 00:00:00', x'00')
+        ''', (first_id, first_id + 4))
+        conn.commit()
+        conn.close()
+
+        problems = self._verify(full=True)['problems']
+        self.assertEqual(problems[0]['problem'], f'trigger {name}_chain_delete missing')
+        self.assertEqual([problem['log_id'] for problem in problems[1:]],
+                         list(range(first_id, first_id + 5)))
+
+    def test_forged_tombstone_is_reported(self):
+        conn = self._raw()
+        name, first_id = self._oldest_partition(conn)
+        conn.execute(f'DELETE FROM {name} WHERE id = ?', (first_id,))
+        conn.execute('''
+            INSERT INTO log_tombstones (first_id, last_id, source, created_at, mac)
+            VALUES (?, ?, ?, '2000-01-01 00:00:00', x'00')
+        ''', (first_id, first_id, f'partition:{name}'))
+        conn.commit()
+        conn.close()
+
+        problems = self._verify()['problems']
+        self.assertIn('forged', problems[0]['problem'])
+        self.assertIn({'log_id': first_id, 'problem': 'entry deleted'}, problems)
+
+    def test_dropped_or_added_trigger_is_reported(self):
+        conn = self._raw()
+        name, _ = self._oldest_partition(conn)
+        conn.execute(f'DROP TRIGGER {name}_chain_update')
+        conn.execute('CREATE TRIGGER swallow BEFORE INSERT ON log_chain_dirty BEGIN SELECT RAISE(IGNORE); END')
+        conn.commit()
+        conn.close()
+
+        problems = [problem['problem'] for problem in self._verify()['problems']]
+        self.assertIn(f'trigger {name}_chain_update missing', problems)
+        self.assertIn('unexpected trigger swallow on log_chain_dirty', problems)
+
+    def test_edit_with_cleared_dirty_ids_is_found(self):
+        self.assertTrue(self._verify()['intact'])
+
+        conn = self._raw()
+        name, first_id = self._oldest_partition(conn)
+        conn.execute(f'UPDATE {name} SET suspicious = 1 WHERE id = ?', (first_id + 3,))
+        conn.execute('DELETE FROM log_chain_dirty')
+        conn.commit()
+        conn.close()
+
+        # The rotation re-reads the least recently verified checkpoint
+        modified = {'log_id': first_id + 3, 'problem': 'entry modified or chain broken'}
+        self.assertIn(modified, self._verify()['problems'])
+        self.assertIn(modified, self._verify(full=True)['problems'])
+
+    def test_archive_and_drop_keep_the_log_intact(self):
+        archived = LogArchive(self.db).archive_batch(datetime.now() - timedelta(days=1), 10 ** 6, 15)
+        self.assertEqual(archived, 15)
+        self.assertTrue(self._verify()['intact'])
+
+        with self.db.transaction() as cursor:
+            name, _ = self._oldest_partition(cursor.connection)
+            self.db.log_router.drop_partition(cursor, name)
+        self.assertTrue(self._verify()['intact'])
+        self.assertTrue(self._verify(full=True)['intact'])
+
+
+if __name__ == '__main__':
+    unittest.main()
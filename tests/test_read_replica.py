@@ -0,0 +1,59 @@
+# test_read_replica.py
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from read_replica import ReadReplica  # noqa: E402
+
+
+class ReadReplicaTest(unittest.TestCase):
+    """Reads are served from the current copy while a refresh runs in the background"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.live = os.path.join(self.tmp.name, 'live.db')
+        self._write("CREATE TABLE t (x)", "INSERT INTO t VALUES (1)")
+        self.replica = ReadReplica(self.live, max_lag=0.01)
+
+    def tearDown(self):
+        self._wait_for_refresh()
+        self.tmp.cleanup()
+
+    def _write(self, *statements):
+        conn = sqlite3.connect(self.live)
+        for statement in statements:
+            conn.execute(statement)
+        conn.commit()
+        conn.close()
+
+    def _count(self):
+        conn = self.replica.connect()
+        count = conn.execute('SELECT COUNT(*) FROM t').fetchone()[0]
+        conn.close()
+        return count
+
+    def _wait_for_refresh(self):
+        while self.replica._lock.locked():
+            time.sleep(0.01)
+
+    def test_stale_replica_is_served_until_the_refresh_completes(self):
+        self.assertEqual(self._count(), 1)  # no copy yet: read from the live database
+        self._wait_for_refresh()
+        self.assertTrue(os.path.exists(self.replica.path))
+
+        time.sleep(0.05)
+        self._write("INSERT INTO t VALUES (2)")
+        os.utime(self.live)
+        self.assertTrue(self.replica.is_stale())
+        self.assertEqual(self._count(), 1)  # current copy, refresh started
+        self._wait_for_refresh()
+        self.assertEqual(self._count(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
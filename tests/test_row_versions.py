@@ -0,0 +1,58 @@
+# test_row_versions.py
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from auth_manager import SessionManager  # noqa: E402
+from scooter_manager import ScooterManager  # noqa: E402
+
+
+class RowVersionTest(unittest.TestCase):
+    """An update based on a stale version is reported as a conflict, not applied"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.mkdir('data')
+        self.session = SessionManager()
+        self.session.auth.login('super_admin', 'Admin_123?')
+        self.scooters = ScooterManager(self.session)
+        result = self.scooters.create_scooter('Segway', 'Ninebot', 'AB12345678', 25, 500, 80, 20, 90,
+                                              51.92, 4.48)
+        self.assertTrue(result['success'], result['message'])
+
+    def tearDown(self):
+        self.session.auth.logout()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _scooter(self):
+        return self.scooters.get_scooter_details('AB12345678')['data']
+
+    def test_stale_expected_version_is_a_conflict(self):
+        read = self._scooter()
+
+        first = self.scooters.update_scooter('AB12345678', expected_version=read['version'],
+                                             state_of_charge=60)
+        self.assertTrue(first['success'], first['message'])
+        second = self.scooters.update_scooter('AB12345678', expected_version=read['version'],
+                                              state_of_charge=40)
+
+        self.assertFalse(second['success'])
+        self.assertEqual(second['data'], {'conflict': True, 'version': read['version'] + 1})
+        self.assertEqual(self._scooter()['state_of_charge'], 60)
+
+    def test_current_expected_version_applies(self):
+        read = self._scooter()
+        result = self.scooters.update_scooter('AB12345678', expected_version=read['version'],
+                                              state_of_charge=60)
+        self.assertTrue(result['success'], result['message'])
+        self.assertEqual(self._scooter()['version'], read['version'] + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
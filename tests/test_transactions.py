@@ -0,0 +1,61 @@
+# test_transactions.py
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from database_manager import DatabaseManager  # noqa: E402
+
+
+class TransactionTest(unittest.TestCase):
+    """Inside a batch a failed operation only rolls back to its own savepoint"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.mkdir('data')
+        self.db = DatabaseManager()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def _insert(self, cursor, key):
+        cursor.execute('INSERT INTO system_settings (key, value) VALUES (?, ?)', (key, 'x'))
+
+    def _keys(self):
+        conn = self.db.get_connection()
+        keys = {row[0] for row in conn.execute(
+            "SELECT key FROM system_settings WHERE key LIKE 'test_%'")}
+        conn.close()
+        return keys
+
+    def test_failed_operation_in_batch_rolls_back_to_its_savepoint(self):
+        with self.db.batch():
+            with self.db.transaction() as cursor:
+                self._insert(cursor, 'test_before')
+            with self.assertRaises(sqlite3.IntegrityError):
+                with self.db.transaction() as cursor:
+                    self._insert(cursor, 'test_undone')
+                    self._insert(cursor, 'test_before')  # duplicate key
+            with self.db.transaction() as cursor:
+                self._insert(cursor, 'test_after')
+
+        self.assertEqual(self._keys(), {'test_before', 'test_after'})
+
+    def test_failed_batch_rolls_back_every_operation(self):
+        with self.assertRaises(RuntimeError):
+            with self.db.batch():
+                with self.db.transaction() as cursor:
+                    self._insert(cursor, 'test_before')
+                raise RuntimeError('abort')
+
+        self.assertEqual(self._keys(), set())
+
+
+if __name__ == '__main__':
+    unittest.main()